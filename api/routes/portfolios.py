@@ -1,5 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from typing import List
+import asyncio
+from functools import partial
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from typing import List, Optional
 from models.portfolio import (
     Portfolio, PortfolioCreate, PortfolioHolding
 )
@@ -10,7 +12,8 @@ from services.stock_master_service import StockMasterService
 from datetime import datetime
 from decimal import Decimal
 import logging
-from config.database import get_database
+from config.database import get_async_database, get_sync_database
+from services.performance_analytics import get_portfolio_performance
 
 router = APIRouter()
 templates = Jinja2Templates(directory="web/templates")
@@ -88,6 +91,21 @@ async def list_portfolios(
         }
     )
 
+@router.get("/valuations")
+async def get_portfolios_value(
+    portfolio_ids: Optional[List[str]] = Query(None),
+    user_id: Optional[str] = None,
+    portfolio_service: PortfolioService = Depends()
+):
+    """Value several portfolios (or all of a user's) in one call"""
+    try:
+        return await portfolio_service.get_portfolios_value(portfolio_ids, user_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error valuing portfolios: {str(e)}"
+        )
+
 @router.get("/{portfolio_id}", response_class=HTMLResponse)
 async def get_portfolio(
     request: Request,
@@ -105,6 +123,32 @@ async def get_portfolio(
         }
     )
 
+@router.get("/{portfolio_id}/performance")
+async def get_performance(
+    portfolio_id: str,
+    days: int = Query(365, ge=2),
+    benchmark: Optional[str] = None
+):
+    """
+    TWR, XIRR, volatility, max drawdown and Sharpe ratio over the last `days`
+    days, plus relative return, beta and tracking error against `benchmark`
+    (defaults to the index of the portfolio's main exchange, e.g. ^NSEI)
+    """
+    try:
+        # Sync pymongo + NumPy work, kept off the event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(
+            get_portfolio_performance, get_sync_database(), portfolio_id, days,
+            benchmark_symbol=benchmark
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error computing performance: {str(e)}"
+        )
+
 @router.post("/{portfolio_id}/holdings")
 async def add_holding(
     portfolio_id: str,
@@ -299,7 +343,7 @@ async def test_database_connection(
 async def test_db():
     """Simple endpoint to test database connection"""
     try:
-        db = get_database()
+        db = get_async_database()
         collection = db.master_stocks
         count = await collection.count_documents({})
         sample = await collection.find_one({})
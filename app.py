@@ -1,5 +1,4 @@
 from flask import Flask, request, jsonify, render_template, url_for
-from pymongo import MongoClient
 from bson import ObjectId
 from bson.decimal128 import Decimal128
 from datetime import datetime, timezone, timedelta
@@ -17,6 +16,8 @@ from fuzzywuzzy import fuzz
 from bson.json_util import dumps, loads
 import json
 from services.stock_master_service import StockMasterService
+from config.database import get_sync_database
+from services.snapshot_service import apply_holding_change_sync, mark_stale_sync, snapshot_portfolio_id
 
 # Configure logging
 logging.basicConfig(
@@ -43,13 +44,9 @@ app = Flask(__name__,
 # Set the custom JSON encoder
 app.json_encoder = CustomJSONEncoder
 
-# MongoDB connection
-MONGODB_URL = "mongodb://localhost:27017"
-DATABASE_NAME = "portfolio_tracker"
-
+# MongoDB connection (shared pooled client from config.database)
 try:
-    client = MongoClient(MONGODB_URL)
-    db = client[DATABASE_NAME]
+    db = get_sync_database()
     stocks_collection = db.master_stocks
     portfolios_collection = db.portfolios
     logger.info(f"Connected to MongoDB. Found {stocks_collection.count_documents({})} stocks")
@@ -372,6 +369,10 @@ def edit_portfolio(portfolio_id):
                 if result.modified_count == 0:
                     return jsonify({'error': 'Portfolio not found or no changes made'}), 404
 
+                # Holdings were rewritten wholesale; the API revalues the snapshot on next read
+                portfolio = portfolios_collection.find_one({'_id': ObjectId(portfolio_id)}, {'id': 1})
+                mark_stale_sync(db, snapshot_portfolio_id(portfolio))
+
                 return jsonify({
                     'success': True,
                     'message': 'Portfolio updated successfully'
@@ -649,6 +650,13 @@ class PortfolioManager:
                 }
             )
 
+            # Apply the stock's new quantity, summed over all its lots, to the valuation snapshot
+            new_quantity = sum(
+                (h['quantity'].to_decimal() for h in holdings if h['stock_id'] == stock_id),
+                Decimal('0')
+            )
+            apply_holding_change_sync(self.db, snapshot_portfolio_id(portfolio), stock_id, new_quantity)
+
             return True
 
         except Exception as e:
@@ -0,0 +1,298 @@
+"""
+Timing harnesses for the vectorised and batched code paths, kept out of
+the library modules. Every benchmark except timeseries_storage runs on
+synthetic data; timeseries_storage needs MongoDB with both bar collections.
+
+    python -m benchmarks.run              # every offline benchmark
+    python -m benchmarks.run indicators anomalies
+    python -m benchmarks.run timeseries_storage
+"""
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import numpy as np
+
+from config.calendars import get_calendar, sessions_for
+from services.anomaly_service import ANOMALY_EXCHANGE, anomaly_rows, score_anomalies
+from services.corporate_actions import adjust_matrix, cumulative_factors
+from services.history_cache import HistoryCache
+from services.indicators import bollinger, ema, rsi, sma
+from services.maintenance.bulk_changes import BULK_CHUNK_SIZE, MasterStockChanges
+from services.maintenance.detail_refresh import DetailRefresher, StubDetailsProvider
+from services.maintenance.listing_sync import parse_listing, row_fingerprint
+from services.maintenance.migrate_timeseries import SOURCE_COLLECTION, TARGET_COLLECTION
+from services.maintenance.price_ingestion import (
+    BAR_FIELDS, HISTORY_BATCH_SIZE, UPSERT_CHUNK_SIZE, bar_operations, frame_to_bars, new_bars
+)
+from services.performance_analytics import performance_metrics
+from services.price_matrix import PriceMatrix
+
+
+def price_matrix(n_symbols: int = 500, years: int = 10, repeat: int = 5):
+    """Time the engine on a synthetic random-walk universe"""
+    rng = np.random.default_rng(0)
+    dates = np.arange(np.datetime64('2015-01-01'), np.datetime64('2015-01-01') + years * 365)
+    returns = rng.normal(0.0003, 0.02, size=(len(dates), n_symbols))
+    prices = 100 * np.exp(np.cumsum(returns, axis=0))
+    prices[rng.random(prices.shape) < 0.02] = np.nan
+    matrix = PriceMatrix(dates, [f"SYM{i}" for i in range(n_symbols)], prices)
+    quantities = rng.integers(1, 100, n_symbols).astype(np.float64)
+    quantity_grid = np.broadcast_to(quantities, prices.shape)
+
+    cases = {
+        "ffill": lambda: matrix.ffill(),
+        "portfolio_value (vector)": lambda: matrix.portfolio_value(quantities),
+        "portfolio_value (matrix)": lambda: matrix.portfolio_value(quantity_grid),
+        "holding_values": lambda: matrix.holding_values(quantities),
+        "daily_returns": lambda: matrix.daily_returns(),
+    }
+    print(f"{len(dates)} dates x {n_symbols} symbols")
+    for name, case in cases.items():
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            case()
+            timings.append(time.perf_counter() - started)
+        print(f"  {name:<26} best {min(timings) * 1000:8.2f} ms")
+
+
+def history_cache(n_symbols: int = 500, years: int = 10, repeat: int = 5):
+    """Time a warm-cache price matrix build on synthetic files"""
+    rng = np.random.default_rng(0)
+    dates = np.arange(np.datetime64('2015-01-01'), np.datetime64('2015-01-01') + years * 365)
+    with tempfile.TemporaryDirectory() as directory:
+        cache = HistoryCache(directory=directory, sync_seconds=float('inf'))
+        spellings = {}
+        for i in range(n_symbols):
+            symbol = f"SYM{i}"
+            spellings[symbol] = symbol
+            closes = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, len(dates))))
+            cache._write(symbol, dates, closes, np.full(len(dates), np.nan))
+
+        start = datetime(2015, 1, 1)
+        end = start + timedelta(days=years * 365)
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            matrix = cache.load_price_matrix(None, spellings, start, end)
+            timings.append(time.perf_counter() - started)
+        print(f"{matrix.prices.shape[0]} dates x {matrix.prices.shape[1]} symbols from cache: "
+              f"first {timings[0] * 1000:.1f} ms, warm best {min(timings[1:] or timings) * 1000:.1f} ms")
+
+
+def corporate_actions(n_symbols: int = 2000, years: int = 20, actions_per_symbol: int = 3, repeat: int = 5):
+    """Re-adjust a full daily history for a universe where every symbol has actions"""
+    rng = np.random.default_rng(0)
+    dates = np.arange(np.datetime64('2005-01-01'), np.datetime64('2005-01-01') + years * 365)
+    symbols = [f"SYM{i}" for i in range(n_symbols)]
+    matrix = PriceMatrix(dates, symbols, 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (len(dates), n_symbols)), axis=0)))
+    table = {
+        symbol: cumulative_factors(rng.choice(dates, actions_per_symbol, replace=False),
+                                   rng.choice([2.0, 5.0, 10.0, 1.5], actions_per_symbol))
+        for symbol in symbols
+    }
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        adjust_matrix(matrix, table)
+        timings.append(time.perf_counter() - started)
+    print(f"{n_symbols} symbols x {len(dates)} days, {actions_per_symbol} actions each: "
+          f"best {min(timings) * 1000:.1f} ms")
+
+
+def performance(years: int = 10, n_flows: int = 500, repeat: int = 5):
+    """Time the metrics on a synthetic session series with periodic flows and a benchmark"""
+    rng = np.random.default_rng(0)
+    dates = sessions_for(["NSE"], np.datetime64('2015-01-01'), np.datetime64('2015-01-01') + years * 365)
+    flows = np.zeros(len(dates))
+    flows[rng.choice(np.arange(1, len(dates)), n_flows, replace=False)] = rng.normal(1000, 3000, n_flows)
+    growth = np.cumprod(1 + rng.normal(0.0003, 0.01, len(dates)))
+    values = 100000 * growth + np.cumsum(flows)
+    index = 100 * np.cumprod(1 + rng.normal(0.0002, 0.008, len(dates)))
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        metrics = performance_metrics(dates, values, flows, benchmark=index)
+        timings.append(time.perf_counter() - started)
+    print(f"{len(dates)} sessions, {n_flows} flows: best {min(timings) * 1000:.2f} ms")
+    print({key: metrics[key] for key in ("time_weighted_return", "xirr", "volatility", "sharpe_ratio",
+                                        "max_drawdown", "beta", "tracking_error")})
+
+
+def anomalies(n_symbols: int = 2000, n_sessions: int = 60, repeat: int = 5):
+    """Time the scoring on a synthetic universe the size of NSE"""
+    rng = np.random.default_rng(0)
+    dates = get_calendar(ANOMALY_EXCHANGE).sessions('2025-01-01', '2025-12-31')[:n_sessions]
+    symbols = [f"SYM{i}" for i in range(n_symbols)]
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (len(dates), n_symbols)), axis=0))
+    volume = rng.lognormal(12, 0.5, (len(dates), n_symbols))
+    volume[-1, :20] *= 20
+    closes = PriceMatrix(dates, symbols, prices)
+    volumes = PriceMatrix(dates, symbols, volume)
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        scores = score_anomalies(closes, volumes)
+        table = anomaly_rows(closes, volumes, scores, np.array([len(dates) - 1]))
+        timings.append(time.perf_counter() - started)
+    print(f"{n_symbols} symbols x {len(dates)} sessions: best {min(timings) * 1000:.2f} ms, "
+          f"{len(table)} anomalies on the last session")
+
+
+def indicators(n: int = 20 * 252, repeat: int = 5):
+    """Time every indicator on a 20-year daily series"""
+    rng = np.random.default_rng(0)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, n)))
+    cases = {
+        "sma 50": lambda: sma(closes, 50),
+        "ema 50": lambda: ema(closes, span=50),
+        "rsi 14": lambda: rsi(closes, 14),
+        "bollinger 20": lambda: bollinger(closes, 20),
+    }
+    print(f"{n} bars")
+    for name, case in cases.items():
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            case()
+            timings.append(time.perf_counter() - started)
+        print(f"  {name:<14} best {min(timings) * 1000:8.3f} ms")
+
+
+def price_ingestion(n_symbols: int = 2000, n_days: int = 5, repeat: int = 3):
+    """Normalise and build upserts for one daily run over a synthetic universe"""
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    symbols = [f"SYM{i}.NS" for i in range(n_symbols)]
+    index = pd.DatetimeIndex(get_calendar("NSE").sessions('2025-06-02', '2025-06-30')[:n_days])
+    columns = pd.MultiIndex.from_product([[f.capitalize() for f in BAR_FIELDS], symbols])
+    data = pd.DataFrame(rng.lognormal(4, 0.5, (len(index), len(columns))), index=index, columns=columns)
+    latest = {symbol: index.values[0].astype('datetime64[D]') for symbol in symbols}
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        operations = bar_operations(new_bars(frame_to_bars(data, symbols), latest))
+        timings.append(time.perf_counter() - started)
+    calls = -(-n_symbols // HISTORY_BATCH_SIZE)
+    print(f"{n_symbols} symbols x {n_days} days: {len(operations)} upserts built in best "
+          f"{min(timings) * 1000:.1f} ms; {calls} provider calls and "
+          f"{-(-len(operations) // UPSERT_CHUNK_SIZE)} bulk writes")
+
+
+def listing_sync(n_symbols: int = 2500, repeat: int = 5):
+    """Parse and fingerprint a synthetic equity list the size of NSE"""
+    header = "SYMBOL,NAME OF COMPANY, SERIES, DATE OF LISTING, PAID UP VALUE, MARKET LOT, ISIN NUMBER, FACE VALUE"
+    lines = [header] + [
+        f"SYM{i},Company {i} Limited,EQ,01-JAN-2000,10,1,INE{i:09d},10" for i in range(n_symbols)
+    ]
+    text = "\n".join(lines)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = parse_listing(text)
+        fingerprints = {symbol: row_fingerprint(row) for symbol, row in rows.items()}
+        timings.append(time.perf_counter() - started)
+    print(f"{len(fingerprints)} rows: best {min(timings) * 1000:.1f} ms")
+
+
+def detail_refresh(n_symbols: int = 200, latency: float = 0.05, concurrency_levels: List[int] = (1, 4, 16)):
+    """Refresh time against a stub provider at different concurrency limits"""
+    details = {f"SYM{i}": {"display_name": f"Company {i}", "nse_code": f"SYM{i}"} for i in range(n_symbols)}
+    for workers in concurrency_levels:
+        provider = StubDetailsProvider(details, latency=latency, failures={"SYM0": 1})
+        refresher = DetailRefresher(provider, max_workers=workers, rate_limit=0, timeout=5, base_delay=0.01)
+        refresher.refresh(details)
+        summary = refresher.metrics.summary()
+        print(f"  {workers:>3} workers: {summary['seconds']:6.2f}s, {summary['succeeded']} ok, "
+              f"{summary['retries']} retries, {summary['failed']} failed")
+
+
+def bulk_changes(n_listings: int = 5000, n_delistings: int = 50, n_renames: int = 200,
+              chunk_size: int = BULK_CHUNK_SIZE):
+    """Build the operations for a full resync and count the round trips they need"""
+    started = time.perf_counter()
+    changes = MasterStockChanges()
+    for i in range(n_listings):
+        changes.add_listing({"nse_code": f"SYM{i}", "display_name": f"Company {i}", "isin": f"INE{i:09d}"})
+    for i in range(n_delistings):
+        changes.add_delisting(f"OLD{i}")
+    for i in range(n_renames):
+        changes.add_name_variant(f"SYM{i}", f"Company {i}", f"Company {i} Limited", "benchmark")
+    elapsed = time.perf_counter() - started
+    round_trips = -(-len(changes.operations) // chunk_size)
+    print(f"{changes.counts()}: {len(changes.operations)} operations built in {elapsed * 1000:.1f} ms, "
+          f"{round_trips} bulk_write round trips (one call per change before)")
+
+
+def _storage_stats(db, collection: str) -> Dict:
+    stats = next(db[collection].aggregate([{"$collStats": {"storageStats": {}}}]))["storageStats"]
+    return {
+        "count": stats.get("count", 0),
+        "storage_mb": stats.get("storageSize", 0) / 2 ** 20,
+        "index_mb": stats.get("totalIndexSize", 0) / 2 ** 20
+    }
+
+
+def _range_query_latency(db, collection: str, symbols, days: int = 365, repeat: int = 50) -> float:
+    """Median milliseconds to read a `days` range of closes for a random symbol"""
+    end = datetime.utcnow()
+    timings = []
+    for _ in range(repeat):
+        symbol = random.choice(symbols)
+        start = end - timedelta(days=days)
+        started = time.perf_counter()
+        list(db[collection].find(
+            {"symbol": symbol, "date": {"$gte": start, "$lte": end}},
+            {"_id": 0, "date": 1, "close": 1}
+        ))
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+
+def timeseries_storage(db=None, source: str = SOURCE_COLLECTION, target: str = TARGET_COLLECTION,
+              symbols: int = 100):
+    """Storage size and range-query latency of the plain and time-series collections"""
+    if db is None:
+        from config.database import get_sync_database
+        db = get_sync_database()
+    random.seed(0)
+    sample = db[source].distinct("symbol")[:symbols]
+    if not sample:
+        print(f"{source} is empty")
+        return
+    for name in (source, target):
+        stats = _storage_stats(db, name)
+        latency = _range_query_latency(db, name, sample)
+        print(f"  {name:<22} {stats['count']:>10} bars  {stats['storage_mb']:8.1f} MB data  "
+              f"{stats['index_mb']:7.1f} MB index  1y range p50 {latency:6.2f} ms")
+
+
+# Run without arguments; timeseries_storage reads a live database so it is only run by name
+OFFLINE = [price_matrix, history_cache, corporate_actions, performance, anomalies, indicators,
+           price_ingestion, listing_sync, detail_refresh, bulk_changes]
+BENCHMARKS = {func.__name__: func for func in OFFLINE + [timeseries_storage]}
+
+
+def main(argv: List[str] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    unknown = [name for name in argv if name not in BENCHMARKS]
+    if unknown:
+        print(f"Unknown benchmarks: {', '.join(unknown)}; choose from {', '.join(BENCHMARKS)}")
+        return
+    for func in [BENCHMARKS[name] for name in argv] or OFFLINE:
+        print(f"== {func.__name__}")
+        func()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import json
+import logging
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import numpy as np
+
+from config.exchanges import EXCHANGE_CONFIGS
+from config.settings import TRADING_HOLIDAYS_FILE
+
+try:
+    import exchange_calendars
+except ImportError:  # falls back to the built-in holiday lists below
+    exchange_calendars = None
+
+logger = logging.getLogger(__name__)
+
+# Earliest day loaded from exchange_calendars
+CALENDAR_START = "2000-01-01"
+
+# Full-day exchange closures on weekdays, used when exchange_calendars is not
+# installed. Each exchange's calendar covers only the years listed here (plus
+# any in TRADING_HOLIDAYS_FILE, a JSON file with extra dates per exchange);
+# days outside them are treated as plain weekdays, with a logged warning.
+EXCHANGE_HOLIDAYS: Dict[str, List[str]] = {
+    "NSE": [
+        "2024-01-22", "2024-01-26", "2024-03-08", "2024-03-25", "2024-03-29",
+        "2024-04-11", "2024-04-17", "2024-05-01", "2024-05-20", "2024-06-17",
+        "2024-07-17", "2024-08-15", "2024-10-02", "2024-11-01", "2024-11-15",
+        "2024-11-20", "2024-12-25",
+        "2025-02-26", "2025-03-14", "2025-03-31", "2025-04-10", "2025-04-14",
+        "2025-04-18", "2025-05-01", "2025-08-15", "2025-08-27", "2025-10-02",
+        "2025-10-21", "2025-10-22", "2025-11-05", "2025-12-25",
+        "2026-01-15", "2026-01-26", "2026-03-03", "2026-03-26", "2026-03-31",
+        "2026-04-03", "2026-04-14", "2026-05-01", "2026-05-28", "2026-06-26",
+        "2026-09-14", "2026-10-02", "2026-10-20", "2026-11-10", "2026-11-24",
+        "2026-12-25",
+    ],
+    "NYSE": [
+        "2024-01-01", "2024-01-15", "2024-02-19", "2024-03-29", "2024-05-27",
+        "2024-06-19", "2024-07-04", "2024-09-02", "2024-11-28", "2024-12-25",
+        "2025-01-01", "2025-01-09", "2025-01-20", "2025-02-17", "2025-04-18",
+        "2025-05-26", "2025-06-19", "2025-07-04", "2025-09-01", "2025-11-27",
+        "2025-12-25",
+        "2026-01-01", "2026-01-19", "2026-02-16", "2026-04-03", "2026-05-25",
+        "2026-06-19", "2026-07-03", "2026-09-07", "2026-11-26", "2026-12-25",
+    ],
+}
+
+WEEKMASK = "Mon Tue Wed Thu Fri"
+
+DateLike = Union[date, datetime, np.datetime64, str]
+
+
+def _day(value: DateLike) -> np.datetime64:
+    if isinstance(value, datetime):
+        value = value.replace(tzinfo=None)
+    return np.datetime64(value, 'D')
+
+
+class TradingCalendar:
+    """
+    Trading sessions of one or more exchanges, as numpy business days.
+    With `first`/`last`, days outside that range are plain weekdays and
+    the first such lookup logs a warning, so a missing holiday update shows
+    up in the logs without failing request or scheduler paths.
+    """
+
+    def __init__(self, holidays: Iterable[str] = (), weekmask: str = WEEKMASK,
+                 first: Optional[DateLike] = None, last: Optional[DateLike] = None, name: str = ""):
+        self.holidays = np.array(sorted(set(holidays)), dtype='datetime64[D]')
+        self.busdays = np.busdaycalendar(weekmask=weekmask, holidays=self.holidays)
+        self.first = _day(first) if first is not None else None
+        self.last = _day(last) if last is not None else None
+        self.name = name
+        self.warned = False
+
+    def covers(self, start: DateLike, end: DateLike) -> bool:
+        """Whether the holidays of every day in start..end are known"""
+        start, end = _day(start), _day(end)
+        return (self.first is None or start >= self.first) and (self.last is None or end <= self.last)
+
+    def _check(self, start: np.datetime64, end: np.datetime64):
+        if not self.warned and not self.covers(start, end):
+            self.warned = True
+            logger.warning(
+                f"{self.name or 'Calendar'} holidays are only known from {self.first} to {self.last}; "
+                f"treating weekdays in {start}..{end} outside that range as sessions. Install or "
+                f"update exchange_calendars, or add the dates to TRADING_HOLIDAYS_FILE"
+            )
+
+    def is_session(self, day: DateLike) -> bool:
+        day = _day(day)
+        self._check(day, day)
+        return bool(np.is_busday(day, busdaycal=self.busdays))
+
+    def sessions(self, start: DateLike, end: DateLike) -> np.ndarray:
+        """Trading days with start <= day <= end"""
+        start, end = _day(start), _day(end)
+        self._check(start, end)
+        days = np.arange(start, end + np.timedelta64(1, 'D'))
+        return days[np.is_busday(days, busdaycal=self.busdays)]
+
+    def count_sessions(self, start: DateLike, end: DateLike) -> int:
+        start, end = _day(start), _day(end)
+        self._check(start, end)
+        return int(np.busday_count(start, end + np.timedelta64(1, 'D'), busdaycal=self.busdays))
+
+
+def _load_extra_holidays() -> Dict[str, List[str]]:
+    if not TRADING_HOLIDAYS_FILE:
+        return {}
+    with open(TRADING_HOLIDAYS_FILE) as f:
+        return json.load(f)
+
+
+def _year_span(days: Iterable[str]) -> Tuple[Optional[str], Optional[str]]:
+    """First and last day of the years the listed dates fall in"""
+    years = sorted({str(day)[:4] for day in days})
+    if not years:
+        return None, None
+    return f"{years[0]}-01-01", f"{years[-1]}-12-31"
+
+
+def _exchange_calendar_holidays(calendar_code: str) -> Tuple[List[str], str, str]:
+    """Weekday closures and the covered range, from exchange_calendars"""
+    calendar = exchange_calendars.get_calendar(calendar_code, start=CALENDAR_START)
+    first, last = _day(calendar.first_session), _day(calendar.last_session)
+    days = np.arange(first, last + np.timedelta64(1, 'D'))
+    weekdays = days[np.is_busday(days, weekmask=WEEKMASK)]
+    sessions = np.asarray(calendar.sessions.values, dtype='datetime64[D]')
+    holidays = np.setdiff1d(weekdays, sessions)
+    return [str(day) for day in holidays], str(first), str(last)
+
+
+@lru_cache(maxsize=32)
+def _load_calendar(exchange_code: str, as_of: date) -> TradingCalendar:
+    exchange_config = EXCHANGE_CONFIGS.get(exchange_code)
+    if exchange_config is None:
+        return TradingCalendar()
+    if exchange_calendars is not None and exchange_config.calendar_code:
+        holidays, first, last = _exchange_calendar_holidays(exchange_config.calendar_code)
+    else:
+        holidays = EXCHANGE_HOLIDAYS.get(exchange_code, [])
+        first, last = _year_span(holidays)
+    extra = _load_extra_holidays().get(exchange_code, [])
+    if extra:
+        extra_first, extra_last = _year_span(extra)
+        first = min(first, extra_first) if first else extra_first
+        last = max(last, extra_last) if last else extra_last
+    if first is None:
+        logger.warning(f"No holiday data for {exchange_code}; treating every weekday as a session")
+    return TradingCalendar(holidays + extra, first=first, last=last, name=exchange_code)
+
+
+def get_calendar(exchange_code: str) -> TradingCalendar:
+    """
+    Calendar for an exchange in EXCHANGE_CONFIGS, from exchange_calendars
+    when installed and the built-in lists otherwise, plus any dates in
+    TRADING_HOLIDAYS_FILE. Weekdays only (and unbounded) for unknown codes.
+    Cached per day, so long-running processes pick up the range
+    exchange_calendars extends as time passes.
+    """
+    return _load_calendar(exchange_code, date.today())
+
+
+def sessions_for(exchange_codes: Iterable[str], start: DateLike, end: DateLike) -> np.ndarray:
+    """
+    Days on which at least one of the exchanges traded, for portfolios
+    spanning several markets. Plain weekdays when no exchange is known.
+    """
+    codes = sorted(set(code for code in exchange_codes if code in EXCHANGE_CONFIGS))
+    if not codes:
+        return TradingCalendar().sessions(start, end)
+    if len(codes) == 1:
+        return get_calendar(codes[0]).sessions(start, end)
+    return np.unique(np.concatenate([get_calendar(code).sessions(start, end) for code in codes]))
@@ -1,42 +1,135 @@
+import atexit
+import os
+import threading
 from pymongo import MongoClient
 import logging
 
+from config.settings import (
+    MONGODB_URI,
+    DATABASE_NAME,
+    MONGODB_MAX_POOL_SIZE,
+    MONGODB_MIN_POOL_SIZE,
+    MONGODB_MAX_IDLE_TIME_MS,
+    MONGODB_CONNECT_TIMEOUT_MS,
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+    MONGODB_SOCKET_TIMEOUT_MS,
+)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# MongoDB connection settings
-MONGODB_URL = "mongodb://localhost:27017"
-DATABASE_NAME = "portfolio_tracker"
 
-# Global database instance
-_db = None
+class MongoClientRegistry:
+    """
+    Process-wide registry holding one pooled sync (pymongo) client and one
+    pooled async (motor) client. Every service takes its handles from here
+    instead of opening its own client.
+    """
+
+    def __init__(self, uri: str = MONGODB_URI, database_name: str = DATABASE_NAME):
+        self.uri = uri
+        self.database_name = database_name
+        self._sync_client = None
+        self._async_client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def client_options(self) -> dict:
+        """Pool and timeout options shared by the sync and async clients"""
+        return {
+            "maxPoolSize": MONGODB_MAX_POOL_SIZE,
+            "minPoolSize": MONGODB_MIN_POOL_SIZE,
+            "maxIdleTimeMS": MONGODB_MAX_IDLE_TIME_MS,
+            "connectTimeoutMS": MONGODB_CONNECT_TIMEOUT_MS,
+            "serverSelectionTimeoutMS": MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+            "socketTimeoutMS": MONGODB_SOCKET_TIMEOUT_MS,
+        }
+
+    def _check_pid(self):
+        """Drop clients inherited across a fork; pymongo clients are not fork-safe"""
+        pid = os.getpid()
+        if self._pid != pid:
+            self._sync_client = None
+            self._async_client = None
+            self._pid = pid
+
+    def get_sync_client(self) -> MongoClient:
+        """Get the shared pymongo client, creating it on first use"""
+        with self._lock:
+            self._check_pid()
+            if self._sync_client is None:
+                logger.info(f"Creating pooled MongoDB client for {self.uri}")
+                self._sync_client = MongoClient(self.uri, **self.client_options())
+            return self._sync_client
+
+    def get_async_client(self):
+        """Get the shared motor client, creating it on first use"""
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        with self._lock:
+            self._check_pid()
+            if self._async_client is None:
+                logger.info(f"Creating pooled async MongoDB client for {self.uri}")
+                self._async_client = AsyncIOMotorClient(self.uri, **self.client_options())
+            return self._async_client
+
+    def get_sync_database(self):
+        return self.get_sync_client()[self.database_name]
+
+    def get_async_database(self):
+        return self.get_async_client()[self.database_name]
+
+    def close(self):
+        """Close both clients; they are recreated lazily if used again"""
+        with self._lock:
+            if self._sync_client is not None:
+                self._sync_client.close()
+                self._sync_client = None
+            if self._async_client is not None:
+                self._async_client.close()
+                self._async_client = None
+            logger.info("Closed pooled MongoDB clients")
+
+
+# Global registry instance
+registry = MongoClientRegistry()
+atexit.register(registry.close)
+
+
+def get_sync_client() -> MongoClient:
+    """Shared synchronous client for the current process"""
+    return registry.get_sync_client()
+
+
+def get_async_client():
+    """Shared asynchronous client for the current process"""
+    return registry.get_async_client()
+
+
+def get_async_database():
+    """Async database handle backed by the shared motor client"""
+    return registry.get_async_database()
+
+
+def close_database_connections():
+    """Shutdown hook closing the shared clients"""
+    registry.close()
+
 
 def get_database():
     """Get database instance with lazy initialization"""
-    global _db
-    if _db is None:
-        try:
-            # Create client and connect
-            logger.info(f"Connecting to MongoDB at {MONGODB_URL}")
-            client = MongoClient(MONGODB_URL)
-            _db = client[DATABASE_NAME]
-            
-            # Verify connection immediately
-            client.admin.command('ping')
-            count = _db.master_stocks.count_documents({})
-            logger.info(f"Connected successfully. Found {count} documents in master_stocks")
-            
-        except Exception as e:
-            logger.error(f"MongoDB connection failed: {e}")
-            raise
-    
-    return _db
+    try:
+        return registry.get_sync_database()
+    except Exception as e:
+        logger.error(f"MongoDB connection failed: {e}")
+        raise
 
 def test_connection():
     """Test database connection"""
     try:
         db = get_database()
+        db.client.admin.command('ping')
         count = db.master_stocks.count_documents({})
         logger.info(f"Connection test successful. Found {count} documents")
         return True
@@ -62,13 +155,10 @@ def test_connection():
 # Create a sync version for non-async contexts
 def get_sync_database():
     """
-    Creates a synchronous database connection
-    Returns the database instance
+    Returns the database instance backed by the shared synchronous client
     """
     try:
-        client = MongoClient(MONGODB_URL)
-        db_name = DATABASE_NAME
-        return client[db_name]
+        return registry.get_sync_database()
     except Exception as e:
         print(f"Error connecting to database: {e}")
-        raise 
\ No newline at end of file
+        raise
@@ -10,6 +10,9 @@ class ExchangeConfig(BaseModel):
     trading_hours: Dict[str, str]
     data_provider: str  # 'yfinance', 'alpha_vantage', etc.
     symbol_suffix: str  # '.NS' for NSE, '' for NYSE
+    benchmark_symbol: str = ""  # Index the exchange's holdings are compared with
+    benchmark_name: str = ""
+    calendar_code: str = ""  # exchange_calendars code supplying the holidays, e.g. 'XNYS'
     
 EXCHANGE_CONFIGS = {
     "NSE": ExchangeConfig(
@@ -20,7 +23,10 @@ EXCHANGE_CONFIGS = {
         timezone="Asia/Kolkata",
         trading_hours={"start": "09:15", "end": "15:30"},
         data_provider="yfinance",
-        symbol_suffix=".NS"
+        symbol_suffix=".NS",
+        benchmark_symbol="^NSEI",
+        benchmark_name="NIFTY 50",
+        calendar_code="XBOM"  # NSE and BSE close on the same days
     ),
     "NYSE": ExchangeConfig(
         code="NYSE",
@@ -30,7 +36,10 @@ EXCHANGE_CONFIGS = {
         timezone="America/New_York",
         trading_hours={"start": "09:30", "end": "16:00"},
         data_provider="yfinance",
-        symbol_suffix=""
+        symbol_suffix="",
+        benchmark_symbol="^GSPC",
+        benchmark_name="S&P 500",
+        calendar_code="XNYS"
     ),
     # Add more exchanges as needed
 }
\ No newline at end of file
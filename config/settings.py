@@ -8,6 +8,14 @@ load_dotenv()
 MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/portfolio_tracker')
 DATABASE_NAME = os.getenv("DATABASE_NAME", "portfolio_tracker")
 
+# MongoDB connection pool settings (shared by every client in the process)
+MONGODB_MAX_POOL_SIZE = int(os.getenv('MONGODB_MAX_POOL_SIZE', '50'))
+MONGODB_MIN_POOL_SIZE = int(os.getenv('MONGODB_MIN_POOL_SIZE', '0'))
+MONGODB_MAX_IDLE_TIME_MS = int(os.getenv('MONGODB_MAX_IDLE_TIME_MS', '300000'))
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv('MONGODB_CONNECT_TIMEOUT_MS', '5000'))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGODB_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+MONGODB_SOCKET_TIMEOUT_MS = int(os.getenv('MONGODB_SOCKET_TIMEOUT_MS', '30000'))
+
 # API settings
 API_V1_PREFIX = "/api/v1"
 PROJECT_NAME = "Portfolio Tracker"
@@ -18,3 +26,41 @@ EXCHANGE_RATE_API_KEY = os.getenv("EXCHANGE_RATE_API_KEY", "")
 
 # YFinance settings
 YFINANCE_TIMEOUT = 30
+
+# Stock master maintenance: provider calls in flight, calls per second,
+# seconds before a call is abandoned, and retries per symbol
+MAINTENANCE_CONCURRENCY = int(os.getenv("MAINTENANCE_CONCURRENCY", "8"))
+MAINTENANCE_RATE_LIMIT = float(os.getenv("MAINTENANCE_RATE_LIMIT", "5"))
+MAINTENANCE_TIMEOUT = float(os.getenv("MAINTENANCE_TIMEOUT", "15"))
+MAINTENANCE_RETRIES = int(os.getenv("MAINTENANCE_RETRIES", "3"))
+# Local copy of EQUITY_L.csv read instead of the NSE archive (offline runs)
+NSE_LISTING_FILE = os.getenv("NSE_LISTING_FILE", "")
+
+# Market price settings
+# Forces one provider for every exchange (e.g. 'fixture' for offline runs)
+PRICE_PROVIDER = os.getenv("PRICE_PROVIDER", "")
+# JSON file of {provider_symbol: price} served by the fixture provider
+PRICE_FIXTURE_FILE = os.getenv("PRICE_FIXTURE_FILE", "")
+# JSON file of {provider_symbol: [[date, open, high, low, close, volume], ...]} served
+# by the fixture history provider instead of yfinance during price ingestion
+HISTORY_FIXTURE_FILE = os.getenv("HISTORY_FIXTURE_FILE", "")
+# Collection holding daily bars; point at the time-series copy once
+# services.maintenance.migrate_timeseries has verified it
+HISTORY_COLLECTION = os.getenv("HISTORY_COLLECTION", "historical_prices")
+# Local columnar copy of historical_prices (Arrow files, one per symbol)
+HISTORY_CACHE_DIR = os.getenv("HISTORY_CACHE_DIR", ".cache/history")
+# Seconds before a cached symbol is checked against MongoDB for new bars
+HISTORY_CACHE_SYNC_SECONDS = int(os.getenv("HISTORY_CACHE_SYNC_SECONDS", "3600"))
+# JSON file of {exchange_code: ["YYYY-MM-DD", ...]} adding to the built-in holiday lists
+TRADING_HOLIDAYS_FILE = os.getenv("TRADING_HOLIDAYS_FILE", "")
+
+# Maintenance scheduler: seconds between due-job checks, and this node's
+# name in job locks and run history (defaults to host:pid)
+SCHEDULER_POLL_SECONDS = int(os.getenv("SCHEDULER_POLL_SECONDS", "30"))
+SCHEDULER_NODE_ID = os.getenv("SCHEDULER_NODE_ID", "")
+
+# Source of live price ticks for valuation streams: 'poll' or 'simulated'
+PRICE_FEED = os.getenv("PRICE_FEED", "poll")
+
+# Annual risk-free rate used for Sharpe ratios (e.g. 0.065 for 6.5%)
+RISK_FREE_RATE = float(os.getenv("RISK_FREE_RATE", "0.0"))
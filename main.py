@@ -1,12 +1,22 @@
-from fastapi import FastAPI, Request
+import asyncio
+import json
+import logging
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from api.routes import portfolios
-from config.settings import PROJECT_NAME, DEBUG
+from config.settings import PROJECT_NAME, DEBUG, PRICE_FEED
+from config.database import close_database_connections
+from services.currency_service import get_currency_service
+from services.price_service import get_price_service
+from services.snapshot_service import PortfolioSnapshotService
+from services.valuation_stream import STREAM_HEARTBEAT_INTERVAL, ValuationBroadcaster, SimulatedPriceFeed
 from services.portfolio_service import PortfolioService
 from services.stock_master_service import StockMasterService
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title=PROJECT_NAME,
@@ -31,6 +41,34 @@ templates = Jinja2Templates(directory="web/templates")
 # Portfolio service
 portfolio_service = PortfolioService()
 
+# Live valuation streams share one broadcaster and one price feed task
+valuation_broadcaster = ValuationBroadcaster(get_price_service(), portfolio_service)
+background_tasks = []
+
+# Keep portfolio snapshots repriced as market prices change
+@app.on_event("startup")
+async def start_snapshot_updates():
+    snapshot_service = PortfolioSnapshotService()
+    await snapshot_service.ensure_indexes()
+
+    if PRICE_FEED == "simulated":
+        # Simulated ticks only drive the streams; snapshots keep real prices
+        feed = SimulatedPriceFeed(valuation_broadcaster)
+        background_tasks.append(asyncio.create_task(feed.run()))
+    else:
+        get_price_service().add_listener(snapshot_service.on_prices)
+        background_tasks.append(asyncio.create_task(valuation_broadcaster.poll_prices()))
+    background_tasks.append(asyncio.create_task(valuation_broadcaster.watch_holdings()))
+
+# Release the shared MongoDB pools and HTTP sessions on shutdown
+@app.on_event("shutdown")
+async def shutdown_database():
+    for task in background_tasks:
+        task.cancel()
+    await get_currency_service().close()
+    get_price_service().close()
+    close_database_connections()
+
 # Stock service
 stock_service = StockMasterService()
 
@@ -61,6 +99,57 @@ async def new_portfolio(request: Request):
         print(f"Error: {e}")  # For debugging
         return {"detail": str(e)}
 
+# Live valuation deltas over WebSocket
+@app.websocket("/ws/portfolios/{portfolio_id}/valuation")
+async def portfolio_valuation_ws(websocket: WebSocket, portfolio_id: str):
+    await websocket.accept()
+    try:
+        subscriber = await valuation_broadcaster.subscribe(portfolio_id)
+    except ValueError as e:
+        await websocket.close(code=4404, reason=str(e))
+        return
+
+    async def send_updates():
+        async for update in subscriber.updates():
+            await websocket.send_json(update)
+
+    async def wait_for_disconnect():
+        # Clients send nothing; reading is how a closed socket is noticed while no updates flow
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    tasks = [asyncio.ensure_future(send_updates()), asyncio.ensure_future(wait_for_disconnect())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if not task.cancelled() and task.exception() is not None \
+                    and not isinstance(task.exception(), WebSocketDisconnect):
+                logger.error(f"Valuation stream for {portfolio_id} failed: {task.exception()}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        valuation_broadcaster.unsubscribe(portfolio_id, subscriber)
+
+# Live valuation deltas over Server-Sent Events
+@app.get("/portfolios/{portfolio_id}/valuation/stream")
+async def portfolio_valuation_sse(request: Request, portfolio_id: str):
+    try:
+        subscriber = await valuation_broadcaster.subscribe(portfolio_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    async def events():
+        try:
+            # The heartbeat bounds how long a departed client stays subscribed while prices are quiet
+            async for update in subscriber.updates(heartbeat=STREAM_HEARTBEAT_INTERVAL):
+                if await request.is_disconnected():
+                    break
+                yield ": keep-alive\n\n" if update is None else f"data: {json.dumps(update)}\n\n"
+        finally:
+            valuation_broadcaster.unsubscribe(portfolio_id, subscriber)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
 # Include portfolio routes
 app.include_router(
     portfolios.router,
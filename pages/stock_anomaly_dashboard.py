@@ -0,0 +1,129 @@
+import os
+import sys
+from datetime import datetime
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+
+# Add project root to path
+current_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from portfolio_tracker.config.database import get_sync_database
+from portfolio_tracker.services.anomaly_service import (
+    ANOMALY_WINDOW, ANOMALY_Z_THRESHOLD, get_anomalies, latest_anomaly_date, scan_anomalies
+)
+
+st.set_page_config(
+    page_title="Stock Anomaly Dashboard",
+    page_icon="🚨",
+    layout="wide"
+)
+
+# Stored anomaly tables only change when a scan runs, so reads can be cached for a while
+ANOMALY_CACHE_SECONDS = 300
+
+@st.cache_data(ttl=ANOMALY_CACHE_SECONDS, show_spinner=False)
+def load_latest_date():
+    return latest_anomaly_date(get_sync_database())
+
+@st.cache_data(ttl=ANOMALY_CACHE_SECONDS, show_spinner=False)
+def load_anomalies(day, min_score):
+    """Stored anomaly rows for one session as a DataFrame"""
+    rows = get_anomalies(get_sync_database(), datetime(day.year, day.month, day.day), min_score)
+    df = pd.DataFrame(rows)
+    if not df.empty:
+        df['flags'] = df['flags'].apply(', '.join)
+        df['return_pct'] = df['return'] * 100
+    return df
+
+def add_navigation():
+    st.sidebar.title("Navigation")
+    pages = {
+        "Portfolio Dashboard": ("portfolio_dashboard.py", "nav_portfolio"),
+        "Stock Anomaly Dashboard": ("pages/stock_anomaly_dashboard.py", "nav_anomaly"),
+        "Stock History Viewer": ("pages/stock_history_viewer.py", "nav_history")
+    }
+    for page_name, (page_script, key) in pages.items():
+        if st.sidebar.button(page_name, key=key):
+            st.switch_page(page_script)
+
+def main():
+    add_navigation()
+    st.title("Stock Anomaly Dashboard")
+    st.caption(
+        f"Daily returns and volumes scored against each stock's previous {ANOMALY_WINDOW} sessions"
+    )
+    
+    with st.sidebar:
+        if st.button("Scan latest session", key="scan_anomalies"):
+            with st.spinner("Scanning universe..."):
+                summary = scan_anomalies(get_sync_database())
+            load_latest_date.clear()
+            load_anomalies.clear()
+            st.success(
+                f"Scanned {summary['symbols']} symbols in {summary['seconds']:.1f}s: "
+                f"{summary['anomalies']} anomalies"
+            )
+    
+    latest = load_latest_date()
+    if latest is None:
+        st.info("No anomaly scans stored yet. Use 'Scan latest session' in the sidebar.")
+        return
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        selected_day = st.date_input("Session", value=latest.date(), max_value=latest.date())
+    with col2:
+        min_score = st.slider(
+            "Minimum |z-score|", min_value=ANOMALY_Z_THRESHOLD, max_value=10.0,
+            value=ANOMALY_Z_THRESHOLD, step=0.5
+        )
+    
+    anomalies = load_anomalies(selected_day, min_score)
+    if anomalies.empty:
+        st.warning(f"No anomalies stored for {selected_day.strftime('%Y-%m-%d')}")
+        return
+    
+    metric_col1, metric_col2, metric_col3 = st.columns(3)
+    with metric_col1:
+        st.metric("Anomalies", len(anomalies))
+    with metric_col2:
+        st.metric("Return Moves", int(anomalies['flags'].str.contains('return').sum()))
+    with metric_col3:
+        st.metric("Volume Spikes", int(anomalies['flags'].str.contains('volume').sum()))
+    
+    fig = px.scatter(
+        anomalies,
+        x='return_z',
+        y='volume_z',
+        hover_name='symbol',
+        hover_data={'return': ':.2%', 'volume_ratio': ':.1f', 'close': ':,.2f'},
+        color='flags',
+        labels={'return_z': 'Return z-score', 'volume_z': 'Volume z-score'}
+    )
+    fig.add_vline(x=ANOMALY_Z_THRESHOLD, line_dash='dot', line_color='gray')
+    fig.add_vline(x=-ANOMALY_Z_THRESHOLD, line_dash='dot', line_color='gray')
+    fig.add_hline(y=ANOMALY_Z_THRESHOLD, line_dash='dot', line_color='gray')
+    st.plotly_chart(fig, use_container_width=True)
+    
+    st.dataframe(
+        anomalies[['symbol', 'close', 'return_pct', 'return_z', 'volume', 'volume_ratio', 'volume_z', 'score', 'flags']],
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "symbol": st.column_config.TextColumn("Symbol"),
+            "close": st.column_config.NumberColumn("Close", format="%.2f"),
+            "return_pct": st.column_config.NumberColumn("Return", format="%.2f%%"),
+            "return_z": st.column_config.NumberColumn("Return z", format="%.2f"),
+            "volume": st.column_config.NumberColumn("Volume", format="%d"),
+            "volume_ratio": st.column_config.NumberColumn("Volume x Avg", format="%.1f"),
+            "volume_z": st.column_config.NumberColumn("Volume z", format="%.2f"),
+            "score": st.column_config.NumberColumn("Score", format="%.2f"),
+            "flags": st.column_config.TextColumn("Flags")
+        }
+    )
+
+if __name__ == "__main__":
+    main()
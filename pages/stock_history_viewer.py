@@ -0,0 +1,207 @@
+import os
+import sys
+import re
+from datetime import datetime, timedelta
+import streamlit as st
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+# Add project root to path
+current_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from portfolio_tracker.config.database import get_sync_database
+from portfolio_tracker.config.settings import HISTORY_COLLECTION
+from portfolio_tracker.services.price_matrix import symbol_spellings
+from portfolio_tracker.services.rollups import choose_resolution, load_bars, lttb, target_points
+from portfolio_tracker.services.indicators import compute_indicator
+
+st.set_page_config(
+    page_title="Stock History Viewer",
+    page_icon="📈",
+    layout="wide"
+)
+
+# Chart width in pixels; the visible range is loaded at a resolution that fits it
+CHART_WIDTH = 1400
+# Bars are re-read at most this often for a given symbol, range and resolution
+HISTORY_CACHE_SECONDS = 3600
+# Calendar days covered by one bar, used to size indicator warm-up
+DAYS_PER_BAR = {"day": 1.4, "week": 7, "month": 31}
+RANGE_PRESETS = {"1M": 30, "6M": 182, "1Y": 365, "5Y": 5 * 365, "10Y": 10 * 365, "20Y": 20 * 365}
+
+@st.cache_data(ttl=HISTORY_CACHE_SECONDS, show_spinner=False)
+def search_stocks(query):
+    """Active master stocks matching a symbol or name prefix"""
+    pattern = {"$regex": f"^{re.escape(query.strip())}", "$options": "i"}
+    cursor = get_sync_database().master_stocks.find(
+        {"status": {"$ne": "delisted"}, "$or": [{"identifiers.nse_code": pattern}, {"display_name": pattern}]},
+        {"_id": 0, "display_name": 1, "identifiers.nse_code": 1, "exchange_info.primary_exchange": 1}
+    ).limit(50)
+    return [
+        (doc["identifiers"]["nse_code"], doc.get("exchange_info", {}).get("primary_exchange", "NSE"),
+         doc.get("display_name", doc["identifiers"]["nse_code"]))
+        for doc in cursor if doc.get("identifiers", {}).get("nse_code")
+    ]
+
+def spellings_for(symbol, exchange):
+    return symbol_spellings([{"stock_symbol": symbol, "exchange_code": exchange}])
+
+@st.cache_data(ttl=HISTORY_CACHE_SECONDS, show_spinner=False)
+def first_bar_date(symbol, exchange):
+    doc = get_sync_database()[HISTORY_COLLECTION].find_one(
+        {"symbol": {"$in": list(spellings_for(symbol, exchange))}}, {"date": 1}, sort=[("date", 1)]
+    )
+    return doc["date"] if doc else None
+
+@st.cache_data(ttl=HISTORY_CACHE_SECONDS, show_spinner=False)
+def load_range(symbol, exchange, start, end, resolution):
+    """
+    Bars for [start, end] only, at the given resolution. Weekly and monthly
+    ranges fall back to LTTB-thinned daily bars when no rollups exist yet.
+    """
+    db = get_sync_database()
+    spellings = spellings_for(symbol, exchange)
+    bars = load_bars(db, spellings, start, end, resolution)
+    if not bars and resolution != "day":
+        bars = load_bars(db, spellings, start, end, "day")
+        if bars:
+            closes = np.array([float(str(bar["close"])) for bar in bars])
+            dates = np.array([bar["date"] for bar in bars], dtype="datetime64[D]").astype(np.int64)
+            bars = [bars[i] for i in lttb(dates, closes, target_points(CHART_WIDTH))]
+    df = pd.DataFrame(bars, columns=["date", "open", "high", "low", "close", "volume"])
+    for column in ["open", "high", "low", "close", "volume"]:
+        df[column] = pd.to_numeric(df[column].map(lambda value: str(value) if value is not None else None))
+    return df.drop_duplicates(subset="date", keep="last").reset_index(drop=True)
+
+@st.cache_data(ttl=HISTORY_CACHE_SECONDS, show_spinner=False)
+def load_indicator(symbol, exchange, start, end, resolution, name, window):
+    """One indicator over the loaded bars, cached per symbol, range, resolution and window"""
+    bars = load_range(symbol, exchange, start, end, resolution)
+    return compute_indicator(name, bars["close"].values, window)
+
+def add_navigation():
+    st.sidebar.title("Navigation")
+    pages = {
+        "Portfolio Dashboard": ("portfolio_dashboard.py", "nav_portfolio"),
+        "Stock Anomaly Dashboard": ("pages/stock_anomaly_dashboard.py", "nav_anomaly"),
+        "Stock History Viewer": ("pages/stock_history_viewer.py", "nav_history")
+    }
+    for page_name, (page_script, key) in pages.items():
+        if st.sidebar.button(page_name, key=key):
+            st.switch_page(page_script)
+
+def main():
+    add_navigation()
+    st.title("Stock History Viewer")
+    
+    query = st.text_input("Search symbol or company", value="RELIANCE")
+    matches = search_stocks(query) if query.strip() else []
+    if not matches:
+        st.info("No matching stocks")
+        return
+    symbol, exchange, _ = st.selectbox(
+        "Stock", options=matches, format_func=lambda match: f"{match[0]} - {match[2]}"
+    )
+    
+    first_date = first_bar_date(symbol, exchange)
+    if first_date is None:
+        st.warning(f"No price history stored for {symbol}")
+        return
+    today = datetime.now().date()
+    
+    # Visible range: presets and symbol changes set the slider state before it is drawn
+    if st.session_state.get("visible_symbol") != symbol:
+        st.session_state["visible_symbol"] = symbol
+        st.session_state["visible_range"] = (max(first_date.date(), today - timedelta(days=365)), today)
+    preset_cols = st.columns(len(RANGE_PRESETS) + 1)
+    for col, (label, days) in zip(preset_cols, list(RANGE_PRESETS.items()) + [("Max", None)]):
+        if col.button(label, key=f"range_{label}"):
+            st.session_state["visible_range"] = (
+                max(first_date.date(), today - timedelta(days=days)) if days else first_date.date(),
+                today
+            )
+    visible_start, visible_end = st.slider(
+        "Visible range",
+        min_value=first_date.date(),
+        max_value=today,
+        key="visible_range"
+    )
+    
+    with st.sidebar:
+        st.subheader("Indicators")
+        resolution_choice = st.selectbox("Resolution", ["auto", "day", "week", "month"])
+        sma_window = st.number_input("SMA window", 0, 400, 50)
+        ema_window = st.number_input("EMA span", 0, 400, 20)
+        bollinger_window = st.number_input("Bollinger window", 0, 200, 20)
+        rsi_period = st.number_input("RSI period", 0, 100, 14)
+    
+    start = datetime.combine(visible_start, datetime.min.time())
+    end = datetime.combine(visible_end, datetime.max.time())
+    resolution = (
+        choose_resolution(start, end, target_points(CHART_WIDTH))
+        if resolution_choice == "auto" else resolution_choice
+    )
+    
+    # Load enough bars before the visible range for the longest indicator to warm up
+    warmup_bars = max(sma_window, ema_window, bollinger_window, rsi_period + 1)
+    load_start = start - timedelta(days=int(warmup_bars * DAYS_PER_BAR[resolution]) + 7)
+    bars = load_range(symbol, exchange, load_start, end, resolution)
+    if bars.empty:
+        st.warning("No bars in the selected range")
+        return
+    visible = (bars["date"] >= start).values
+    
+    indicators = {}
+    for name, window in [("sma", sma_window), ("ema", ema_window), ("bollinger", bollinger_window), ("rsi", rsi_period)]:
+        if window:
+            indicators[name] = load_indicator(symbol, exchange, load_start, end, resolution, name, window)
+    
+    st.caption(f"{int(visible.sum())} {resolution} bars from {visible_start} to {visible_end}")
+    
+    fig = make_subplots(
+        rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.03,
+        row_heights=[0.6, 0.2, 0.2]
+    )
+    shown = bars[visible]
+    fig.add_trace(
+        go.Candlestick(
+            x=shown["date"], open=shown["open"], high=shown["high"],
+            low=shown["low"], close=shown["close"], name=symbol
+        ),
+        row=1, col=1
+    )
+    for name in ("sma", "ema", "bollinger"):
+        for line_name, series in indicators.get(name, {}).items():
+            fig.add_trace(
+                go.Scatter(
+                    x=shown["date"], y=series[visible], name=line_name, mode="lines",
+                    line=dict(width=1, dash="dot" if name == "bollinger" else "solid")
+                ),
+                row=1, col=1
+            )
+    fig.add_trace(
+        go.Bar(x=shown["date"], y=shown["volume"], name="Volume", marker_color="rgba(100, 100, 200, 0.5)"),
+        row=2, col=1
+    )
+    for line_name, series in indicators.get("rsi", {}).items():
+        fig.add_trace(
+            go.Scatter(x=shown["date"], y=series[visible], name=line_name, mode="lines"),
+            row=3, col=1
+        )
+        fig.add_hline(y=70, line_dash="dot", line_color="gray", row=3, col=1)
+        fig.add_hline(y=30, line_dash="dot", line_color="gray", row=3, col=1)
+    
+    fig.update_layout(
+        height=900,
+        width=CHART_WIDTH,
+        xaxis_rangeslider_visible=False,
+        margin=dict(l=50, r=50, t=50, b=50)
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+if __name__ == "__main__":
+    main()
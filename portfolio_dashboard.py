@@ -8,7 +8,6 @@ import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
-from pymongo import MongoClient
 from decimal import Decimal
 from portfolio_tracker.utils.streamlit_utils import create_common_header
 
@@ -17,7 +16,16 @@ current_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__
 project_root = os.path.dirname(current_dir)
 sys.path.append(project_root)
 
-from portfolio_tracker.config.settings import MONGODB_URI
+from portfolio_tracker.config.database import get_sync_client, get_sync_database
+from portfolio_tracker.services.price_matrix import symbol_spellings
+from portfolio_tracker.services.corporate_actions import load_adjusted_price_matrix
+from portfolio_tracker.services.close_prices import get_latest_closes
+from portfolio_tracker.services.price_service import is_market_open, next_market_open
+from portfolio_tracker.config.exchanges import EXCHANGE_CONFIGS
+from portfolio_tracker.config.calendars import sessions_for
+from portfolio_tracker.services.rollups import lttb, target_points
+from portfolio_tracker.services.performance_analytics import default_benchmark, portfolio_performance
+from portfolio_tracker.services.exposure_service import get_portfolio_exposures
 from portfolio_tracker.utils.logger import setup_logger
 
 logger = setup_logger('portfolio_dashboard')
@@ -28,10 +36,24 @@ st.set_page_config(
     layout="wide"
 )
 
+# Cached views are refreshed this often while any of the portfolio's exchanges trade
+OPEN_MARKET_CACHE_SECONDS = 300
+# Upper bound on how long any cached view is kept
+MAX_CACHE_SECONDS = 24 * 3600
+# Portfolio list refresh interval, so edits show up via updated_at
+PORTFOLIO_LIST_CACHE_SECONDS = 30
+# Chart width in pixels; long series are downsampled to fit it
+CHART_WIDTH = 1400
+# Benchmark indices offered for comparison, from the exchange configs
+BENCHMARKS = {
+    config.benchmark_symbol: config.benchmark_name
+    for config in EXCHANGE_CONFIGS.values() if config.benchmark_symbol
+}
+
 class PortfolioDashboard:
     def __init__(self):
-        self.client = MongoClient(MONGODB_URI)
-        self.db = self.client.portfolio_tracker
+        self.client = get_sync_client()
+        self.db = get_sync_database()
         self.time_periods = {
             "1 Day": 1,
             "2 Days": 2,
@@ -49,97 +71,69 @@ class PortfolioDashboard:
         """Get all portfolios from database"""
         return list(self.db.portfolios.find({}))
 
-    def get_portfolio_historical_data(self, portfolio, days):
-        """Get historical data for all stocks in portfolio"""
+    def get_portfolio_historical_data(self, portfolio, days, benchmark_symbol=None):
+        """Get historical data for all stocks in portfolio, plus an optional benchmark index"""
         try:
             end_date = datetime.now(pytz.UTC)
             start_date = end_date - timedelta(days=days)
-            
-            portfolio_history = []
-            total_value_history = {}
+            holdings = portfolio.get('holdings', [])
             
             logger.info(f"Fetching portfolio data from {start_date} to {end_date}")
-            logger.info(f"Portfolio holdings: {len(portfolio.get('holdings', []))}")
+            logger.info(f"Portfolio holdings: {len(holdings)}")
             
-            # Process each holding in portfolio
-            for holding in portfolio.get('holdings', []):
-                symbol = holding['stock_symbol']
-                exchange = holding['exchange_code']
-                quantity = float(str(holding['quantity']))
-                buy_price = float(str(holding.get('buy_price', 0)))  # Get buy price
-                
-                # Adjust symbol for NSE stocks if needed
-                query_symbol = symbol
-                if exchange == "NSE" and not symbol.endswith('.NS'):
-                    query_symbol = f"{symbol}.NS"
-                
-                logger.info(f"Querying historical data for {query_symbol} ({exchange})")
-                
-                # Get historical prices for this stock
-                historical_prices = list(self.db.historical_prices.find({
-                    "$or": [
-                        {"symbol": symbol},
-                        {"symbol": query_symbol}
-                    ],
-                    "date": {"$gte": start_date, "$lte": end_date}
-                }).sort("date", 1))  # Sort by date ascending
-                
-                logger.info(f"Found {len(historical_prices)} records for {symbol}")
-                
-                # Calculate daily values
-                for price_data in historical_prices:
-                    date = price_data['date'].replace(tzinfo=pytz.UTC)
-                    close_price = float(str(price_data['close']))
-                    value = close_price * quantity
-                    
-                    date_str = date.strftime('%Y-%m-%d')
-                    
-                    if date_str not in total_value_history:
-                        total_value_history[date_str] = 0
-                    total_value_history[date_str] += value
-                    
-                    portfolio_history.append({
-                        'date': date,
-                        'symbol': symbol,
-                        'close_price': close_price,
-                        'value': value,
-                        'buy_price': buy_price  # Add buy price to history
-                    })
+            # Holdings and benchmark index come from one price matrix load
+            spellings = symbol_spellings(holdings)
+            symbols = sorted(set(spellings.values()))
+            if benchmark_symbol:
+                spellings[benchmark_symbol] = benchmark_symbol
+            loaded = load_adjusted_price_matrix(self.db, spellings, start_date, end_date)
+            matrix = loaded.select(symbols)
             
-            if not portfolio_history:
+            if matrix.empty:
                 logger.warning("No historical data found for any stocks in portfolio")
                 return pd.DataFrame(), pd.DataFrame()
             
-            # Create date range DataFrame
-            date_range = pd.date_range(start=start_date.date(), end=end_date.date(), freq='D')
-            total_value_df = pd.DataFrame(index=date_range)
-            total_value_df.index.name = 'date'
-            
-            # Convert total_value_history to series
-            daily_values = pd.Series(total_value_history)
-            daily_values.index = pd.to_datetime(daily_values.index)
+            quantities = matrix.quantity_vector({})
+            buy_prices = np.zeros(len(matrix.symbols))
+            for holding in holdings:
+                i = matrix.symbol_index[holding['stock_symbol']]
+                quantities[i] += float(str(holding['quantity']))
+                buy_prices[i] = float(str(holding.get('buy_price', 0)))
             
-            # Assign values to DataFrame and sort
-            total_value_df['total_value'] = daily_values
+            # Per-row history from the raw bars, before any gap filling
+            has_price = ~np.isnan(matrix.prices)
+            date_rows, symbol_cols = np.nonzero(has_price)
+            portfolio_history = pd.DataFrame({
+                'date': pd.to_datetime(matrix.dates[date_rows]).tz_localize(pytz.UTC),
+                'symbol': np.array(matrix.symbols, dtype=object)[symbol_cols],
+                'close_price': matrix.prices[has_price],
+                'value': matrix.holding_values(quantities)[has_price],
+                'buy_price': buy_prices[symbol_cols]
+            })
             
-            # Backward fill first, then forward fill
-            total_value_df = total_value_df.bfill().ffill()
+            # Trading sessions of the portfolio's exchanges; a symbol without a bar
+            # on a session carries its last close, and sessions before its first
+            # bar take that first close
+            sessions = sessions_for(
+                [holding.get('exchange_code') for holding in holdings], start_date, end_date
+            )
+            daily = matrix.reindex(sessions).ffill().bfill()
             
-            # # Debug logging
-            # logger.info(f"Total value history entries: {len(total_value_history)}")
-            # if not total_value_df.empty:
-            #     logger.info(f"First date: {total_value_df.index[0]}")
-            #     logger.info(f"Last date: {total_value_df.index[-1]}")
-            #     logger.info(f"First value: ${total_value_df['total_value'].iloc[0]:.2f}")
-            #     logger.info(f"Last value: ${total_value_df['total_value'].iloc[-1]:.2f}")
+            result_df = pd.DataFrame({
+                'date': pd.to_datetime(sessions),
+                'total_value': daily.portfolio_value(quantities)
+            })
             
-            # Convert to DataFrame with reset index
-            result_df = total_value_df.reset_index()
-            # logger.info(f"Final DataFrame shape: {result_df.shape}")
-            # logger.info(f"Final DataFrame columns: {result_df.columns}")
-            # logger.info(f"Sample of final data:\n{result_df.head()}")
+            if benchmark_symbol:
+                # Index rebased to the portfolio's starting value for the overlay
+                closes = loaded.select([benchmark_symbol]).reindex(sessions).ffill().prices[:, 0]
+                known = np.flatnonzero(np.isfinite(closes))
+                if len(known):
+                    result_df['benchmark_value'] = (
+                        closes / closes[known[0]] * result_df['total_value'].iloc[known[0]]
+                    )
             
-            return pd.DataFrame(portfolio_history), result_df
+            return portfolio_history, result_df
             
         except Exception as e:
             logger.error(f"Error getting historical data: {e}")
@@ -151,44 +145,21 @@ class PortfolioDashboard:
         try:
             total_value = 0
             holdings_value = []
+            holdings = portfolio.get('holdings', [])
             
-            for holding in portfolio.get('holdings', []):
+            # Latest and previous close for every holding in one aggregation
+            latest_closes = get_latest_closes(self.db, symbol_spellings(holdings))
+            
+            for holding in holdings:
                 symbol = holding['stock_symbol']
-                exchange = holding['exchange_code']
                 quantity = float(str(holding['quantity']))
                 buy_price = float(str(holding.get('average_buy_price', 0)))
                 
-                # Adjust symbol for NSE stocks
-                query_symbol = symbol
-                if exchange == "NSE" and not symbol.endswith('.NS'):
-                    query_symbol = f"{symbol}.NS"
-                
-                # Get latest price and previous day price
-                latest_price = self.db.historical_prices.find_one(
-                    {
-                        "$or": [
-                            {"symbol": symbol},
-                            {"symbol": query_symbol}
-                        ]
-                    },
-                    sort=[("date", -1)]
-                )
-                
-                # Get previous day's price
-                previous_day_price = self.db.historical_prices.find_one(
-                    {
-                        "$or": [
-                            {"symbol": symbol},
-                            {"symbol": query_symbol}
-                        ],
-                        "date": {"$lt": latest_price['date']}
-                    },
-                    sort=[("date", -1)]
-                )
+                closes = latest_closes.get(symbol)
                 
-                if latest_price:
-                    current_price = float(str(latest_price['close']))
-                    prev_price = float(str(previous_day_price['close'])) if previous_day_price else current_price
+                if closes:
+                    last_price_date, current_price = closes[0]
+                    prev_price = closes[1][1] if len(closes) > 1 else current_price
                     value = current_price * quantity
                     total_value += value
                     
@@ -212,7 +183,7 @@ class PortfolioDashboard:
                         'one_day_pl': one_day_pl,
                         'one_day_pl_percentage': one_day_pl_percentage,
                         'weight': 0,  # Will be calculated after
-                        'last_price_date': latest_price['date']
+                        'last_price_date': last_price_date
                     })
             
             # Calculate weights after all values are collected
@@ -226,64 +197,16 @@ class PortfolioDashboard:
             logger.exception(e)
             return 0, []
 
-    def get_portfolio_sectors(self, portfolio):
-        """Get sector composition of the portfolio"""
+    def get_portfolio_exposures(self, portfolio):
+        """Sector, industry, exchange and currency composition of the portfolio"""
         try:
-            holdings = portfolio.get('holdings', [])
-            if not holdings:
-                return {}
-            
-            # Get all stock symbols in the portfolio
-            symbols = [holding['stock_symbol'] for holding in holdings]
-            
-            # Get sector information for these stocks
-            stocks_info = list(self.db.stocks.find(
-                {"symbol": {"$in": symbols}},
-                {"symbol": 1, "sector": 1}
-            ))
-            
-            # Create symbol to sector mapping
-            sector_map = {stock['symbol']: stock.get('sector', 'Unknown') 
-                         for stock in stocks_info}
-            
-            # Get latest prices for all symbols
-            current_prices = {}
-            for symbol in symbols:
-                latest_price = self.db.historical_prices.find_one(
-                    {"symbol": symbol},
-                    sort=[("date", -1)]  # Sort by date descending to get latest
-                )
-                if latest_price:
-                    current_prices[symbol] = float(str(latest_price.get('close', 0)))
-            
-            # Calculate sector-wise values
-            sector_values = {}
-            for holding in holdings:
-                try:
-                    symbol = holding['stock_symbol']
-                    # Convert Decimal128 quantity to float
-                    quantity = float(str(holding['quantity']))
-                    current_price = current_prices.get(symbol, 0)
-                    value = quantity * current_price
-                    sector = sector_map.get(symbol, 'Unknown')
-                    
-                    if sector in sector_values:
-                        sector_values[sector] += value
-                    else:
-                        sector_values[sector] = value
-                        
-                except Exception as e:
-                    logger.error(f"Error processing holding {symbol}: {str(e)}")
-                    continue
-                
-            return sector_values
-            
+            return get_portfolio_exposures(self.db, portfolio)
         except Exception as e:
-            logger.error(f"Error getting portfolio sectors: {str(e)}")
+            logger.error(f"Error getting portfolio exposures: {str(e)}")
             return {}
 
     def create_portfolio_charts(self, history_df, total_value_df, holdings_value, 
-                              start_date, end_date, currency, portfolio):
+                              start_date, end_date, currency, portfolio, benchmark_symbol=None):
         """Create portfolio charts including sector composition"""
         currency_symbol = get_currency_symbol(currency)
         
@@ -303,11 +226,18 @@ class PortfolioDashboard:
             row_heights=[0.4, 0.3, 0.3]  # Adjusted heights
         )
         
-        # Portfolio value line chart
+        # Portfolio value line chart, downsampled to what the chart width can show
+        value_df = total_value_df.dropna(subset=['total_value'])
+        keep = lttb(
+            value_df['date'].values.astype('datetime64[D]').astype(np.int64),
+            value_df['total_value'].values,
+            target_points(CHART_WIDTH)
+        )
+        value_df = value_df.iloc[keep]
         fig.add_trace(
             go.Scatter(
-                x=total_value_df['date'],
-                y=total_value_df['total_value'],
+                x=value_df['date'],
+                y=value_df['total_value'],
                 name="Total Value",
                 line=dict(color='blue'),
                 hovertemplate=currency_symbol + "%{y:,.2f}<extra></extra>"
@@ -315,6 +245,18 @@ class PortfolioDashboard:
             row=1, col=1
         )
         
+        if 'benchmark_value' in value_df:
+            fig.add_trace(
+                go.Scatter(
+                    x=value_df['date'],
+                    y=value_df['benchmark_value'],
+                    name=BENCHMARKS.get(benchmark_symbol, benchmark_symbol),
+                    line=dict(color='gray', dash='dash'),
+                    hovertemplate=currency_symbol + "%{y:,.2f}<extra></extra>"
+                ),
+                row=1, col=1
+            )
+        
         # Holdings pie chart
         show_percentages = len(holdings_value) <= 15
         fig.add_trace(
@@ -358,7 +300,7 @@ class PortfolioDashboard:
         # Update layout
         fig.update_layout(
             height=1200,  # Adjusted height
-            width=1400,
+            width=CHART_WIDTH,
             showlegend=True,
             title_text="Portfolio Dashboard",
             title_x=0.5,
@@ -370,6 +312,67 @@ class PortfolioDashboard:
         
         return fig
 
+@st.cache_resource
+def get_dashboard():
+    """One PortfolioDashboard (and MongoDB client) shared by every rerun and session"""
+    return PortfolioDashboard()
+
+def market_cache_key(portfolio):
+    """
+    Cache key component that follows market hours: it rolls every few
+    minutes while any of the portfolio's exchanges is open and stays fixed
+    from the close until the next open.
+    """
+    now = datetime.now(pytz.UTC)
+    exchange_codes = sorted({
+        holding.get('exchange_code') for holding in portfolio.get('holdings', [])
+    } & set(EXCHANGE_CONFIGS))
+    parts = []
+    for code in exchange_codes:
+        exchange_config = EXCHANGE_CONFIGS[code]
+        if is_market_open(exchange_config, now):
+            parts.append(f"{code}:open:{int(now.timestamp()) // OPEN_MARKET_CACHE_SECONDS}")
+        else:
+            parts.append(f"{code}:closed:{next_market_open(exchange_config, now).isoformat()}")
+    return "|".join(parts)
+
+@st.cache_data(ttl=PORTFOLIO_LIST_CACHE_SECONDS, show_spinner=False)
+def load_portfolios():
+    return get_dashboard().get_all_portfolios()
+
+@st.cache_data(ttl=MAX_CACHE_SECONDS, show_spinner=False)
+def load_portfolio_history(portfolio_id, updated_at, days, market_key, benchmark_symbol, _portfolio):
+    """Historical series for a portfolio; keyed on id, period, benchmark, updated_at and market state"""
+    return get_dashboard().get_portfolio_historical_data(_portfolio, days, benchmark_symbol)
+
+@st.cache_data(ttl=MAX_CACHE_SECONDS, show_spinner=False)
+def load_current_value(portfolio_id, updated_at, market_key, _portfolio):
+    """Current valuation for a portfolio; independent of the selected period"""
+    return get_dashboard().get_current_portfolio_value(_portfolio)
+
+@st.cache_data(ttl=MAX_CACHE_SECONDS, show_spinner=False)
+def load_exposures(portfolio_id, updated_at, market_key, _portfolio):
+    """Exposure weights for a portfolio version; independent of the selected period"""
+    return get_dashboard().get_portfolio_exposures(_portfolio)
+
+@st.cache_data(ttl=MAX_CACHE_SECONDS, show_spinner=False)
+def load_performance(portfolio_id, updated_at, days, market_key, benchmark_symbol, _portfolio):
+    """Cash-flow aware performance metrics for the selected period"""
+    end_date = datetime.now(pytz.UTC)
+    return portfolio_performance(
+        get_dashboard().db, _portfolio, end_date - timedelta(days=days), end_date,
+        benchmark_symbol=benchmark_symbol
+    )
+
+@st.cache_data(ttl=MAX_CACHE_SECONDS, show_spinner=False)
+def load_portfolio_figure(portfolio_id, updated_at, days, market_key, benchmark_symbol, start_day, end_day,
+                          currency, _history_df, _total_value_df, _holdings_value, _portfolio):
+    """Plotly figure for a portfolio view, built once per data version"""
+    return get_dashboard().create_portfolio_charts(
+        _history_df, _total_value_df, _holdings_value,
+        start_day, end_day, currency, _portfolio, benchmark_symbol
+    )
+
 def get_currency_symbol(currency):
     """Return currency symbol based on currency code"""
     currency_symbols = {
@@ -406,15 +409,15 @@ def main():
     
     st.title("Portfolio Dashboard")
     
-    dashboard = PortfolioDashboard()
-    portfolios = dashboard.get_all_portfolios()
+    dashboard = get_dashboard()
+    portfolios = load_portfolios()
     
     if not portfolios:
         st.warning("No portfolios found")
         return
     
-    # Create two columns for portfolio and time period selection
-    col1, col2 = st.columns(2)
+    # Create columns for portfolio, time period and benchmark selection
+    col1, col2, col3 = st.columns(3)
     
     with col1:
         selected_portfolio = st.selectbox(
@@ -429,6 +432,18 @@ def main():
             options=list(dashboard.time_periods.keys())
         )
     
+    with col3:
+        benchmark_options = [None] + list(BENCHMARKS)
+        default_index = benchmark_options.index(
+            default_benchmark(selected_portfolio.get('holdings', [])) if selected_portfolio else None
+        )
+        benchmark_symbol = st.selectbox(
+            "Compare With",
+            options=benchmark_options,
+            index=default_index,
+            format_func=lambda symbol: BENCHMARKS.get(symbol, "None")
+        )
+    
     if selected_portfolio and selected_period:
         currency = selected_portfolio.get('currency', 'USD')
         currency_symbol = get_currency_symbol(currency)
@@ -439,13 +454,17 @@ def main():
         
         st.write(f"**Date Range:** {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
         
-        history_df, total_value_df = dashboard.get_portfolio_historical_data(
-            selected_portfolio,
-            days
+        # Cache keys: switching periods back and forth is served from memory
+        portfolio_id = str(selected_portfolio['_id'])
+        updated_at = str(selected_portfolio.get('updated_at'))
+        market_key = market_cache_key(selected_portfolio)
+        
+        history_df, total_value_df = load_portfolio_history(
+            portfolio_id, updated_at, days, market_key, benchmark_symbol, selected_portfolio
         )
         
-        current_value, holdings_value = dashboard.get_current_portfolio_value(
-            selected_portfolio
+        current_value, holdings_value = load_current_value(
+            portfolio_id, updated_at, market_key, selected_portfolio
         )
         
         # Calculate total P/L
@@ -493,13 +512,18 @@ def main():
         
         # Create and display charts with proper currency and portfolio info
         if not history_df.empty and not total_value_df.empty:
-            fig = dashboard.create_portfolio_charts(
+            fig = load_portfolio_figure(
+                portfolio_id,
+                updated_at,
+                days,
+                market_key,
+                benchmark_symbol,
+                start_date.date(),
+                end_date.date(),
+                currency,
                 history_df,
                 total_value_df,
                 holdings_value,
-                start_date,
-                end_date,
-                currency,
                 selected_portfolio
             )
             st.plotly_chart(fig, use_container_width=True)
@@ -629,25 +653,107 @@ def main():
                 }
             )
         
+        # Exposure by sector, industry, exchange and currency
+        exposures = load_exposures(portfolio_id, updated_at, market_key, selected_portfolio)
+        if exposures and exposures['total_value'] > 0:
+            st.subheader("Exposure")
+            dimension_tabs = st.tabs(["Sector", "Industry", "Exchange", "Currency"])
+            for tab, dimension in zip(dimension_tabs, ("sector", "industry", "exchange", "currency")):
+                with tab:
+                    exposure_df = pd.DataFrame(exposures['exposures'][dimension])
+                    chart_col, table_col = st.columns([2, 1])
+                    with chart_col:
+                        st.plotly_chart(
+                            px.pie(exposure_df, names='name', values='value', hole=0.4),
+                            use_container_width=True,
+                            key=f"exposure_{dimension}"
+                        )
+                    with table_col:
+                        st.dataframe(
+                            exposure_df,
+                            use_container_width=True,
+                            hide_index=True,
+                            column_config={
+                                "name": st.column_config.TextColumn(dimension.title()),
+                                "value": st.column_config.NumberColumn(
+                                    "Value", format=f"{currency_symbol}%.2f"
+                                ),
+                                "weight": st.column_config.NumberColumn("Weight %", format="%.2f%%")
+                            }
+                        )
+            if exposures['unclassified']:
+                st.caption(f"Not found in the stock master: {', '.join(exposures['unclassified'])}")
+        
         # Display performance metrics with date context
         if not total_value_df.empty:
             st.subheader(f"Performance Metrics ({selected_period})")
-            metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
+            performance = load_performance(
+                portfolio_id, updated_at, days, market_key, benchmark_symbol, selected_portfolio
+            )
             
-            # Calculate metrics
-            start_value = total_value_df['total_value'].iloc[0]
-            end_value = total_value_df['total_value'].iloc[-1]
-            absolute_return = end_value - start_value
-            percent_return = (absolute_return / start_value * 100) if start_value > 0 else 0
+            def format_percent(value):
+                return f"{value * 100:.2f}%" if value is not None else "—"
             
-            with metric_col1:
-                st.metric("Absolute Return", f"{currency_symbol}{absolute_return:,.2f}")
-            with metric_col2:
-                st.metric("Percent Return", f"{percent_return:.2f}%")
-            with metric_col3:
-                st.metric("Number of Holdings", len(holdings_value))
-            with metric_col4:
-                st.metric("Days in Period", days)
+            if performance:
+                metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
+                with metric_col1:
+                    st.metric(
+                        "Absolute Return",
+                        f"{currency_symbol}{performance['absolute_return']:,.2f}",
+                        help="Change in value net of buys and sells"
+                    )
+                with metric_col2:
+                    st.metric(
+                        "Time-Weighted Return",
+                        format_percent(performance['time_weighted_return']),
+                        delta=f"{format_percent(performance['annualised_twr'])} p.a."
+                        if performance['annualised_twr'] is not None else None
+                    )
+                with metric_col3:
+                    st.metric(
+                        "XIRR",
+                        format_percent(performance['xirr']),
+                        help="Money-weighted annual return including cash flows"
+                    )
+                with metric_col4:
+                    st.metric(
+                        "Net Cash Flows",
+                        f"{currency_symbol}{performance['net_flows']:,.2f}"
+                    )
+                
+                metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
+                with metric_col1:
+                    st.metric("Volatility (ann.)", format_percent(performance['volatility']))
+                with metric_col2:
+                    st.metric(
+                        "Max Drawdown",
+                        format_percent(performance['max_drawdown']),
+                        help=f"{performance['drawdown_peak_date']} to {performance['drawdown_trough_date']}"
+                    )
+                with metric_col3:
+                    sharpe = performance['sharpe_ratio']
+                    st.metric("Sharpe Ratio", f"{sharpe:.2f}" if sharpe is not None else "—")
+                with metric_col4:
+                    st.metric("Number of Holdings", len(holdings_value))
+                
+                if 'benchmark_return' in performance:
+                    benchmark_name = BENCHMARKS.get(performance['benchmark'], performance['benchmark'])
+                    metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
+                    with metric_col1:
+                        st.metric(f"{benchmark_name} Return", format_percent(performance['benchmark_return']))
+                    with metric_col2:
+                        st.metric(
+                            "Relative Return",
+                            format_percent(performance['relative_return']),
+                            help=f"Portfolio time-weighted return minus {benchmark_name}"
+                        )
+                    with metric_col3:
+                        beta = performance['beta']
+                        st.metric("Beta", f"{beta:.2f}" if beta is not None else "—")
+                    with metric_col4:
+                        st.metric("Tracking Error (ann.)", format_percent(performance['tracking_error']))
+            else:
+                st.info("Not enough price history to compute performance metrics")
             
             # Add time period context
             st.caption(
@@ -0,0 +1,187 @@
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import numpy as np
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+from config.calendars import get_calendar
+from services.corporate_actions import load_adjusted_price_matrix
+from services.price_matrix import PriceMatrix, symbol_spellings
+
+logger = logging.getLogger(__name__)
+
+ANOMALY_COLLECTION = "stock_anomalies"
+# Sessions of history each day's return and volume are scored against
+ANOMALY_WINDOW = 20
+# Fewest prior sessions needed before a symbol is scored
+ANOMALY_MIN_PERIODS = 10
+# |z| at or above which a return or volume is flagged
+ANOMALY_Z_THRESHOLD = 3.0
+ANOMALY_EXCHANGE = "NSE"
+UPSERT_CHUNK_SIZE = 1000
+
+
+def ensure_anomaly_indexes(db):
+    db[ANOMALY_COLLECTION].create_index([("date", DESCENDING), ("symbol", ASCENDING)], unique=True)
+    db[ANOMALY_COLLECTION].create_index([("date", DESCENDING), ("score", DESCENDING)])
+
+
+def universe_spellings(db, exchange_code: str = ANOMALY_EXCHANGE) -> Dict[str, str]:
+    """Every stored spelling of each active master stock's symbol on the exchange"""
+    cursor = db.master_stocks.find(
+        {"status": {"$ne": "delisted"}, "identifiers.nse_code": {"$exists": True, "$ne": ""}},
+        {"_id": 0, "identifiers.nse_code": 1}
+    )
+    return symbol_spellings(
+        {"stock_symbol": doc["identifiers"]["nse_code"], "exchange_code": exchange_code} for doc in cursor
+    )
+
+
+def trailing_mean_std(values: np.ndarray, window: int = ANOMALY_WINDOW,
+                      min_periods: int = ANOMALY_MIN_PERIODS):
+    """
+    Mean and sample standard deviation over the `window` rows before each
+    row (the row itself excluded), per column, from cumulative sums so the
+    cost does not depend on the window. NaNs are skipped; rows with fewer
+    than `min_periods` observations come back NaN.
+    """
+    valid = np.isfinite(values)
+    filled = np.where(valid, values, 0.0)
+    zeros = np.zeros((1, values.shape[1]))
+    counts = np.concatenate([zeros, np.cumsum(valid, axis=0)])
+    sums = np.concatenate([zeros, np.cumsum(filled, axis=0)])
+    squares = np.concatenate([zeros, np.cumsum(filled * filled, axis=0)])
+
+    # Rows [i - window, i) for every i
+    end = np.arange(values.shape[0])
+    start = np.maximum(end - window, 0)
+    n = counts[end] - counts[start]
+    total = sums[end] - sums[start]
+    total_squares = squares[end] - squares[start]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / n
+        variance = (total_squares - n * mean * mean) / (n - 1)
+        std = np.sqrt(np.maximum(variance, 0.0))
+    enough = n >= max(min_periods, 2)
+    return np.where(enough, mean, np.nan), np.where(enough, std, np.nan)
+
+
+def zscores(values: np.ndarray, window: int = ANOMALY_WINDOW,
+            min_periods: int = ANOMALY_MIN_PERIODS) -> np.ndarray:
+    """How many trailing standard deviations each value is from its trailing mean"""
+    mean, std = trailing_mean_std(values, window, min_periods)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(std > 0, (values - mean) / std, np.nan)
+
+
+def score_anomalies(closes: PriceMatrix, volumes: PriceMatrix, window: int = ANOMALY_WINDOW,
+                    min_periods: int = ANOMALY_MIN_PERIODS) -> Dict[str, np.ndarray]:
+    """
+    Return and volume z-scores for every symbol and session at once, as
+    sessions x symbols matrices aligned with `closes`. Volumes are scored
+    in log space so a spike is measured relative to the usual level.
+    """
+    returns = np.full(closes.prices.shape, np.nan)
+    returns[1:] = closes.daily_returns()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_volume = np.where(volumes.prices > 0, np.log(volumes.prices), np.nan)
+        volume_mean = np.exp(trailing_mean_std(log_volume, window, min_periods)[0])
+    return {
+        "returns": returns,
+        "return_z": zscores(returns, window, min_periods),
+        "volume_z": zscores(log_volume, window, min_periods),
+        "volume_ratio": volumes.prices / volume_mean
+    }
+
+
+def anomaly_rows(closes: PriceMatrix, volumes: PriceMatrix, scores: Dict[str, np.ndarray],
+                 rows: np.ndarray, threshold: float = ANOMALY_Z_THRESHOLD) -> List[Dict]:
+    """Table rows for the flagged (session, symbol) cells among the given session rows"""
+    return_z = scores["return_z"][rows]
+    volume_z = scores["volume_z"][rows]
+    score = np.fmax(np.abs(return_z), volume_z)
+    flagged_rows, flagged_cols = np.nonzero(score >= threshold)
+
+    table = []
+    for r, c in zip(flagged_rows, flagged_cols):
+        row = rows[r]
+        flags = []
+        if abs(return_z[r, c]) >= threshold:
+            flags.append("return")
+        if volume_z[r, c] >= threshold:
+            flags.append("volume")
+        day = closes.dates[row].item()
+        table.append({
+            "date": datetime(day.year, day.month, day.day),
+            "symbol": closes.symbols[c],
+            "close": float(closes.prices[row, c]),
+            "return": float(scores["returns"][row, c]),
+            "return_z": float(return_z[r, c]),
+            "volume": float(volumes.prices[row, c]) if np.isfinite(volumes.prices[row, c]) else None,
+            "volume_z": float(volume_z[r, c]) if np.isfinite(volume_z[r, c]) else None,
+            "volume_ratio": float(scores["volume_ratio"][row, c])
+            if np.isfinite(scores["volume_ratio"][row, c]) else None,
+            "score": float(score[r, c]),
+            "flags": flags
+        })
+    return table
+
+
+def scan_anomalies(db, as_of: Optional[datetime] = None, sessions: int = 1,
+                   window: int = ANOMALY_WINDOW, threshold: float = ANOMALY_Z_THRESHOLD,
+                   spellings: Optional[Dict[str, str]] = None) -> Dict:
+    """
+    Score the whole universe for the last `sessions` sessions up to `as_of`
+    and store the flagged rows in the anomaly table, replacing whatever was
+    stored for those dates. Returns a summary of the run.
+    """
+    started = time.perf_counter()
+    as_of = as_of or datetime.utcnow()
+    spellings = spellings if spellings is not None else universe_spellings(db)
+    # Enough calendar days to cover the scoring window plus holidays
+    start_date = as_of - timedelta(days=int((window + sessions) * 7 / 5) + 15)
+
+    # Split/bonus adjusted so an ex-date does not show up as a crash and a volume spike
+    closes = load_adjusted_price_matrix(db, spellings, start_date, as_of, field="close")
+    volumes = load_adjusted_price_matrix(db, spellings, start_date, as_of, field="volume")
+    trading_days = get_calendar(ANOMALY_EXCHANGE).sessions(closes.dates[0], as_of) if len(closes.dates) else []
+    closes = closes.reindex(trading_days)
+    volumes = volumes.reindex(trading_days)
+
+    scores = score_anomalies(closes, volumes, window)
+    rows = np.arange(max(len(closes.dates) - sessions, 0), len(closes.dates))
+    table = anomaly_rows(closes, volumes, scores, rows, threshold)
+
+    ensure_anomaly_indexes(db)
+    dates = [datetime(d.year, d.month, d.day) for d in (closes.dates[row].item() for row in rows)]
+    if dates:
+        db[ANOMALY_COLLECTION].delete_many({"date": {"$in": dates}})
+    for i in range(0, len(table), UPSERT_CHUNK_SIZE):
+        db[ANOMALY_COLLECTION].bulk_write([
+            UpdateOne({"date": row["date"], "symbol": row["symbol"]}, {"$set": row}, upsert=True)
+            for row in table[i:i + UPSERT_CHUNK_SIZE]
+        ], ordered=False)
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Anomaly scan: {len(closes.symbols)} symbols, {len(table)} anomalies "
+                f"on {len(dates)} sessions in {elapsed:.2f}s")
+    return {
+        "symbols": len(closes.symbols),
+        "dates": [d.strftime('%Y-%m-%d') for d in dates],
+        "anomalies": len(table),
+        "seconds": elapsed
+    }
+
+
+def latest_anomaly_date(db) -> Optional[datetime]:
+    doc = db[ANOMALY_COLLECTION].find_one({}, {"date": 1}, sort=[("date", DESCENDING)])
+    return doc["date"] if doc else None
+
+
+def get_anomalies(db, date: datetime, min_score: float = ANOMALY_Z_THRESHOLD) -> List[Dict]:
+    """Stored anomalies for one session, strongest first"""
+    return list(db[ANOMALY_COLLECTION].find(
+        {"date": date, "score": {"$gte": min_score}},
+        {"_id": 0}
+    ).sort("score", DESCENDING))
@@ -0,0 +1,105 @@
+import threading
+import time
+from typing import Dict, Iterator, List, Tuple
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING
+
+from config.settings import HISTORY_COLLECTION
+
+# Seconds a symbol's latest closes are served from memory
+LATEST_CLOSE_TTL = 300
+
+_indexed_databases = set()
+
+
+def ensure_history_indexes(db):
+    """(symbol, date) index backing range reads and latest-close lookups"""
+    key = (id(db.client), db.name)
+    if key not in _indexed_databases:
+        db[HISTORY_COLLECTION].create_index([("symbol", ASCENDING), ("date", DESCENDING)])
+        _indexed_databases.add(key)
+
+
+def is_timeseries_collection(db, name: str = HISTORY_COLLECTION) -> bool:
+    """Whether the bar collection is a MongoDB time-series collection"""
+    info = next(iter(db.list_collections(filter={"name": name})), None)
+    return bool(info) and info.get("type") == "timeseries"
+
+
+def _latest_bars(db, stored_symbols: List[str], count: int) -> Iterator[Tuple[str, Dict]]:
+    """
+    (stored symbol, bar) for the `count` newest bars of each symbol, from
+    one aggregation: the $sort walks the (symbol, date desc) index and
+    $firstN keeps the first `count` bars of every symbol.
+    """
+    pipeline = [
+        {"$match": {"symbol": {"$in": stored_symbols}}},
+        {"$sort": {"symbol": ASCENDING, "date": DESCENDING}},
+        {"$group": {"_id": "$symbol", "bars": {"$firstN": {
+            "n": count, "input": {"date": "$date", "close": "$close"}
+        }}}}
+    ]
+    for doc in db[HISTORY_COLLECTION].aggregate(pipeline):
+        for bar in doc["bars"]:
+            yield doc["_id"], bar
+
+
+def query_latest_closes(db, spellings: Dict[str, str], count: int = 2) -> Dict[str, List[Tuple[datetime, float]]]:
+    """
+    The `count` most recent (date, close) pairs for every symbol, newest
+    first. `spellings` maps stored symbols to the symbol they are reported
+    under; bars from all spellings are merged.
+    """
+    ensure_history_indexes(db)
+    merged: Dict[str, List[Tuple[datetime, float]]] = {}
+    for stored, bar in _latest_bars(db, list(spellings), count):
+        merged.setdefault(spellings[stored], []).append((bar["date"], float(str(bar["close"]))))
+
+    return {
+        symbol: sorted(closes, key=lambda bar: bar[0], reverse=True)[:count]
+        for symbol, closes in merged.items()
+    }
+
+
+class LatestCloseCache:
+    """Small TTL cache over query_latest_closes; misses are fetched together in one call"""
+
+    def __init__(self, ttl: float = LATEST_CLOSE_TTL):
+        self.ttl = ttl
+        self.entries: Dict[str, Tuple[List[Tuple[datetime, float]], float]] = {}
+        self.lock = threading.Lock()
+
+    def get(self, db, spellings: Dict[str, str]) -> Dict[str, List[Tuple[datetime, float]]]:
+        now = time.monotonic()
+        result = {}
+        missing = {}
+        with self.lock:
+            for stored, symbol in spellings.items():
+                entry = self.entries.get(symbol)
+                if entry and entry[1] > now:
+                    result[symbol] = entry[0]
+                else:
+                    missing[stored] = symbol
+
+        if missing:
+            fetched = query_latest_closes(db, missing)
+            expires_at = time.monotonic() + self.ttl
+            with self.lock:
+                for symbol in set(missing.values()):
+                    closes = fetched.get(symbol, [])
+                    self.entries[symbol] = (closes, expires_at)
+                    result[symbol] = closes
+
+        return {symbol: closes for symbol, closes in result.items() if closes}
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_latest_close_cache = LatestCloseCache()
+
+
+def get_latest_closes(db, spellings: Dict[str, str]) -> Dict[str, List[Tuple[datetime, float]]]:
+    """Latest and previous close per symbol, via the process-wide cache"""
+    return _latest_close_cache.get(db, spellings)
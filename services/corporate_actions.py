@@ -0,0 +1,232 @@
+import logging
+import time
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+import numpy as np
+from bson.decimal128 import Decimal128
+from pymongo import ASCENDING, UpdateMany
+
+from services.history_cache import load_price_matrix
+from services.price_matrix import PriceMatrix
+from services.snapshot_service import SNAPSHOT_COLLECTION, listing_key
+
+logger = logging.getLogger(__name__)
+
+ACTIONS_COLLECTION = "corporate_actions"
+ACTION_TYPES = ("split", "bonus")
+# Bar fields that scale with the share count rather than against it
+QUANTITY_FIELDS = ("volume",)
+
+# symbol -> (ex-dates ascending, cumulative factor before each ex-date with a trailing 1)
+FactorTable = Dict[str, Tuple[np.ndarray, np.ndarray]]
+
+
+def ensure_action_indexes(db):
+    db[ACTIONS_COLLECTION].create_index(
+        [("symbol", ASCENDING), ("ex_date", ASCENDING), ("action_type", ASCENDING)],
+        unique=True
+    )
+
+
+def action_factor(action_type: str, numerator: float, denominator: float) -> float:
+    """
+    Shares held after the action per share held before it. A 1:5 split
+    (one share into five) is numerator=5, denominator=1; a 1:2 bonus (one
+    new share for every two held) is numerator=1, denominator=2.
+    """
+    if action_type == "split":
+        return numerator / denominator
+    if action_type == "bonus":
+        return (numerator + denominator) / denominator
+    raise ValueError(f"Unsupported corporate action: {action_type}")
+
+
+def share_ratio(action: Dict) -> Tuple[Decimal128, Decimal128]:
+    """
+    (shares after, shares before) of an action as exact decimals, so
+    holdings can be scaled by multiplying then dividing instead of by the
+    rounded float factor
+    """
+    numerator = Decimal(str(action["numerator"]))
+    denominator = Decimal(str(action["denominator"]))
+    after = numerator + denominator if action["action_type"] == "bonus" else numerator
+    return Decimal128(after), Decimal128(denominator)
+
+
+def record_action(db, symbol: str, ex_date: datetime, action_type: str,
+                  numerator: float, denominator: float) -> Dict:
+    """
+    Store (or correct) a split or bonus for an NSE symbol; returns the
+    stored action. An action already applied to holdings cannot have its
+    ratio changed.
+    """
+    factor = action_factor(action_type, numerator, denominator)
+    ensure_action_indexes(db)
+    ex_date = datetime(ex_date.year, ex_date.month, ex_date.day)
+    key = {"symbol": symbol, "ex_date": ex_date, "action_type": action_type}
+    existing = db[ACTIONS_COLLECTION].find_one(key)
+    if existing and existing.get("applied_at") and \
+            (existing["numerator"], existing["denominator"]) != (numerator, denominator):
+        raise ValueError(
+            f"{action_type} for {symbol} on {ex_date:%Y-%m-%d} was applied to holdings on "
+            f"{existing['applied_at']:%Y-%m-%d}; its ratio cannot be corrected"
+        )
+    stock = db.master_stocks.find_one({"identifiers.nse_code": symbol}, {"_id": 1})
+    db[ACTIONS_COLLECTION].update_one(
+        key,
+        {"$set": {
+            "numerator": numerator,
+            "denominator": denominator,
+            "factor": factor,
+            "stock_id": str(stock["_id"]) if stock else None,
+            "updated_at": datetime.utcnow()
+        }, "$setOnInsert": {"created_at": datetime.utcnow()}},
+        upsert=True
+    )
+    return db[ACTIONS_COLLECTION].find_one(key)
+
+
+def cumulative_factors(ex_dates: np.ndarray, factors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sorted ex-dates and, for k = 0..n, the product of the factors of
+    actions k..n-1: the number of today's shares one share held before the
+    k-th ex-date became.
+    """
+    order = np.argsort(ex_dates, kind='stable')
+    ex_dates = np.asarray(ex_dates, dtype='datetime64[D]')[order]
+    factors = np.asarray(factors, dtype=np.float64)[order]
+    cumulative = np.append(np.cumprod(factors[::-1])[::-1], 1.0)
+    return ex_dates, cumulative
+
+
+def factors_at(dates: np.ndarray, ex_dates: np.ndarray, cumulative: np.ndarray) -> np.ndarray:
+    """Cumulative factor in force on each date: actions with ex_date > date still to come"""
+    return cumulative[np.searchsorted(ex_dates, np.asarray(dates, dtype='datetime64[D]'), side='right')]
+
+
+def load_factor_table(db, symbols: Iterable[str]) -> FactorTable:
+    """Cumulative factors for every symbol with actions, from one query"""
+    actions: Dict[str, Tuple[list, list]] = {}
+    for doc in db[ACTIONS_COLLECTION].find(
+        {"symbol": {"$in": list(symbols)}},
+        {"_id": 0, "symbol": 1, "ex_date": 1, "factor": 1}
+    ):
+        dates, factors = actions.setdefault(doc["symbol"], ([], []))
+        dates.append(doc["ex_date"])
+        factors.append(doc["factor"])
+    return {
+        symbol: cumulative_factors(np.array(dates, dtype='datetime64[D]'), np.array(factors))
+        for symbol, (dates, factors) in actions.items()
+    }
+
+
+def adjust_matrix(matrix: PriceMatrix, table: FactorTable, field: str = "close") -> PriceMatrix:
+    """
+    Split/bonus adjusted copy of a price (or volume) matrix: one vectorised
+    pass per symbol with actions, dividing prices (multiplying volumes) by
+    the cumulative factor in force on each date.
+    """
+    adjusted = None
+    for symbol, (ex_dates, cumulative) in table.items():
+        column = matrix.symbol_index.get(symbol)
+        if column is None:
+            continue
+        if adjusted is None:
+            adjusted = matrix.prices.copy()
+        factors = factors_at(matrix.dates, ex_dates, cumulative)
+        if field in QUANTITY_FIELDS:
+            adjusted[:, column] *= factors
+        else:
+            adjusted[:, column] /= factors
+    if adjusted is None:
+        return matrix
+    return PriceMatrix(matrix.dates, matrix.symbols, adjusted)
+
+
+def load_adjusted_price_matrix(db, spellings: Dict[str, str], start_date: datetime, end_date: datetime,
+                               field: str = "close") -> PriceMatrix:
+    """load_price_matrix with splits and bonus issues applied on read"""
+    matrix = load_price_matrix(db, spellings, start_date, end_date, field)
+    return adjust_matrix(matrix, load_factor_table(db, matrix.symbols), field)
+
+
+def _holding_update(action: Dict) -> UpdateMany:
+    """
+    One pipeline update for every portfolio holding the action applies to:
+    lots bought before the ex-date and not yet adjusted for this action get
+    quantity x factor and prices / factor, in decimal arithmetic from the
+    stored ratio. The action id is recorded on the lot so re-running is
+    harmless.
+    """
+    action_id = action["_id"]
+    after, before = share_ratio(action)
+    clauses = [{"$eq": ["$$h.stock_symbol", action["symbol"]]}]
+    match_clauses = [{"stock_symbol": action["symbol"]}]
+    if action.get("stock_id"):
+        clauses.append({"$eq": ["$$h.stock_id", action["stock_id"]]})
+        match_clauses.append({"stock_id": action["stock_id"]})
+    bought = {"$ifNull": ["$$h.purchase_date", {"$ifNull": ["$$h.created_at", datetime(1970, 1, 1)]}]}
+    applies = {"$and": [
+        {"$or": clauses},
+        {"$lt": [bought, action["ex_date"]]},
+        {"$not": [{"$in": [action_id, {"$ifNull": ["$$h.adjusted_for", []]}]}]}
+    ]}
+
+    def scaled(field: str, multiplier: Decimal128, divisor: Decimal128) -> Dict:
+        return {"$cond": [
+            {"$eq": [{"$ifNull": [f"$$h.{field}", None]}, None]},
+            "$$REMOVE",
+            {"$divide": [{"$multiply": [{"$toDecimal": f"$$h.{field}"}, multiplier]}, divisor]}
+        ]}
+
+    return UpdateMany(
+        {"holdings": {"$elemMatch": {"$or": match_clauses, "adjusted_for": {"$ne": action_id}}}},
+        [{"$set": {"holdings": {"$map": {
+            "input": "$holdings",
+            "as": "h",
+            "in": {"$cond": [applies, {"$mergeObjects": ["$$h", {
+                "quantity": scaled("quantity", after, before),
+                "average_price": scaled("average_price", before, after),
+                "purchase_price": scaled("purchase_price", before, after),
+                "buy_price": scaled("buy_price", before, after),
+                "adjusted_for": {"$concatArrays": [{"$ifNull": ["$$h.adjusted_for", []]}, [action_id]]}
+            }]}, "$$h"]}
+        }}, "updated_at": "$$NOW"}}]
+    )
+
+
+def apply_pending_actions(db, as_of: Optional[datetime] = None) -> Dict:
+    """
+    Adjust open holdings for every action that has gone ex by `as_of` and
+    has not been applied yet, with one bulk write, then mark the actions
+    applied and the snapshots holding those stocks stale. Returns a
+    summary of the run.
+    """
+    started = time.perf_counter()
+    as_of = as_of or datetime.utcnow()
+    pending = list(db[ACTIONS_COLLECTION].find(
+        {"ex_date": {"$lte": as_of}, "applied_at": {"$exists": False}}
+    ).sort("ex_date", ASCENDING))
+    summary = {"actions": len(pending), "portfolios_modified": 0, "snapshots_marked_stale": 0}
+    if pending:
+        # Ordered so that two actions on one stock compound in ex-date order
+        result = db.portfolios.bulk_write([_holding_update(action) for action in pending], ordered=True)
+        summary["portfolios_modified"] = result.modified_count
+        db[ACTIONS_COLLECTION].update_many(
+            {"_id": {"$in": [action["_id"] for action in pending]}},
+            {"$set": {"applied_at": datetime.utcnow()}}
+        )
+        # Snapshots carry their own holding quantities; recompute them on next read
+        stock_ids = [action["stock_id"] for action in pending if action.get("stock_id")]
+        result = db[SNAPSHOT_COLLECTION].update_many(
+            {"$or": [
+                {"symbols": {"$in": sorted({listing_key("NSE", action["symbol"]) for action in pending})}},
+                {"holdings.stock_id": {"$in": stock_ids}}
+            ]},
+            {"$set": {"stale": True}}
+        )
+        summary["snapshots_marked_stale"] = result.modified_count
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f"Corporate actions applied to holdings: {summary}")
+    return summary
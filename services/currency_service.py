@@ -1,23 +1,143 @@
+import asyncio
+import logging
+import time
 from decimal import Decimal
-from datetime import datetime
+from typing import Dict, Optional, Tuple
 import aiohttp
 
+logger = logging.getLogger(__name__)
+
 class CurrencyService:
-    def __init__(self):
-        self.base_url = "https://api.exchangerate-api.com/v4/latest/"
-        self.cache = {}  # Simple in-memory cache
+    """
+    FX rates backed by a per-base-currency rate table cache.
+
+    One HTTP request caches the full table for a base currency and every
+    pair is derived from cached tables (directly or as a cross rate).
+    Concurrent misses for the same base share a single request, and
+    tables past their TTL are served while a background refresh runs.
+    """
+
+    def __init__(self,
+                 base_url: str = "https://api.exchangerate-api.com/v4/latest/",
+                 ttl: float = 3600,
+                 max_stale: float = 86400,
+                 timeout: float = 10):
+        self.base_url = base_url
+        self.ttl = ttl                  # seconds a table is considered fresh
+        self.max_stale = max_stale      # seconds a stale table may still be served
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.cache: Dict[str, Tuple[Dict[str, Decimal], float]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Shared HTTP session, created on first use inside the event loop"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=self.timeout)
+        return self._session
+
+    async def close(self):
+        """Close the shared HTTP session"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _fetch_rate_table(self, base_currency: str,
+                                session: Optional[aiohttp.ClientSession] = None) -> Dict[str, Decimal]:
+        session = session or self._get_session()
+        async with session.get(f"{self.base_url}{base_currency}") as response:
+            response.raise_for_status()
+            data = await response.json()
+
+        rates = {currency: Decimal(str(rate)) for currency, rate in data['rates'].items()}
+        rates[base_currency] = Decimal('1')
+        self.cache[base_currency] = (rates, time.monotonic())
+        return rates
+
+    def _refresh(self, base_currency: str) -> asyncio.Task:
+        """Start (or join) the single in-flight fetch for a base currency"""
+        task = self._inflight.get(base_currency)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_rate_table(base_currency))
+            self._inflight[base_currency] = task
+            task.add_done_callback(lambda t: self._refresh_done(base_currency, t))
+        return task
+
+    def _refresh_done(self, base_currency: str, task: asyncio.Task):
+        self._inflight.pop(base_currency, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error refreshing {base_currency} rates: {task.exception()}")
+
+    async def get_rate_table(self, base_currency: str) -> Dict[str, Decimal]:
+        """Get all rates for a base currency, serving stale tables while refreshing"""
+        if base_currency in self.cache:
+            rates, fetched_at = self.cache[base_currency]
+            age = time.monotonic() - fetched_at
+            if age < self.ttl:
+                return rates
+            if age < self.max_stale:
+                self._refresh(base_currency)
+                return rates
+
+        # asyncio.shield keeps one cancelled caller from cancelling the shared fetch
+        return await asyncio.shield(self._refresh(base_currency))
+
+    def get_rate_table_sync(self, base_currency: str) -> Dict[str, Decimal]:
+        """
+        get_rate_table for synchronous callers (Streamlit, Flask) outside any
+        event loop. Shares the cache; a table past its TTL is refetched
+        in-line with a throwaway session, falling back to the stale table
+        within max_stale if that fails.
+        """
+        cached = self.cache.get(base_currency)
+        age = time.monotonic() - cached[1] if cached else None
+        if age is not None and age < self.ttl:
+            return cached[0]
+
+        async def fetch():
+            async with aiohttp.ClientSession(timeout=self.timeout) as session:
+                return await self._fetch_rate_table(base_currency, session)
+
+        try:
+            return asyncio.run(fetch())
+        except Exception as e:
+            if age is not None and age < self.max_stale:
+                logger.error(f"Error refreshing {base_currency} rates, serving cached table: {e}")
+                return cached[0]
+            raise
+
+    def get_exchange_rate_sync(self, from_currency: str, to_currency: str) -> Decimal:
+        """Synchronous get_exchange_rate; see get_rate_table_sync"""
+        if from_currency == to_currency:
+            return Decimal('1')
+
+        rates = self.get_rate_table_sync(self._pick_base(from_currency, to_currency))
+        return rates[to_currency] / rates[from_currency]
+
+    def _pick_base(self, from_currency: str, to_currency: str) -> str:
+        """Prefer a cached table that already covers both currencies"""
+        if from_currency in self.cache:
+            return from_currency
+        for base, (rates, _) in self.cache.items():
+            if from_currency in rates and to_currency in rates:
+                return base
+        return from_currency
 
     async def get_exchange_rate(self, from_currency: str, to_currency: str) -> Decimal:
         """Get exchange rate with caching"""
-        cache_key = f"{from_currency}_{to_currency}"
-        if cache_key in self.cache:
-            rate, timestamp = self.cache[cache_key]
-            if (datetime.now() - timestamp).seconds < 3600:  # 1 hour cache
-                return rate
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{self.base_url}{from_currency}") as response:
-                data = await response.json()
-                rate = Decimal(str(data['rates'][to_currency]))
-                self.cache[cache_key] = (rate, datetime.now())
-                return rate
\ No newline at end of file
+        if from_currency == to_currency:
+            return Decimal('1')
+
+        rates = await self.get_rate_table(self._pick_base(from_currency, to_currency))
+        return rates[to_currency] / rates[from_currency]
+
+
+# Process-wide instance so the rate cache and HTTP session outlive a request
+_currency_service: Optional[CurrencyService] = None
+
+def get_currency_service() -> CurrencyService:
+    """Get the shared CurrencyService"""
+    global _currency_service
+    if _currency_service is None:
+        _currency_service = CurrencyService()
+    return _currency_service
@@ -0,0 +1,183 @@
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+from bson import ObjectId
+
+from config.exchanges import EXCHANGE_CONFIGS
+from services.close_prices import LATEST_CLOSE_TTL, get_latest_closes
+from services.currency_service import get_currency_service
+from services.price_matrix import symbol_spellings
+
+logger = logging.getLogger(__name__)
+
+EXPOSURE_DIMENSIONS = ("sector", "industry", "exchange", "currency")
+UNKNOWN = "Unknown"
+
+
+def load_classifications(db, holdings: List[Dict]) -> Dict[str, Dict]:
+    """
+    Master-stock record per holding symbol, fetched with one query that
+    matches on stock_id as well as every stored spelling of the symbol
+    (RELIANCE, RELIANCE.NS).
+    """
+    spellings = symbol_spellings(holdings)
+    stock_ids = [ObjectId(h['stock_id']) for h in holdings if ObjectId.is_valid(str(h.get('stock_id', '')))]
+    clauses = [
+        {"identifiers.nse_code": {"$in": list(spellings)}},
+        {"identifiers.symbol": {"$in": list(spellings)}},
+        {"identifiers.yfinance_symbol": {"$in": list(spellings)}}
+    ]
+    if stock_ids:
+        clauses.append({"_id": {"$in": stock_ids}})
+    stocks = list(db.master_stocks.find(
+        {"$or": clauses},
+        {"identifiers": 1, "exchange_info": 1, "classification": 1, "sector": 1, "industry": 1}
+    ))
+
+    by_id = {str(stock['_id']): stock for stock in stocks}
+    by_spelling = {}
+    for stock in stocks:
+        identifiers = stock.get('identifiers', {})
+        for field in ("nse_code", "symbol", "yfinance_symbol"):
+            if identifiers.get(field) in spellings:
+                by_spelling.setdefault(spellings[identifiers[field]], stock)
+
+    return {
+        holding['stock_symbol']: by_id.get(str(holding.get('stock_id'))) or by_spelling.get(holding['stock_symbol'])
+        for holding in holdings
+    }
+
+
+def _labels(holding: Dict, stock: Dict) -> Tuple[str, str, str, str]:
+    """(sector, industry, exchange, currency) for one holding"""
+    stock = stock or {}
+    classification = stock.get('classification') or {}
+    exchange_info = stock.get('exchange_info') or {}
+    exchange = holding.get('exchange_code') or exchange_info.get('primary_exchange') or UNKNOWN
+    exchange_config = EXCHANGE_CONFIGS.get(exchange)
+    currency = exchange_info.get('currency') or (exchange_config.currency if exchange_config else UNKNOWN)
+    return (
+        classification.get('sector') or stock.get('sector') or UNKNOWN,
+        classification.get('industry') or stock.get('industry') or UNKNOWN,
+        exchange,
+        currency
+    )
+
+
+def portfolio_currency(portfolio: Dict) -> str:
+    """Currency the portfolio is reported in (Flask portfolios say 'currency', API ones 'base_currency')"""
+    return portfolio.get('currency') or portfolio.get('base_currency') or 'USD'
+
+
+def conversion_rates(currencies: Iterable[str], base_currency: str) -> Dict[str, float]:
+    """
+    Rate from each listing currency into the base currency, from the shared
+    CurrencyService rate tables. Currencies without a rate are left out.
+    """
+    service = get_currency_service()
+    rates = {}
+    for currency in set(currencies):
+        if currency == base_currency:
+            rates[currency] = 1.0
+            continue
+        if currency == UNKNOWN:
+            continue
+        try:
+            rates[currency] = float(service.get_exchange_rate_sync(currency, base_currency))
+        except Exception as e:
+            logger.error(f"No {currency}->{base_currency} rate for exposures: {e}")
+    return rates
+
+
+def compute_exposures(holdings: List[Dict], classifications: Dict[str, Dict],
+                      prices: Dict[str, float], fx_rates: Dict[str, float]) -> Dict:
+    """
+    Value and weight per sector, industry, exchange and currency from one
+    pass over the holdings. Each value is converted into the base currency
+    with `fx_rates` (listing currency -> rate) before the per-dimension
+    bincounts; holdings without a price or a rate are left out.
+    """
+    values = []
+    labels = []
+    for holding in holdings:
+        symbol = holding['stock_symbol']
+        price = prices.get(symbol)
+        if price is None:
+            continue
+        holding_labels = _labels(holding, classifications.get(symbol))
+        fx_rate = fx_rates.get(holding_labels[3])
+        if fx_rate is None:
+            continue
+        values.append(float(str(holding['quantity'])) * price * fx_rate)
+        labels.append(holding_labels)
+
+    values = np.asarray(values, dtype=np.float64)
+    total = float(values.sum())
+    exposures = {}
+    for d, dimension in enumerate(EXPOSURE_DIMENSIONS):
+        names, index = np.unique(np.array([label[d] for label in labels], dtype=str), return_inverse=True)
+        totals = np.bincount(index, weights=values, minlength=len(names))
+        order = np.argsort(-totals)
+        exposures[dimension] = [{
+            "name": str(names[i]),
+            "value": float(totals[i]),
+            "weight": float(totals[i] / total * 100) if total > 0 else 0.0
+        } for i in order]
+
+    return {
+        "total_value": total,
+        "exposures": exposures,
+        "unclassified": sorted(
+            holding['stock_symbol'] for holding in holdings if classifications.get(holding['stock_symbol']) is None
+        )
+    }
+
+
+class ExposureCache:
+    """
+    Exposures per portfolio version (id + updated_at), in the portfolio's
+    currency. Entries also expire with the latest-close cache so weights
+    follow price and FX moves.
+    """
+
+    def __init__(self, ttl: float = LATEST_CLOSE_TTL):
+        self.ttl = ttl
+        self.entries: Dict[Tuple[str, str], Tuple[Dict, float]] = {}
+        self.lock = threading.Lock()
+
+    def get(self, db, portfolio: Dict) -> Dict:
+        key = (str(portfolio['_id']), str(portfolio.get('updated_at')))
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[1] > now:
+                return entry[0]
+
+        holdings = [h for h in portfolio.get('holdings', []) if h.get('stock_symbol')]
+        classifications = load_classifications(db, holdings) if holdings else {}
+        prices = {
+            symbol: closes[0][1]
+            for symbol, closes in get_latest_closes(db, symbol_spellings(holdings)).items()
+        } if holdings else {}
+        base_currency = portfolio_currency(portfolio)
+        fx_rates = conversion_rates(
+            (_labels(h, classifications.get(h['stock_symbol']))[3] for h in holdings), base_currency
+        )
+        result = {**compute_exposures(holdings, classifications, prices, fx_rates), "currency": base_currency}
+
+        with self.lock:
+            # Older versions of this portfolio can no longer be asked for
+            for stale in [k for k in self.entries if k[0] == key[0]]:
+                del self.entries[stale]
+            self.entries[key] = (result, time.monotonic() + self.ttl)
+        return result
+
+
+_exposure_cache = ExposureCache()
+
+
+def get_portfolio_exposures(db, portfolio: Dict) -> Dict:
+    """Sector, industry, exchange and currency exposures via the process-wide cache"""
+    return _exposure_cache.get(db, portfolio)
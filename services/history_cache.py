@@ -0,0 +1,271 @@
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+import numpy as np
+from pymongo import ASCENDING, DESCENDING
+
+from config.settings import HISTORY_CACHE_DIR, HISTORY_CACHE_SYNC_SECONDS, HISTORY_COLLECTION
+from services.price_matrix import PriceMatrix, load_price_matrix as load_price_matrix_from_mongo
+
+try:
+    import pyarrow as pa
+except ImportError:  # cache disabled, reads go straight to MongoDB
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+# Dates are stored as int64 days since the epoch so they view as datetime64[D] without a copy
+SCHEMA = pa.schema([
+    ("date", pa.int64()),
+    ("close", pa.float64()),
+    ("volume", pa.float64()),
+]) if pa is not None else None
+# Order of the arrays returned by HistoryCache.arrays
+CACHED_FIELDS = ("date", "close", "volume")
+
+_indexed_databases = set()
+
+
+def ensure_sync_index(db):
+    """(symbol, updated_at) index: source state and changed-bar reads never touch whole histories"""
+    key = (id(db.client), db.name)
+    if key not in _indexed_databases:
+        db[HISTORY_COLLECTION].create_index([("symbol", ASCENDING), ("updated_at", DESCENDING)])
+        _indexed_databases.add(key)
+
+
+def source_state(db, stored_by_symbol: Dict[str, list]) -> Dict[str, Tuple[int, Optional[datetime]]]:
+    """
+    (row count, newest updated_at) per symbol over all its stored spellings,
+    from one aggregation the (symbol, updated_at) index covers.
+    """
+    owner = {stored: symbol for symbol, spellings in stored_by_symbol.items() for stored in spellings}
+    state: Dict[str, Tuple[int, Optional[datetime]]] = {}
+    for doc in db[HISTORY_COLLECTION].aggregate([
+        {"$match": {"symbol": {"$in": list(owner)}}},
+        {"$group": {"_id": "$symbol", "rows": {"$sum": 1}, "updated_at": {"$max": "$updated_at"}}}
+    ]):
+        symbol = owner[doc["_id"]]
+        rows, updated_at = state.get(symbol, (0, None))
+        if doc["updated_at"] is not None and (updated_at is None or doc["updated_at"] > updated_at):
+            updated_at = doc["updated_at"]
+        state[symbol] = (rows + doc["rows"], updated_at)
+    return state
+
+
+class HistoryCache:
+    """
+    Local columnar copy of historical_prices: one Arrow IPC file per symbol,
+    memory-mapped on read so columns are zero-copy NumPy views. Each file
+    records the source row count and newest updated_at it was built from;
+    a sync re-reads only the bars written since then, so corrections and
+    re-upserted older bars are picked up, not just newer dates.
+    """
+
+    def __init__(self, directory: str = HISTORY_CACHE_DIR, sync_seconds: float = HISTORY_CACHE_SYNC_SECONDS):
+        self.directory = directory
+        self.sync_seconds = sync_seconds
+        self._arrays: Dict[str, Tuple[float, Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return pa is not None
+
+    def path(self, symbol: str) -> str:
+        return os.path.join(self.directory, f"{symbol.replace(os.sep, '_')}.arrow")
+
+    def arrays(self, symbol: str) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        (dates as datetime64[D], closes, volumes) for a symbol, as zero-copy
+        views over the memory-mapped file. Reopened only when the file changes.
+        """
+        path = self.path(symbol)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+        cached = self._arrays.get(symbol)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all().combine_chunks()
+        if table.num_rows == 0:
+            arrays = None
+        else:
+            arrays = (
+                table.column("date").chunk(0).to_numpy().view('datetime64[D]'),
+                table.column("close").chunk(0).to_numpy(),
+                table.column("volume").chunk(0).to_numpy()
+            )
+        self._arrays[symbol] = (mtime, arrays)
+        return arrays
+
+    def source_marker(self, symbol: str) -> Optional[Tuple[int, Optional[datetime]]]:
+        """(source row count, newest updated_at) recorded in a symbol's file"""
+        try:
+            metadata = pa.ipc.open_file(pa.memory_map(self.path(symbol), 'r')).schema.metadata or {}
+        except FileNotFoundError:
+            return None
+        if b"source_rows" not in metadata:
+            return None
+        updated_at = metadata.get(b"updated_at", b"").decode()
+        return int(metadata[b"source_rows"]), datetime.fromisoformat(updated_at) if updated_at else None
+
+    def is_fresh(self, symbol: str) -> bool:
+        try:
+            return time.time() - os.stat(self.path(symbol)).st_mtime < self.sync_seconds
+        except FileNotFoundError:
+            return False
+
+    def _write(self, symbol: str, dates: np.ndarray, closes: np.ndarray, volumes: np.ndarray,
+               marker: Optional[Tuple[int, Optional[datetime]]] = None):
+        os.makedirs(self.directory, exist_ok=True)
+        schema = SCHEMA
+        if marker is not None:
+            rows, updated_at = marker
+            schema = SCHEMA.with_metadata({
+                "source_rows": str(rows),
+                "updated_at": updated_at.isoformat() if updated_at else ""
+            })
+        table = pa.table({
+            "date": dates.astype('datetime64[D]').astype(np.int64),
+            "close": closes,
+            "volume": volumes
+        }, schema=schema)
+        path = self.path(symbol)
+        # Unique temp file in the same directory, so concurrent writers never
+        # share one and os.replace stays an atomic rename
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+        os.close(fd)
+        try:
+            with pa.OSFile(tmp_path, 'wb') as sink:
+                with pa.ipc.new_file(sink, schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._arrays.pop(symbol, None)
+
+    def sync(self, db, spellings: Dict[str, str]) -> int:
+        """
+        Bring each symbol's file in line with MongoDB. Symbols whose row count
+        and newest updated_at match the file are left alone; otherwise the
+        bars updated since the file's updated_at are merged in (replacing
+        cached days), or the whole history is re-read when the counts show
+        rows were removed or written without updated_at. All reads go out as
+        one query. Returns the number of rows read.
+        """
+        stored_by_symbol: Dict[str, list] = {}
+        for stored, symbol in spellings.items():
+            stored_by_symbol.setdefault(symbol, []).append(stored)
+
+        ensure_sync_index(db)
+        state = source_state(db, stored_by_symbol)
+        clauses = []
+        changed = []
+        existing = {}
+        for symbol, stored in stored_by_symbol.items():
+            current = state.get(symbol, (0, None))
+            marker = self.source_marker(symbol)
+            arrays = self.arrays(symbol)
+            if marker == current and (arrays is not None or current[0] == 0):
+                # Nothing changed upstream; just mark the file as freshly synced
+                os.utime(self.path(symbol))
+                continue
+            clause = {"symbol": {"$in": stored}}
+            if arrays is not None and marker is not None and marker[1] is not None and current[0] >= marker[0]:
+                existing[symbol] = arrays
+                clause["updated_at"] = {"$gt": marker[1]}
+            clauses.append(clause)
+            changed.append(symbol)
+        if not clauses:
+            return 0
+
+        rows: Dict[str, Tuple[list, list, list]] = {}
+        cursor = db[HISTORY_COLLECTION].find(
+            {"$or": clauses},
+            {"_id": 0, "symbol": 1, "date": 1, "close": 1, "volume": 1}
+        ).batch_size(10000)
+        for doc in cursor:
+            symbol_rows = rows.setdefault(spellings[doc["symbol"]], ([], [], []))
+            symbol_rows[0].append(doc["date"])
+            symbol_rows[1].append(float(str(doc["close"])))
+            symbol_rows[2].append(float(str(doc["volume"])) if doc.get("volume") is not None else np.nan)
+
+        read = 0
+        for symbol in changed:
+            new_dates, new_closes, new_volumes = rows.get(symbol, ([], [], []))
+            dates = np.array(new_dates, dtype='datetime64[D]')
+            closes = np.array(new_closes, dtype=np.float64)
+            volumes = np.array(new_volumes, dtype=np.float64)
+            if symbol in existing:
+                old_dates, old_closes, old_volumes = existing[symbol]
+                dates = np.concatenate([old_dates, dates])
+                closes = np.concatenate([old_closes, closes])
+                volumes = np.concatenate([old_volumes, volumes])
+
+            # Sort by date; on duplicate dates (updated bar, two spellings) the later row wins
+            order = np.argsort(dates, kind='stable')
+            dates, closes, volumes = dates[order], closes[order], volumes[order]
+            last_of_day = np.append(dates[1:] != dates[:-1], True) if len(dates) else np.array([], dtype=bool)
+            self._write(symbol, dates[last_of_day], closes[last_of_day], volumes[last_of_day],
+                        state.get(symbol, (0, None)))
+            read += len(new_dates)
+
+        logger.info(f"History cache: read {read} rows for {len(changed)} of {len(stored_by_symbol)} symbols")
+        return read
+
+    def load_price_matrix(self, db, spellings: Dict[str, str], start_date: datetime, end_date: datetime,
+                          field: str = "close") -> PriceMatrix:
+        """Close (or volume) matrix from the cache, syncing stale symbols first"""
+        column = CACHED_FIELDS.index(field)
+        symbols = sorted(set(spellings.values()))
+        stale = {stored: symbol for stored, symbol in spellings.items() if not self.is_fresh(symbol)}
+        if stale:
+            self.sync(db, stale)
+
+        start = np.datetime64(start_date.replace(tzinfo=None), 'D')
+        end = np.datetime64(end_date.replace(tzinfo=None), 'D')
+        columns = []
+        for symbol in symbols:
+            arrays = self.arrays(symbol)
+            if arrays is None:
+                columns.append((np.array([], dtype='datetime64[D]'), np.array([])))
+                continue
+            dates, values = arrays[0], arrays[column]
+            lo, hi = np.searchsorted(dates, [start, end + np.timedelta64(1, 'D')])
+            columns.append((dates[lo:hi], values[lo:hi]))
+
+        # Union of dates via a day-presence map over the window instead of a sort
+        days = np.arange(start, end + np.timedelta64(1, 'D'))
+        present = np.zeros(len(days), dtype=bool)
+        for dates, _ in columns:
+            present[(dates - start).astype(np.intp)] = True
+        row_of_day = np.cumsum(present) - 1
+
+        # Filled symbol by symbol into contiguous rows, then viewed as dates x symbols
+        prices = np.full((len(symbols), int(present.sum())), np.nan)
+        for j, (dates, closes) in enumerate(columns):
+            prices[j, row_of_day[(dates - start).astype(np.intp)]] = closes
+        return PriceMatrix(days[present], symbols, prices.T)
+
+
+_history_cache = HistoryCache()
+
+
+def load_price_matrix(db, spellings: Dict[str, str], start_date: datetime, end_date: datetime,
+                      field: str = "close") -> PriceMatrix:
+    """
+    Close (or volume) matrix for the given symbols, read from the local
+    columnar cache when available and straight from MongoDB otherwise.
+    """
+    if _history_cache.enabled:
+        try:
+            return _history_cache.load_price_matrix(db, spellings, start_date, end_date, field)
+        except Exception as e:
+            logger.error(f"History cache read failed, falling back to MongoDB: {e}")
+    return load_price_matrix_from_mongo(db, spellings, start_date, end_date, field)
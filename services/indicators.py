@@ -0,0 +1,96 @@
+from typing import Dict, Optional, Tuple
+import numpy as np
+
+# Largest block over which EMA weights (1 - alpha) ** -k stay within float range
+_EMA_MAX_EXPONENT = 200.0
+
+
+def sma(values: np.ndarray, window: int) -> np.ndarray:
+    """Simple moving average from a cumulative sum; NaN until `window` values are in"""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if window < 1 or len(values) < window:
+        return out
+    sums = np.cumsum(np.concatenate([[0.0], values]))
+    out[window - 1:] = (sums[window:] - sums[:-window]) / window
+    return out
+
+
+def rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+    """Population standard deviation over a trailing window"""
+    values = np.asarray(values, dtype=np.float64)
+    mean = sma(values, window)
+    mean_of_squares = sma(values * values, window)
+    return np.sqrt(np.maximum(mean_of_squares - mean * mean, 0.0))
+
+
+def ema(values: np.ndarray, span: Optional[int] = None, alpha: Optional[float] = None,
+        seed_window: Optional[int] = None) -> np.ndarray:
+    """
+    Exponential moving average without a per-element Python loop. The
+    recursion y_k = d * y_{k-1} + alpha * x_k (d = 1 - alpha) is unrolled
+    into a cumulative sum of x_j * d ** -j, computed in blocks short enough
+    for the weights to stay finite. The series is seeded with the mean of
+    the first `seed_window` values (the span by default), NaN before it.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if alpha is None:
+        alpha = 2.0 / (span + 1.0)
+    seed_window = seed_window or span or int(round(1.0 / alpha))
+    out = np.full(len(values), np.nan)
+    if len(values) < seed_window:
+        return out
+
+    decay = 1.0 - alpha
+    state = values[:seed_window].mean()
+    out[seed_window - 1] = state
+    if decay <= 0.0:
+        out[seed_window:] = values[seed_window:]
+        return out
+
+    block = max(int(_EMA_MAX_EXPONENT / -np.log10(decay)), 1)
+    for start in range(seed_window, len(values), block):
+        chunk = values[start:start + block]
+        k = np.arange(len(chunk))
+        powers = decay ** k
+        weighted = np.cumsum(chunk / powers)
+        result = decay * powers * state + alpha * powers * weighted
+        out[start:start + len(chunk)] = result
+        state = result[-1]
+    return out
+
+
+def rsi(closes: np.ndarray, period: int = 14) -> np.ndarray:
+    """Relative Strength Index with Wilder's smoothing (alpha = 1 / period)"""
+    closes = np.asarray(closes, dtype=np.float64)
+    out = np.full(len(closes), np.nan)
+    if len(closes) <= period:
+        return out
+    changes = np.diff(closes)
+    gains = ema(np.maximum(changes, 0.0), alpha=1.0 / period, seed_window=period)
+    losses = ema(np.maximum(-changes, 0.0), alpha=1.0 / period, seed_window=period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[1:] = np.where(losses > 0, 100.0 - 100.0 / (1.0 + gains / losses), 100.0)
+    out[1:][np.isnan(gains)] = np.nan
+    return out
+
+
+def bollinger(closes: np.ndarray, window: int = 20, width: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(middle, upper, lower) bands: SMA +/- `width` rolling standard deviations"""
+    middle = sma(closes, window)
+    deviation = rolling_std(closes, window)
+    return middle, middle + width * deviation, middle - width * deviation
+
+
+def compute_indicator(name: str, closes: np.ndarray, window: int, width: float = 2.0) -> Dict[str, np.ndarray]:
+    """Named indicator series for the price array, keyed by line name"""
+    if name == "sma":
+        return {f"SMA {window}": sma(closes, window)}
+    if name == "ema":
+        return {f"EMA {window}": ema(closes, span=window)}
+    if name == "rsi":
+        return {f"RSI {window}": rsi(closes, window)}
+    if name == "bollinger":
+        middle, upper, lower = bollinger(closes, window, width)
+        return {f"BB {window} mid": middle, f"BB {window} upper": upper, f"BB {window} lower": lower}
+    raise ValueError(f"Unknown indicator: {name}")
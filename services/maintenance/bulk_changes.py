@@ -0,0 +1,125 @@
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List
+from pymongo import UpdateOne
+
+from config.exchanges import EXCHANGE_CONFIGS
+
+logger = logging.getLogger(__name__)
+
+BULK_CHUNK_SIZE = 1000
+CHANGE_TYPES = ("new_listing", "delisting", "name_variant")
+
+
+def current_names(db, symbols: Iterable[str]) -> Dict[str, str]:
+    """Display name per NSE code for the given symbols, in one query"""
+    cursor = db.master_stocks.find(
+        {"identifiers.nse_code": {"$in": list(symbols)}},
+        {"_id": 0, "identifiers.nse_code": 1, "display_name": 1}
+    )
+    return {doc["identifiers"]["nse_code"]: doc.get("display_name", "") for doc in cursor}
+
+
+class MasterStockChanges:
+    """
+    master_stocks mutations collected over one maintenance run and applied
+    together with chunked, unordered bulk writes. Every operation is keyed
+    on the NSE code and safe to re-apply.
+    """
+
+    def __init__(self, exchange_code: str = "NSE"):
+        self.exchange_code = exchange_code
+        self.exchange_config = EXCHANGE_CONFIGS[exchange_code]
+        self.operations: List[UpdateOne] = []
+        self.planned: Dict[str, List[Dict]] = {change: [] for change in CHANGE_TYPES}
+        self.now = datetime.utcnow()
+
+    def add_listing(self, details: Dict):
+        symbol = details["nse_code"]
+        fields = {
+            "display_name": details.get("display_name", symbol),
+            "identifiers.nse_code": symbol,
+            "identifiers.symbol": symbol,
+            "identifiers.isin": details.get("isin", ""),
+            "identifiers.yfinance_symbol": details.get(
+                "yfinance_symbol", f"{symbol}{self.exchange_config.symbol_suffix}"
+            ),
+            f"identifiers.exchange_codes.{self.exchange_code}": symbol,
+            "identifiers.upstox_symbol": details.get("upstox_symbol", symbol),
+            "identifiers.upstox_transaction_code": details.get("upstox_transaction_code", symbol),
+            "identifiers.upstox_holdings_code": details.get("upstox_holdings_code", symbol),
+            "exchange_info.primary_exchange": self.exchange_code,
+            "exchange_info.listed_exchanges": [self.exchange_code],
+            "exchange_info.country": self.exchange_config.country,
+            "exchange_info.currency": self.exchange_config.currency,
+            "status": "active",
+            "updated_at": self.now
+        }
+        if details.get("classification"):
+            fields["classification"] = details["classification"]
+        self.operations.append(UpdateOne(
+            {"identifiers.nse_code": symbol},
+            {"$set": fields, "$setOnInsert": {"created_at": self.now}},
+            upsert=True
+        ))
+        self.planned["new_listing"].append({"symbol": symbol, "name": fields["display_name"]})
+
+    def add_delisting(self, symbol: str):
+        self.operations.append(UpdateOne(
+            {"identifiers.nse_code": symbol, "status": {"$ne": "delisted"}},
+            {"$set": {"status": "delisted", "delisted_at": self.now, "updated_at": self.now}}
+        ))
+        self.planned["delisting"].append({"symbol": symbol})
+
+    def add_name_variant(self, symbol: str, old_name: str, new_name: str, source: str):
+        # The variant filter keeps a re-applied run from recording the name twice
+        self.operations.append(UpdateOne(
+            {"identifiers.nse_code": symbol, "name_variants.name": {"$ne": new_name}},
+            {
+                "$set": {"display_name": new_name, "updated_at": self.now},
+                "$push": {"name_variants": {
+                    "name": new_name, "previous_name": old_name, "source": source, "recorded_at": self.now
+                }}
+            }
+        ))
+        self.planned["name_variant"].append({"symbol": symbol, "old_name": old_name, "new_name": new_name})
+
+    def counts(self) -> Dict[str, int]:
+        return {change: len(items) for change, items in self.planned.items()}
+
+    def describe(self) -> List[str]:
+        """The planned diff, one line per change"""
+        lines = [f"+ {item['symbol']}  {item['name']}" for item in self.planned["new_listing"]]
+        lines += [f"- {item['symbol']}" for item in self.planned["delisting"]]
+        lines += [
+            f"~ {item['symbol']}  {item['old_name']!r} -> {item['new_name']!r}"
+            for item in self.planned["name_variant"]
+        ]
+        return lines
+
+    def apply(self, db, dry_run: bool = False, chunk_size: int = BULK_CHUNK_SIZE) -> Dict:
+        """Write every collected change, or only print the diff when `dry_run` is set"""
+        started = time.perf_counter()
+        summary = {
+            "dry_run": dry_run,
+            "counts": self.counts(),
+            "operations": len(self.operations),
+            "round_trips": 0,
+            "matched": 0,
+            "modified": 0,
+            "upserted": 0
+        }
+        if dry_run:
+            for line in self.describe():
+                print(line)
+        else:
+            for i in range(0, len(self.operations), chunk_size):
+                result = db.master_stocks.bulk_write(self.operations[i:i + chunk_size], ordered=False)
+                summary["round_trips"] += 1
+                summary["matched"] += result.matched_count
+                summary["modified"] += result.modified_count
+                summary["upserted"] += result.upserted_count
+        summary["seconds"] = round(time.perf_counter() - started, 3)
+        logger.info(f"Master stock changes{' (dry run)' if dry_run else ''}: {summary}")
+        return summary
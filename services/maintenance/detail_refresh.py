@@ -0,0 +1,235 @@
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+from typing import Dict, Iterable, Optional
+
+from config.settings import (
+    MAINTENANCE_CONCURRENCY, MAINTENANCE_RATE_LIMIT, MAINTENANCE_RETRIES, MAINTENANCE_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+# First retry waits about this long; later ones double, with full jitter
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+# Log progress every this many finished symbols
+PROGRESS_EVERY = 100
+
+
+class StockDetailsProvider:
+    """Blocking source of listing details for one NSE symbol"""
+
+    name = "base"
+
+    def fetch_details(self, symbol: str) -> Dict:
+        """Details for the symbol, {} if the provider knows nothing about it"""
+        raise NotImplementedError
+
+
+class YFinanceDetailsProvider(StockDetailsProvider):
+    name = "yfinance"
+
+    def fetch_details(self, symbol: str) -> Dict:
+        import yfinance as yf
+
+        info = yf.Ticker(f"{symbol}.NS").info
+        if not info:
+            return {}
+        return {
+            "display_name": info.get("longName", symbol),
+            "nse_code": symbol,
+            "yfinance_symbol": f"{symbol}.NS",
+            "isin": info.get("isin", ""),
+            "upstox_symbol": symbol,  # Usually same as NSE code
+            "upstox_transaction_code": info.get("longName", symbol),  # Default to long name
+            "upstox_holdings_code": symbol,  # Usually same as NSE code
+            "classification": {
+                "sector": info.get("sector"),
+                "industry": info.get("industry")
+            }
+        }
+
+
+class StubDetailsProvider(StockDetailsProvider):
+    """
+    Serves details from a dict or a JSON file of {symbol: details}, for
+    tests and offline runs. `latency` simulates the HTTP round trip and
+    `failures` makes the first N calls for a symbol raise.
+    """
+
+    name = "stub"
+
+    def __init__(self, details: Optional[Dict[str, Dict]] = None, path: str = "",
+                 latency: float = 0.0, failures: Optional[Dict[str, int]] = None):
+        if details is None and path:
+            with open(path) as f:
+                details = json.load(f)
+        self.details = details or {}
+        self.latency = latency
+        self.failures = dict(failures or {})
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def fetch_details(self, symbol: str) -> Dict:
+        with self.lock:
+            self.calls += 1
+            failing = self.failures.get(symbol, 0) > 0
+            if failing:
+                self.failures[symbol] -= 1
+        if self.latency:
+            time.sleep(self.latency)
+        if failing:
+            raise ConnectionError(f"Simulated failure for {symbol}")
+        return dict(self.details.get(symbol, {}))
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = (1.0 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RefreshMetrics:
+    """Counters for one detail refresh run"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.succeeded = 0
+        self.empty = 0
+        self.failed = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.errors: Dict[str, str] = {}
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+
+    @property
+    def finished(self) -> int:
+        return self.succeeded + self.empty + self.failed
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def summary(self) -> Dict:
+        return {
+            "total": self.total,
+            "succeeded": self.succeeded,
+            "empty": self.empty,
+            "failed": self.failed,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "seconds": round(self.elapsed, 2),
+            "errors": dict(self.errors)
+        }
+
+
+class DetailRefresher:
+    """
+    Fetches details for many symbols on a bounded thread pool. Every
+    provider call takes a token from a shared bucket, is abandoned after
+    `timeout` seconds and is retried with jittered exponential backoff.
+    """
+
+    def __init__(self, provider: StockDetailsProvider,
+                 max_workers: int = MAINTENANCE_CONCURRENCY,
+                 rate_limit: float = MAINTENANCE_RATE_LIMIT,
+                 timeout: float = MAINTENANCE_TIMEOUT,
+                 retries: int = MAINTENANCE_RETRIES,
+                 base_delay: float = RETRY_BASE_DELAY):
+        self.provider = provider
+        self.max_workers = max_workers
+        self.bucket = TokenBucket(rate_limit)
+        self.timeout = timeout
+        self.retries = retries
+        self.base_delay = base_delay
+        self.metrics: Optional[RefreshMetrics] = None
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(RETRY_MAX_DELAY, self.base_delay * 2 ** attempt))
+
+    def _fetch_one(self, symbol: str, calls: ThreadPoolExecutor, metrics: RefreshMetrics) -> Dict:
+        for attempt in range(self.retries + 1):
+            if attempt:
+                with metrics.lock:
+                    metrics.retries += 1
+                time.sleep(self._backoff(attempt - 1))
+            self.bucket.acquire()
+            # The call runs on its own thread so a hung request cannot hold this worker past the timeout
+            future = calls.submit(self.provider.fetch_details, symbol)
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                # Drops the call if it never started; a running one is left to finish on its own
+                future.cancel()
+                with metrics.lock:
+                    metrics.timeouts += 1
+                error = f"timed out after {self.timeout}s"
+            except Exception as e:
+                error = str(e)
+            logger.debug(f"Details for {symbol} failed (attempt {attempt + 1}): {error}")
+        raise RuntimeError(error)
+
+    def refresh(self, symbols: Iterable[str]) -> Dict[str, Dict]:
+        """Details per symbol for every symbol that returned any; see self.metrics for the run"""
+        symbols = list(dict.fromkeys(symbols))
+        metrics = RefreshMetrics(len(symbols))
+        self.metrics = metrics
+        results: Dict[str, Dict] = {}
+        if not symbols:
+            return results
+
+        # Spare call threads so abandoned (timed out) calls do not starve new ones
+        calls = ThreadPoolExecutor(max_workers=self.max_workers * 2, thread_name_prefix="details-call")
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="details") as workers:
+                futures = {workers.submit(self._fetch_one, symbol, calls, metrics): symbol for symbol in symbols}
+                for future in as_completed(futures):
+                    symbol = futures[future]
+                    try:
+                        details = future.result()
+                    except Exception as e:
+                        with metrics.lock:
+                            metrics.failed += 1
+                            metrics.errors[symbol] = str(e)
+                    else:
+                        with metrics.lock:
+                            if details:
+                                metrics.succeeded += 1
+                                results[symbol] = details
+                            else:
+                                metrics.empty += 1
+                    if metrics.finished % PROGRESS_EVERY == 0 or metrics.finished == metrics.total:
+                        logger.info(
+                            f"Details {metrics.finished}/{metrics.total}: {metrics.succeeded} ok, "
+                            f"{metrics.empty} empty, {metrics.failed} failed, {metrics.retries} retries "
+                            f"({metrics.elapsed:.1f}s)"
+                        )
+        finally:
+            # Do not wait on calls that were abandoned after a timeout
+            calls.shutdown(wait=False)
+
+        return results
@@ -0,0 +1,172 @@
+import hashlib
+import io
+import json
+import logging
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Mapping, Optional, Tuple
+import pandas as pd
+from pymongo import DeleteMany, UpdateOne
+
+from config.settings import NSE_LISTING_FILE
+
+logger = logging.getLogger(__name__)
+
+NSE_EQUITY_LIST_URL = "https://archives.nseindia.com/content/equities/EQUITY_L.csv"
+STATE_COLLECTION = "maintenance_state"
+FINGERPRINT_COLLECTION = "listing_fingerprints"
+LISTING_STATE_ID = "nse_equity_listing"
+# NSE archives refuse requests without a browser-like user agent
+REQUEST_HEADERS = {"User-Agent": "Mozilla/5.0"}
+REQUEST_TIMEOUT = 30
+UPSERT_CHUNK_SIZE = 1000
+
+
+def parse_listing(text: str) -> Dict[str, Dict[str, str]]:
+    """EQUITY_L rows keyed by symbol, every field as a stripped string"""
+    df = pd.read_csv(io.StringIO(text), dtype=str, keep_default_na=False)
+    # The published header has leading spaces (' NAME OF COMPANY')
+    df.columns = [column.strip() for column in df.columns]
+    rows = {}
+    for record in df.to_dict('records'):
+        row = {key: str(value).strip() for key, value in record.items()}
+        if row.get('SYMBOL'):
+            rows[row['SYMBOL']] = row
+    return rows
+
+
+def row_fingerprint(row: Dict[str, str]) -> str:
+    return hashlib.sha1(json.dumps(row, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+# (url, request headers, timeout) -> (status, body, response headers)
+Fetcher = Callable[[str, Dict[str, str], float], Tuple[int, bytes, Mapping[str, str]]]
+
+
+def http_get(url: str, headers: Dict[str, str], timeout: float) -> Tuple[int, bytes, Mapping[str, str]]:
+    """GET with urllib; a 304 comes back as a status rather than an exception"""
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, response.read(), response.headers
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return 304, b"", e.headers
+        raise
+
+
+class ListingSync:
+    """
+    Incremental view of the NSE equity list. The file is fetched with
+    If-None-Match / If-Modified-Since against the validators stored from
+    the last run, and each row is fingerprinted so only symbols whose row
+    changed, or that are new, need their details re-queried. With
+    NSE_LISTING_FILE set the local file is read instead of the network.
+    """
+
+    def __init__(self, db, url: str = NSE_EQUITY_LIST_URL, path: str = NSE_LISTING_FILE,
+                 timeout: float = REQUEST_TIMEOUT, fetcher: Fetcher = http_get):
+        self.db = db
+        self.url = url
+        self.path = path
+        self.timeout = timeout
+        self.fetcher = fetcher
+        self.pending_state: Dict = {}
+
+    def _state(self) -> Dict:
+        return self.db[STATE_COLLECTION].find_one({"_id": LISTING_STATE_ID}) or {}
+
+    def _save_state(self, fields: Dict):
+        self.db[STATE_COLLECTION].update_one({"_id": LISTING_STATE_ID}, {"$set": fields}, upsert=True)
+
+    def fetch(self, force: bool = False) -> Optional[str]:
+        """Listing CSV text, or None when it has not changed since the last committed sync"""
+        state = {} if force else self._state()
+        if self.path:
+            with open(self.path, 'rb') as f:
+                content = f.read()
+            validators = {}
+        else:
+            headers = dict(REQUEST_HEADERS)
+            if state.get('etag'):
+                headers['If-None-Match'] = state['etag']
+            if state.get('last_modified'):
+                headers['If-Modified-Since'] = state['last_modified']
+            status, content, response_headers = self.fetcher(self.url, headers, self.timeout)
+            if status == 304:
+                logger.info("NSE equity list not modified")
+                return None
+            validators = {
+                "etag": response_headers.get('ETag'),
+                "last_modified": response_headers.get('Last-Modified')
+            }
+            validators = {key: value for key, value in validators.items() if value}
+
+        # Servers without validators (and fixture files) are compared by content
+        content_hash = hashlib.sha1(content).hexdigest()
+        if content_hash == state.get('content_hash'):
+            if validators:
+                self._save_state(validators)
+            logger.info("NSE equity list unchanged")
+            return None
+
+        self.pending_state = {**validators, "content_hash": content_hash}
+        return content.decode('utf-8', errors='replace')
+
+    def diff(self, rows: Dict[str, Dict[str, str]]) -> Dict:
+        """New, changed and removed symbols against the stored fingerprints"""
+        stored = {
+            doc['_id']: doc['fingerprint']
+            for doc in self.db[FINGERPRINT_COLLECTION].find({}, {"fingerprint": 1})
+        }
+        fingerprints = {symbol: row_fingerprint(row) for symbol, row in rows.items()}
+        return {
+            "symbols": set(rows),
+            "rows": rows,
+            "fingerprints": fingerprints,
+            "new": sorted(set(fingerprints) - set(stored)),
+            "changed": sorted(s for s, fp in fingerprints.items() if s in stored and stored[s] != fp),
+            "removed": sorted(set(stored) - set(fingerprints))
+        }
+
+    def check(self, force: bool = False) -> Optional[Dict]:
+        """Changes since the last committed sync, or None when the list is unchanged"""
+        started = time.perf_counter()
+        text = self.fetch(force)
+        if text is None:
+            return None
+        changes = self.diff(parse_listing(text))
+        logger.info(
+            f"NSE equity list: {len(changes['symbols'])} symbols, {len(changes['new'])} new, "
+            f"{len(changes['changed'])} changed, {len(changes['removed'])} removed "
+            f"({time.perf_counter() - started:.2f}s)"
+        )
+        return changes
+
+    def commit(self, changes: Dict, skip: Iterable[str] = ()):
+        """
+        Store the fingerprints of a processed check. Symbols in `skip`
+        (details that could not be fetched) keep their old fingerprint so
+        they come up again, and the fetch validators are then left alone
+        so the next run downloads the list instead of getting a 304.
+        """
+        skip = set(skip)
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {"_id": symbol},
+                {"$set": {"fingerprint": changes['fingerprints'][symbol], "updated_at": now}},
+                upsert=True
+            )
+            for symbol in changes['new'] + changes['changed'] if symbol not in skip
+        ]
+        if changes['removed']:
+            operations.append(DeleteMany({"_id": {"$in": changes['removed']}}))
+        for i in range(0, len(operations), UPSERT_CHUNK_SIZE):
+            self.db[FINGERPRINT_COLLECTION].bulk_write(operations[i:i + UPSERT_CHUNK_SIZE], ordered=False)
+
+        if not skip and self.pending_state:
+            self._save_state({**self.pending_state, "synced_at": now})
+        self.pending_state = {}
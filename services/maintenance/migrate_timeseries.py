@@ -0,0 +1,141 @@
+import logging
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Optional
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import CollectionInvalid
+
+logger = logging.getLogger(__name__)
+
+SOURCE_COLLECTION = "historical_prices"
+TARGET_COLLECTION = "historical_prices_ts"
+STATE_COLLECTION = "maintenance_state"
+MIGRATION_BATCH_SIZE = 10000
+# Daily bars; 'hours' buckets span 30 days, the widest preset granularity
+TIMESERIES_GRANULARITY = "hours"
+
+
+def _state_id(target: str) -> str:
+    return f"timeseries_migration:{target}"
+
+
+def create_timeseries_collection(db, target: str = TARGET_COLLECTION):
+    """Time-series collection with symbol as metaField and date as timeField, plus the range index"""
+    try:
+        db.create_collection(target, timeseries={
+            "timeField": "date",
+            "metaField": "symbol",
+            "granularity": TIMESERIES_GRANULARITY
+        })
+        logger.info(f"Created time-series collection {target}")
+    except CollectionInvalid:
+        pass
+    db[target].create_index([("symbol", ASCENDING), ("date", DESCENDING)])
+
+
+def migrate(db, source: str = SOURCE_COLLECTION, target: str = TARGET_COLLECTION,
+            batch_size: int = MIGRATION_BATCH_SIZE, restart: bool = False) -> Dict:
+    """
+    Copy bars from `source` into the time-series collection in _id order,
+    recording the last copied _id after every batch so an interrupted run
+    picks up where it stopped. Running it again after new bars arrive
+    copies just those. Returns a summary of the run.
+    """
+    started = time.perf_counter()
+    create_timeseries_collection(db, target)
+    state_id = _state_id(target)
+    if restart:
+        db[STATE_COLLECTION].delete_one({"_id": state_id})
+    state = db[STATE_COLLECTION].find_one({"_id": state_id}) or {}
+    last_id = state.get("last_id")
+
+    copied = skipped = batches = 0
+    resuming = last_id is not None
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        documents = list(db[source].find(query).sort("_id", ASCENDING).limit(batch_size))
+        if not documents:
+            break
+        if resuming:
+            # The run may have stopped after inserting this batch but before recording it
+            ids = [doc["_id"] for doc in documents]
+            present = {doc["_id"] for doc in db[target].find({"_id": {"$in": ids}}, {"_id": 1})}
+            skipped += len(present)
+            documents_to_copy = [doc for doc in documents if doc["_id"] not in present]
+            resuming = False
+        else:
+            documents_to_copy = documents
+        if documents_to_copy:
+            db[target].insert_many(documents_to_copy, ordered=False)
+        copied += len(documents_to_copy)
+        batches += 1
+        last_id = documents[-1]["_id"]
+        db[STATE_COLLECTION].update_one(
+            {"_id": state_id},
+            {"$set": {"last_id": last_id, "copied_at": datetime.utcnow()}, "$inc": {"copied": len(documents_to_copy)}},
+            upsert=True
+        )
+        if batches % 10 == 0:
+            logger.info(f"Copied {copied} bars in {batches} batches ({time.perf_counter() - started:.0f}s)")
+
+    summary = {"copied": copied, "skipped": skipped, "batches": batches,
+               "seconds": round(time.perf_counter() - started, 2)}
+    logger.info(f"Time-series migration {source} -> {target}: {summary}")
+    return summary
+
+
+def _counts_by_symbol(db, collection: str) -> Dict[str, int]:
+    return {
+        doc["_id"]: doc["count"]
+        for doc in db[collection].aggregate([{"$group": {"_id": "$symbol", "count": {"$sum": 1}}}],
+                                            allowDiskUse=True)
+    }
+
+
+def verify(db, source: str = SOURCE_COLLECTION, target: str = TARGET_COLLECTION) -> Dict:
+    """Compare total and per-symbol row counts between the two collections"""
+    source_counts = _counts_by_symbol(db, source)
+    target_counts = _counts_by_symbol(db, target)
+    mismatched = {
+        symbol: {"source": source_counts.get(symbol, 0), "target": target_counts.get(symbol, 0)}
+        for symbol in set(source_counts) | set(target_counts)
+        if source_counts.get(symbol, 0) != target_counts.get(symbol, 0)
+    }
+    result = {
+        "source_rows": sum(source_counts.values()),
+        "target_rows": sum(target_counts.values()),
+        "symbols": len(source_counts),
+        "mismatched": mismatched,
+        "ok": not mismatched
+    }
+    if result["ok"]:
+        logger.info(f"Verified {result['target_rows']} bars for {result['symbols']} symbols; "
+                    f"set HISTORY_COLLECTION={target} to switch reads over")
+    else:
+        logger.warning(f"{len(mismatched)} symbols differ between {source} and {target}")
+    return result
+
+
+def main(argv: Optional[list] = None):
+    """python -m services.maintenance.migrate_timeseries [migrate|verify] [--restart]"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    from config.database import get_sync_database
+
+    argv = sys.argv[1:] if argv is None else argv
+    command = argv[0] if argv else "migrate"
+    db = get_sync_database()
+    if command == "migrate":
+        migrate(db, restart="--restart" in argv)
+        verify(db)
+    elif command == "verify":
+        verify(db)
+    else:
+        print(main.__doc__)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+import json
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+import pytz
+from pymongo import UpdateOne
+
+from config.calendars import get_calendar
+from config.exchanges import EXCHANGE_CONFIGS
+from config.settings import HISTORY_COLLECTION, HISTORY_FIXTURE_FILE, YFINANCE_TIMEOUT
+from services.close_prices import ensure_history_indexes, is_timeseries_collection
+from services.rollups import refresh_rollups
+
+logger = logging.getLogger(__name__)
+
+BAR_FIELDS = ("open", "high", "low", "close", "volume")
+# Tickers per provider call
+HISTORY_BATCH_SIZE = 200
+# Backfill for symbols with no stored bars yet
+INITIAL_HISTORY_DAYS = 5 * 365
+UPSERT_CHUNK_SIZE = 5000
+
+# Columnar bars: "symbol" and "date" arrays plus one float array per BAR_FIELDS entry
+Bars = Dict[str, np.ndarray]
+
+
+def empty_bars() -> Bars:
+    bars = {"symbol": np.array([], dtype=object), "date": np.array([], dtype='datetime64[D]')}
+    bars.update({field: np.array([], dtype=np.float64) for field in BAR_FIELDS})
+    return bars
+
+
+def concat_bars(parts: Iterable[Bars]) -> Bars:
+    parts = [part for part in parts if len(part["date"])]
+    if not parts:
+        return empty_bars()
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+
+def frame_to_bars(data, symbols: List[str]) -> Bars:
+    """
+    Normalise a yf.download frame (dates x (field, ticker) columns) into
+    columnar bars, one row per (symbol, date) with a close.
+    """
+    if data is None or data.empty:
+        return empty_bars()
+    columns = {}
+    for field in BAR_FIELDS:
+        frame = data[field.capitalize()]
+        if not hasattr(frame, 'columns'):
+            frame = frame.to_frame(symbols[0])
+        columns[field] = frame.reindex(columns=symbols).to_numpy(dtype=np.float64)
+
+    rows, cols = np.nonzero(np.isfinite(columns["close"]))
+    dates = data.index.values.astype('datetime64[D]')
+    bars = {"symbol": np.array(symbols, dtype=object)[cols], "date": dates[rows]}
+    bars.update({field: values[rows, cols] for field, values in columns.items()})
+    return bars
+
+
+class HistoryProvider:
+    """Blocking source of daily bars for many tickers per call"""
+
+    name = "base"
+
+    def fetch_history(self, symbols: List[str], start: date, end: date) -> Bars:
+        """Bars with start <= date <= end for the provider symbols it could resolve"""
+        raise NotImplementedError
+
+
+class YFinanceHistoryProvider(HistoryProvider):
+    name = "yfinance"
+
+    def fetch_history(self, symbols: List[str], start: date, end: date) -> Bars:
+        import yfinance as yf
+
+        data = yf.download(
+            symbols,
+            start=start.isoformat(),
+            end=(end + timedelta(days=1)).isoformat(),
+            interval="1d",
+            group_by="column",
+            progress=False,
+            threads=True,
+            auto_adjust=False,
+            timeout=YFINANCE_TIMEOUT
+        )
+        return frame_to_bars(data, symbols)
+
+
+class FixtureHistoryProvider(HistoryProvider):
+    """
+    Serves bars from a dict or a JSON file of
+    {symbol: [[YYYY-MM-DD, open, high, low, close, volume], ...]}, for
+    tests and offline runs.
+    """
+
+    name = "fixture"
+
+    def __init__(self, history: Optional[Dict[str, List[list]]] = None, path: str = ""):
+        if history is None and path:
+            with open(path) as f:
+                history = json.load(f)
+        self.history = {}
+        for symbol, rows in (history or {}).items():
+            rows = sorted(rows)
+            bars = {"symbol": np.array([symbol] * len(rows), dtype=object),
+                    "date": np.array([row[0] for row in rows], dtype='datetime64[D]')}
+            bars.update({field: np.array([row[i + 1] for row in rows], dtype=np.float64)
+                         for i, field in enumerate(BAR_FIELDS)})
+            self.history[symbol] = bars
+        self.calls = 0
+
+    def fetch_history(self, symbols: List[str], start: date, end: date) -> Bars:
+        self.calls += 1
+        lo, hi = np.datetime64(start, 'D'), np.datetime64(end, 'D')
+        parts = []
+        for symbol in symbols:
+            bars = self.history.get(symbol)
+            if bars is not None:
+                keep = (bars["date"] >= lo) & (bars["date"] <= hi)
+                parts.append({key: values[keep] for key, values in bars.items()})
+        return concat_bars(parts)
+
+
+def default_history_provider() -> HistoryProvider:
+    if HISTORY_FIXTURE_FILE:
+        return FixtureHistoryProvider(path=HISTORY_FIXTURE_FILE)
+    return YFinanceHistoryProvider()
+
+
+def closed_through(exchange_code: str, now: datetime) -> np.datetime64:
+    """
+    Last local day whose session has closed by `now` (aware, or naive
+    UTC). The bar of a session still in progress is partial and is left
+    for the run after the close.
+    """
+    exchange_config = EXCHANGE_CONFIGS.get(exchange_code)
+    now = now if now.tzinfo else pytz.UTC.localize(now)
+    if exchange_config is None:
+        return np.datetime64(now.astimezone(pytz.UTC).date() - timedelta(days=1), 'D')
+    local_now = now.astimezone(pytz.timezone(exchange_config.timezone))
+    hour, minute = (int(part) for part in exchange_config.trading_hours["end"].split(":"))
+    day = local_now.date()
+    if (local_now.hour, local_now.minute) < (hour, minute):
+        day -= timedelta(days=1)
+    return np.datetime64(day, 'D')
+
+
+def ingestion_targets(db, exchange_code: Optional[str] = None) -> Dict[str, Dict]:
+    """
+    Provider symbol -> {exchange_code, spellings} for every held listing
+    plus each exchange's benchmark index, or only those of `exchange_code`.
+    `spellings` are the symbols the listing may already be stored under
+    (RELIANCE, RELIANCE.NS).
+    """
+    targets: Dict[str, Dict] = {}
+
+    def add(symbol: str, code: str):
+        if exchange_code and code != exchange_code:
+            return
+        exchange_config = EXCHANGE_CONFIGS.get(code)
+        suffix = exchange_config.symbol_suffix if exchange_config else ""
+        provider_symbol = symbol if not suffix or symbol.endswith(suffix) or symbol.startswith("^") \
+            else f"{symbol}{suffix}"
+        target = targets.setdefault(provider_symbol, {"exchange_code": code, "spellings": set()})
+        target["spellings"].update({symbol, provider_symbol})
+
+    for portfolio in db.portfolios.find({}, {"holdings.stock_symbol": 1, "holdings.exchange_code": 1}):
+        for holding in portfolio.get("holdings", []):
+            if holding.get("stock_symbol"):
+                add(holding["stock_symbol"], holding.get("exchange_code") or "NSE")
+    for code, exchange_config in EXCHANGE_CONFIGS.items():
+        if exchange_config.benchmark_symbol:
+            add(exchange_config.benchmark_symbol, code)
+    return targets
+
+
+def last_stored_dates(db, targets: Dict[str, Dict]) -> Dict[str, np.datetime64]:
+    """Latest stored bar day per provider symbol over all its spellings, in one aggregation"""
+    owner = {spelling: symbol for symbol, target in targets.items() for spelling in target["spellings"]}
+    latest: Dict[str, np.datetime64] = {}
+    for doc in db[HISTORY_COLLECTION].aggregate([
+        {"$match": {"symbol": {"$in": list(owner)}}},
+        {"$group": {"_id": "$symbol", "last": {"$max": "$date"}}}
+    ]):
+        symbol = owner[doc["_id"]]
+        day = np.datetime64(doc["last"].replace(tzinfo=None), 'D')
+        if symbol not in latest or day > latest[symbol]:
+            latest[symbol] = day
+    return latest
+
+
+def plan_batches(targets: Dict[str, Dict], latest: Dict[str, np.datetime64], ends: Dict[str, np.datetime64],
+                 batch_size: int = HISTORY_BATCH_SIZE) -> List[Dict]:
+    """
+    Provider calls needed to bring every symbol up to its exchange's last
+    closed session (`ends`, by exchange code). Symbols whose exchange has
+    had no closed session since their last bar are skipped; the rest are
+    sorted by their first missing day and cut into batches, so symbols
+    that are equally far behind share a call.
+    """
+    pending = []
+    for symbol, target in targets.items():
+        end = ends[target["exchange_code"]]
+        last = latest.get(symbol)
+        start = last + np.timedelta64(1, 'D') if last is not None \
+            else end - np.timedelta64(INITIAL_HISTORY_DAYS, 'D')
+        if start > end or get_calendar(target["exchange_code"]).count_sessions(start, end) == 0:
+            continue
+        pending.append((start, end, symbol))
+
+    pending.sort()
+    return [{
+        "symbols": [symbol for _, _, symbol in pending[i:i + batch_size]],
+        "start": pending[i][0].item(),
+        "end": max(end for _, end, _ in pending[i:i + batch_size]).item()
+    } for i in range(0, len(pending), batch_size)]
+
+
+def new_bars(bars: Bars, latest: Dict[str, np.datetime64],
+             until: Optional[Dict[str, np.datetime64]] = None) -> Bars:
+    """
+    The bars newer than each symbol's last stored day and, with `until`,
+    no later than its exchange's last closed session
+    """
+    last = np.array([latest.get(symbol, np.datetime64('NaT')) for symbol in bars["symbol"]],
+                    dtype='datetime64[D]')
+    keep = np.isnat(last) | (bars["date"] > last)
+    if until is not None:
+        end = np.array([until.get(symbol, np.datetime64('NaT')) for symbol in bars["symbol"]],
+                       dtype='datetime64[D]')
+        keep &= ~np.isnat(end) & (bars["date"] <= end)
+    return {key: values[keep] for key, values in bars.items()}
+
+
+def bar_documents(bars: Bars) -> List[Dict]:
+    """One document per bar, for inserts into a time-series collection"""
+    now = datetime.utcnow()
+    finite = {field: np.isfinite(bars[field]) for field in BAR_FIELDS}
+    documents = []
+    for i, (symbol, day) in enumerate(zip(bars["symbol"], bars["date"].astype(object))):
+        document = {"symbol": symbol, "date": datetime(day.year, day.month, day.day), "updated_at": now}
+        document.update({field: float(bars[field][i]) for field in BAR_FIELDS if finite[field][i]})
+        documents.append(document)
+    return documents
+
+
+def bar_operations(bars: Bars) -> List[UpdateOne]:
+    """One upsert per bar, keyed on (symbol, date)"""
+    now = datetime.utcnow()
+    finite = {field: np.isfinite(bars[field]) for field in BAR_FIELDS}
+    operations = []
+    for i, (symbol, day) in enumerate(zip(bars["symbol"], bars["date"].astype(object))):
+        bar = {field: float(bars[field][i]) for field in BAR_FIELDS if finite[field][i]}
+        bar["updated_at"] = now
+        operations.append(UpdateOne(
+            {"symbol": symbol, "date": datetime(day.year, day.month, day.day)},
+            {"$set": bar},
+            upsert=True
+        ))
+    return operations
+
+
+def ingest_prices(db, provider: Optional[HistoryProvider] = None, now: Optional[datetime] = None,
+                  batch_size: int = HISTORY_BATCH_SIZE, exchange_code: Optional[str] = None) -> Dict:
+    """
+    Fetch the bars missing since each held symbol's (and benchmark's) last
+    stored day, up to its exchange's last closed session, write them to
+    the history collection and rebuild the affected weekly/monthly
+    rollups. `exchange_code` limits the run to that exchange's listings.
+    Plain collections get upserts keyed on (symbol, date); time-series
+    collections, which do not support upserts, get inserts, which is safe
+    because only final bars after the last stored day are written.
+    Returns a summary of the run.
+    """
+    started = time.perf_counter()
+    provider = provider or default_history_provider()
+    now = now or datetime.now(pytz.UTC)
+    ensure_history_indexes(db)
+    timeseries = is_timeseries_collection(db)
+
+    targets = ingestion_targets(db, exchange_code)
+    latest = last_stored_dates(db, targets)
+    ends = {code: closed_through(code, now) for code in {target["exchange_code"] for target in targets.values()}}
+    until = {symbol: ends[target["exchange_code"]] for symbol, target in targets.items()}
+    batches = plan_batches(targets, latest, ends, batch_size)
+
+    summary = {"symbols": len(targets), "batches": len(batches), "rows": 0, "upserted": 0,
+               "modified": 0, "failed_batches": 0}
+    written = set()
+    earliest = None
+    for n, batch in enumerate(batches, 1):
+        try:
+            bars = provider.fetch_history(batch["symbols"], batch["start"], batch["end"])
+        except Exception as e:
+            summary["failed_batches"] += 1
+            logger.error(f"History batch {n}/{len(batches)} ({len(batch['symbols'])} symbols) failed: {e}")
+            continue
+
+        bars = new_bars(bars, latest, until)
+        operations = bar_documents(bars) if timeseries else bar_operations(bars)
+        for i in range(0, len(operations), UPSERT_CHUNK_SIZE):
+            chunk = operations[i:i + UPSERT_CHUNK_SIZE]
+            if timeseries:
+                summary["upserted"] += len(db[HISTORY_COLLECTION].insert_many(chunk, ordered=False).inserted_ids)
+                continue
+            result = db[HISTORY_COLLECTION].bulk_write(chunk, ordered=False)
+            summary["upserted"] += result.upserted_count
+            summary["modified"] += result.modified_count
+        summary["rows"] += len(operations)
+        if operations:
+            written.update(bars["symbol"])
+            first = bars["date"].min().item()
+            earliest = first if earliest is None else min(earliest, first)
+        logger.info(f"History batch {n}/{len(batches)}: {len(operations)} bars for {len(batch['symbols'])} symbols")
+
+    if written:
+        refresh_rollups(db, symbols=written, since=datetime(earliest.year, earliest.month, earliest.day))
+
+    summary["seconds"] = round(time.perf_counter() - started, 2)
+    logger.info(f"Price ingestion: {summary}")
+    return summary
@@ -0,0 +1,412 @@
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import pytz
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
+
+from config.calendars import get_calendar
+from config.exchanges import EXCHANGE_CONFIGS
+from config.settings import SCHEDULER_NODE_ID, SCHEDULER_POLL_SECONDS
+from services.price_service import is_market_open, next_market_open
+
+logger = logging.getLogger(__name__)
+
+LOCK_COLLECTION = "job_locks"
+RUN_COLLECTION = "job_runs"
+# A missed slot is still run if the daemon comes up within this long of it
+DEFAULT_CATCH_UP = timedelta(hours=12)
+# Locks outlive a crashed node by at most this long; running jobs renew theirs
+DEFAULT_LOCK_TTL = timedelta(minutes=10)
+
+JobFunction = Callable[..., Optional[Dict]]
+
+
+def _utc(value: datetime) -> datetime:
+    return value if value.tzinfo else pytz.UTC.localize(value)
+
+
+def _session_time(exchange_code: str, day, hhmm: str) -> datetime:
+    """Aware UTC datetime of a local HH:MM on an exchange's day"""
+    exchange_config = EXCHANGE_CONFIGS[exchange_code]
+    tz = pytz.timezone(exchange_config.timezone)
+    hour, minute = (int(part) for part in hhmm.split(":"))
+    return tz.localize(datetime(day.year, day.month, day.day, hour, minute)).astimezone(pytz.UTC)
+
+
+class Schedule:
+    """When a job is due; slots are aware UTC datetimes"""
+
+    def next_after(self, moment: datetime) -> datetime:
+        """First slot strictly after `moment`"""
+        raise NotImplementedError
+
+    def describe(self) -> str:
+        raise NotImplementedError
+
+
+class SessionSchedule(Schedule):
+    """
+    A fixed offset from an exchange's session open or close, on that
+    exchange's trading days only, e.g. 45 minutes after NSE closes.
+    """
+
+    def __init__(self, exchange_code: str, anchor: str = "end", offset: timedelta = timedelta(0)):
+        self.exchange_code = exchange_code
+        self.anchor = anchor
+        self.offset = offset
+
+    def slot_on(self, day) -> datetime:
+        hhmm = EXCHANGE_CONFIGS[self.exchange_code].trading_hours[self.anchor]
+        return _session_time(self.exchange_code, day, hhmm) + self.offset
+
+    def next_after(self, moment: datetime) -> datetime:
+        tz = pytz.timezone(EXCHANGE_CONFIGS[self.exchange_code].timezone)
+        calendar = get_calendar(self.exchange_code)
+        # Start a day early so a negative offset can land on the previous local day
+        day = _utc(moment).astimezone(tz).date() - timedelta(days=1)
+        while True:
+            if calendar.is_session(day):
+                slot = self.slot_on(day)
+                if slot > moment:
+                    return slot
+            day += timedelta(days=1)
+
+    def describe(self) -> str:
+        minutes = int(self.offset.total_seconds() // 60)
+        when = "open" if self.anchor == "start" else "close"
+        return f"{self.exchange_code} {when} {minutes:+d} min"
+
+
+class MarketHoursInterval(Schedule):
+    """Every `seconds` while the exchange is trading, aligned to the interval"""
+
+    def __init__(self, exchange_code: str, seconds: int):
+        self.exchange_code = exchange_code
+        self.seconds = seconds
+
+    def next_after(self, moment: datetime) -> datetime:
+        exchange_config = EXCHANGE_CONFIGS[self.exchange_code]
+        moment = _utc(moment)
+        epoch = int(moment.timestamp())
+        slot = datetime.fromtimestamp(epoch - epoch % self.seconds + self.seconds, pytz.UTC)
+        if is_market_open(exchange_config, slot):
+            return slot
+        return next_market_open(exchange_config, slot)
+
+    def describe(self) -> str:
+        return f"every {self.seconds}s during {self.exchange_code} hours"
+
+
+class Job:
+    """
+    A named unit of work run as func(db). Jobs either have a schedule or
+    follow another job (`after`), running as soon as it succeeds for the
+    same slot. `locks` names shared resources; jobs holding a common lock
+    never run at the same time, on any node.
+    """
+
+    def __init__(self, name: str, func: JobFunction, schedule: Optional[Schedule] = None,
+                 after: Optional[str] = None, locks: Sequence[str] = (),
+                 lock_ttl: timedelta = DEFAULT_LOCK_TTL, catch_up: timedelta = DEFAULT_CATCH_UP):
+        if (schedule is None) == (after is None):
+            raise ValueError(f"Job {name} needs exactly one of schedule or after")
+        self.name = name
+        self.func = func
+        self.schedule = schedule
+        self.after = after
+        self.locks = tuple(sorted({f"job:{name}", *locks}))
+        self.lock_ttl = lock_ttl
+        self.catch_up = catch_up
+
+    def latest_slot(self, now: datetime) -> Optional[datetime]:
+        """Most recent slot at or before `now` within the catch-up window"""
+        slot = None
+        candidate = self.schedule.next_after(now - self.catch_up)
+        while candidate <= now:
+            slot = candidate
+            candidate = self.schedule.next_after(candidate)
+        return slot
+
+
+class JobLocks:
+    """
+    Leases in the job_locks collection, one document per lock name. A
+    lease is taken with a single conditional upsert and renewed from a
+    heartbeat thread while the job runs, so a crashed node's locks expire.
+    """
+
+    def __init__(self, db, owner: str):
+        self.db = db
+        self.owner = owner
+
+    def acquire(self, names: Sequence[str], ttl: timedelta) -> bool:
+        """Take every lock or none of them"""
+        taken = []
+        for name in names:
+            now = datetime.utcnow()
+            try:
+                self.db[LOCK_COLLECTION].update_one(
+                    {"_id": name, "$or": [{"expires_at": {"$lt": now}}, {"owner": self.owner}]},
+                    {"$set": {"owner": self.owner, "acquired_at": now, "expires_at": now + ttl}},
+                    upsert=True
+                )
+            except DuplicateKeyError:
+                # Held by another owner: the filter missed and the upsert hit the existing _id
+                self.release(taken)
+                return False
+            taken.append(name)
+        return True
+
+    def renew(self, names: Sequence[str], ttl: timedelta):
+        self.db[LOCK_COLLECTION].update_many(
+            {"_id": {"$in": list(names)}, "owner": self.owner},
+            {"$set": {"expires_at": datetime.utcnow() + ttl}}
+        )
+
+    def release(self, names: Sequence[str]):
+        if names:
+            self.db[LOCK_COLLECTION].delete_many({"_id": {"$in": list(names)}, "owner": self.owner})
+
+
+class Scheduler:
+    """
+    Runs registered jobs on one node of possibly several. A job first takes
+    its resource locks so it does not collide with jobs on other nodes,
+    then claims its (job, slot) by inserting the run record, so exactly one
+    node runs it; a job whose locks are busy is left unclaimed and retried
+    on a later tick. Jobs run one at a time per node. Every run is recorded
+    with its status, duration and summary in job_runs.
+    """
+
+    def __init__(self, db, jobs: Sequence[Job], node_id: str = SCHEDULER_NODE_ID,
+                 poll_seconds: int = SCHEDULER_POLL_SECONDS):
+        self.db = db
+        self.jobs = {job.name: job for job in jobs}
+        self.followers: Dict[str, List[Job]] = {}
+        for job in jobs:
+            if job.after:
+                if job.after not in self.jobs:
+                    raise ValueError(f"Job {job.name} follows unknown job {job.after}")
+                self.followers.setdefault(job.after, []).append(job)
+        self.node_id = node_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.poll_seconds = poll_seconds
+        self.locks = JobLocks(db, self.node_id)
+        self.claimed: Dict[str, datetime] = {}
+        self.stopping = threading.Event()
+
+    def ensure_indexes(self):
+        self.db[RUN_COLLECTION].create_index([("job", ASCENDING), ("started_at", DESCENDING)])
+
+    def due(self, now: datetime) -> List[Tuple[Job, datetime]]:
+        """Scheduled jobs whose latest slot this node has not claimed yet, oldest slot first"""
+        due = []
+        for job in self.jobs.values():
+            if job.schedule is None:
+                continue
+            slot = job.latest_slot(now)
+            if slot is not None and self.claimed.get(job.name) != slot:
+                due.append((job, slot))
+        return sorted(due, key=lambda item: item[1])
+
+    def _claim(self, job: Job, slot: datetime) -> Optional[str]:
+        run_id = f"{job.name}:{slot.isoformat()}"
+        self.claimed[job.name] = slot
+        try:
+            self.db[RUN_COLLECTION].insert_one({
+                "_id": run_id,
+                "job": job.name,
+                "slot": slot.replace(tzinfo=None),
+                "node": self.node_id,
+                "status": "running",
+                "started_at": datetime.utcnow()
+            })
+        except DuplicateKeyError:
+            return None
+        return run_id
+
+    def _heartbeat(self, job: Job, done: threading.Event):
+        interval = max(job.lock_ttl.total_seconds() / 3, 1)
+        while not done.wait(interval):
+            self.locks.renew(job.locks, job.lock_ttl)
+
+    def run_job(self, job: Job, slot: datetime, wait: bool = False) -> Optional[str]:
+        """
+        Take the job's locks, claim the slot and run it (then its
+        followers); returns the run status. When another node holds one of
+        the locks nothing is claimed and None is returned so a later tick
+        retries, unless `wait` is set.
+        """
+        while not self.locks.acquire(job.locks, job.lock_ttl):
+            if not wait:
+                logger.info(f"{job.name} for {slot}: locks held elsewhere, retrying later")
+                return None
+            if self.stopping.wait(self.poll_seconds):
+                return None
+
+        try:
+            run_id = self._claim(job, slot)
+            if run_id is None:
+                logger.debug(f"{job.name} for {slot} already claimed by another node")
+                return None
+
+            started = time.perf_counter()
+            done = threading.Event()
+            heartbeat = threading.Thread(target=self._heartbeat, args=(job, done), daemon=True)
+            heartbeat.start()
+            logger.info(f"Running {job.name} for slot {slot:%Y-%m-%d %H:%M} UTC")
+            try:
+                record = {"status": "succeeded", "summary": job.func(self.db)}
+            except Exception as e:
+                logger.exception(f"Job {job.name} failed")
+                record = {"status": "failed", "error": str(e)}
+            finally:
+                done.set()
+        finally:
+            self.locks.release(job.locks)
+
+        duration = time.perf_counter() - started
+        self.db[RUN_COLLECTION].update_one({"_id": run_id}, {"$set": {
+            **record, "finished_at": datetime.utcnow(), "duration_seconds": round(duration, 3)
+        }})
+        logger.info(f"{job.name} {record['status']} in {duration:.1f}s")
+
+        if record["status"] == "succeeded":
+            for follower in self.followers.get(job.name, []):
+                # Followers have no schedule of their own to retry them, so they wait for their locks
+                self.run_job(follower, slot, wait=True)
+        return record["status"]
+
+    def tick(self, now: Optional[datetime] = None):
+        now = _utc(now or datetime.now(pytz.UTC))
+        for job, slot in self.due(now):
+            if self.stopping.is_set():
+                break
+            self.run_job(job, slot)
+
+    def run_forever(self):
+        self.ensure_indexes()
+        logger.info(f"Scheduler {self.node_id} started with {len(self.jobs)} jobs")
+        while not self.stopping.is_set():
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("Scheduler tick failed")
+            self.stopping.wait(self.poll_seconds)
+
+    def stop(self):
+        self.stopping.set()
+
+    def describe(self, now: Optional[datetime] = None) -> List[str]:
+        now = _utc(now or datetime.now(pytz.UTC))
+        lines = []
+        for job in self.jobs.values():
+            if job.schedule is not None:
+                lines.append(f"{job.name:<22} {job.schedule.describe():<34} "
+                             f"next {job.schedule.next_after(now):%Y-%m-%d %H:%M} UTC")
+            else:
+                lines.append(f"{job.name:<22} {'after ' + job.after:<34}")
+        return lines
+
+
+def last_runs(db, job: Optional[str] = None, limit: int = 20) -> List[Dict]:
+    """Most recent run records, newest first"""
+    query = {"job": job} if job else {}
+    return list(db[RUN_COLLECTION].find(query).sort("started_at", DESCENDING).limit(limit))
+
+
+def _stock_master(db) -> Dict:
+    from services.maintenance.stock_updater import StockMasterMaintenance
+    return StockMasterMaintenance(db=db).update_stocks()
+
+
+def _corporate_actions(db) -> Dict:
+    from services.corporate_actions import apply_pending_actions
+    return apply_pending_actions(db)
+
+
+def _ingest_prices(exchange_code: str) -> JobFunction:
+    def ingest(db) -> Dict:
+        from services.maintenance.price_ingestion import ingest_prices
+        return ingest_prices(db, exchange_code=exchange_code)
+    return ingest
+
+
+def _anomaly_scan(db) -> Dict:
+    from services.anomaly_service import scan_anomalies
+    return scan_anomalies(db)
+
+
+def _stale_snapshots(exchange_code: str) -> JobFunction:
+    def refresh(db) -> Dict:
+        # Snapshots holding the exchange's listings are recomputed with the closing prices on next read
+        from services.snapshot_service import SNAPSHOT_COLLECTION
+        result = db[SNAPSHOT_COLLECTION].update_many(
+            {"symbols": {"$regex": f"^{exchange_code}:"}},
+            {"$set": {"stale": True}}
+        )
+        return {"snapshots": result.modified_count}
+    return refresh
+
+
+def default_jobs() -> List[Job]:
+    """
+    Stock master sync and corporate actions before NSE opens; bar ingestion
+    once each exchange's daily bars are published after its close, then
+    the anomaly scan and snapshot refresh that depend on those bars.
+    """
+    jobs = [
+        Job("stock_master", _stock_master,
+            SessionSchedule("NSE", "start", -timedelta(minutes=90)),
+            locks=("master_stocks",), lock_ttl=timedelta(minutes=30)),
+        Job("corporate_actions", _corporate_actions,
+            SessionSchedule("NSE", "start", -timedelta(minutes=60)),
+            locks=("portfolios",)),
+    ]
+    for code in EXCHANGE_CONFIGS:
+        ingestion = f"price_ingestion_{code.lower()}"
+        jobs.append(Job(ingestion, _ingest_prices(code), SessionSchedule(code, "end", timedelta(minutes=45)),
+                        locks=("historical_prices",), lock_ttl=timedelta(minutes=30)))
+        jobs.append(Job(f"snapshot_refresh_{code.lower()}", _stale_snapshots(code), after=ingestion))
+    jobs.append(Job("anomaly_scan", _anomaly_scan, after="price_ingestion_nse",
+                    locks=("historical_prices",)))
+    return jobs
+
+
+def main(argv: Optional[List[str]] = None):
+    """python -m services.maintenance.scheduler [run|list|history|once JOB]"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    from config.database import get_sync_database
+
+    argv = sys.argv[1:] if argv is None else argv
+    command = argv[0] if argv else "run"
+    db = get_sync_database()
+    scheduler = Scheduler(db, default_jobs())
+    if command == "run":
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            scheduler.stop()
+    elif command == "list":
+        print("\n".join(scheduler.describe()))
+    elif command == "history":
+        for run in last_runs(db, argv[1] if len(argv) > 1 else None):
+            print(f"{run['job']:<22} {run['slot']:%Y-%m-%d %H:%M}  {run['status']:<9} "
+                  f"{run.get('duration_seconds', 0):8.1f}s  {run['node']}")
+    elif command == "once" and len(argv) > 1:
+        scheduler.ensure_indexes()
+        scheduler.run_job(scheduler.jobs[argv[1]], datetime.now(pytz.UTC).replace(second=0, microsecond=0), wait=True)
+    else:
+        print(main.__doc__)
+
+
+if __name__ == "__main__":
+    main()
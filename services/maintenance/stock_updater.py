@@ -1,122 +1,103 @@
-from typing import Dict, List, Set
-import yfinance as yf
-from datetime import datetime
-import pytz
+from typing import Dict, List, Optional, Set
 import logging
-import pandas as pd
-import requests
+import sys
 
-from config.settings import MONGODB_URI
+from config.database import get_sync_database
+from services.maintenance.bulk_changes import MasterStockChanges, current_names
+from services.maintenance.detail_refresh import DetailRefresher, YFinanceDetailsProvider
+from services.maintenance.listing_sync import ListingSync
 #from scripts.setup.create_master_stocks import StockMaster
 
 class StockMasterMaintenance:
-    def __init__(self, stock_master: StockMaster):
+    def __init__(self, stock_master: Optional['StockMaster'] = None, refresher: Optional[DetailRefresher] = None,
+                 listing_sync: Optional[ListingSync] = None, db=None):
         self.stock_master = stock_master
+        self.db = db if db is not None else get_sync_database()
+        # Pass a refresher over StubDetailsProvider to run without the network
+        self.refresher = refresher or DetailRefresher(YFinanceDetailsProvider())
+        self.listing_sync = listing_sync or ListingSync(self.db)
         self.logger = logging.getLogger(__name__)
 
-    def get_current_nse_stocks(self) -> Set[str]:
-        """Fetch current NSE stock list"""
-        try:
-            # Get NSE stocks from NSE website
-            url = "https://archives.nseindia.com/content/equities/EQUITY_L.csv"
-            df = pd.read_csv(url)
-            
-            # Extract symbols and clean them
-            nse_stocks = set(df['SYMBOL'].str.strip())
-            self.logger.info(f"Found {len(nse_stocks)} stocks from NSE")
-            
-            return nse_stocks
-            
-        except Exception as e:
-            self.logger.error(f"Error fetching NSE stocks: {e}")
-            # Fallback method using yfinance if NSE website fails
-            try:
-                # You might need to adjust this based on available data
-                tickers = yf.Tickers("^NSEI")  # NSE Index
-                # This is a placeholder - you'll need to implement proper NSE stock fetching
-                self.logger.warning("Using fallback method to fetch NSE stocks")
-                return set()
-            except Exception as e2:
-                self.logger.error(f"Fallback method also failed: {e2}")
-                return set()
-
     def get_stock_details(self, symbol: str) -> Dict:
-        """Fetch detailed stock info from YFinance"""
+        """Fetch detailed stock info for one symbol from the details provider"""
         try:
             self.logger.info(f"Fetching details for {symbol}")
-            ticker = yf.Ticker(f"{symbol}.NS")
-            info = ticker.info
-            
+            info = self.refresher.provider.fetch_details(symbol)
             if not info:
                 self.logger.warning(f"No info found for {symbol}")
-                return {}
-                
-            return {
-                "display_name": info.get("longName", symbol),
-                "nse_code": symbol,
-                "yfinance_symbol": f"{symbol}.NS",
-                "isin": info.get("isin", ""),
-                "upstox_symbol": symbol,  # Usually same as NSE code
-                "upstox_transaction_code": info.get("longName", symbol),  # Default to long name
-                "upstox_holdings_code": symbol  # Usually same as NSE code
-            }
+            return info
         except Exception as e:
             self.logger.error(f"Error fetching details for {symbol}: {e}")
             return {}
 
     def detect_changes(self, current_stocks: Set[str]) -> Dict[str, List[str]]:
         """Detect new listings and delistings"""
+        if self.stock_master is not None:
+            active_stocks = self.stock_master.get_all_active_stocks()
+        else:
+            active_stocks = self.db.master_stocks.find(
+                {"status": "active", "identifiers.nse_code": {"$exists": True}},
+                {"_id": 0, "identifiers.nse_code": 1}
+            )
         existing_stocks = {stock["identifiers"]["nse_code"] 
-                         for stock in self.stock_master.get_all_active_stocks()}
+                         for stock in active_stocks}
         
         return {
             "new_listings": list(current_stocks - existing_stocks),
             "delistings": list(existing_stocks - current_stocks)
         }
 
-    def detect_name_changes(self, symbol: str, new_info: Dict) -> bool:
-        """Detect if stock name has changed"""
-        existing_stock = self.stock_master.find_stock(symbol)
-        if not existing_stock:
-            return False
-
-        current_name = existing_stock["display_name"]
-        new_name = new_info["display_name"]
-        
-        return current_name != new_name
-
-    def update_stocks(self):
-        """Main update routine"""
+    def update_stocks(self, force: bool = False, dry_run: bool = False) -> Optional[Dict]:
+        """
+        Main update routine. Only listing rows that changed since the last
+        sync (and new listings) have their details re-queried; an unchanged
+        upstream list ends the run after the conditional fetch. All
+        master_stocks changes are collected and written in bulk, or only
+        printed when `dry_run` is set. Returns the change summary.
+        """
         try:
-            # Get current NSE stocks
-            current_stocks = self.get_current_nse_stocks()
+            listing = self.listing_sync.check(force=force)
+            if listing is None:
+                self.logger.info("No upstream listing changes")
+                return None
+
+            current_stocks = listing["symbols"]
             changes = self.detect_changes(current_stocks)
+            to_query = set(changes["new_listings"]) | set(listing["new"]) | set(listing["changed"])
+
+            details = self.refresher.refresh(sorted(to_query))
+            metrics = self.refresher.metrics.summary()
+            self.logger.info(
+                f"Stock details refresh: {metrics['succeeded']}/{metrics['total']} ok, "
+                f"{metrics['failed']} failed in {metrics['seconds']}s"
+            )
+
+            mutations = MasterStockChanges()
+            for symbol in sorted(changes["new_listings"]):
+                if details.get(symbol):
+                    mutations.add_listing(details[symbol])
+            for symbol in sorted(changes["delistings"]):
+                mutations.add_delisting(symbol)
 
-            # Handle new listings
-            for symbol in changes["new_listings"]:
-                stock_info = self.get_stock_details(symbol)
-                if stock_info:
-                    self.stock_master.create_stock_entry(stock_info)
-                    self.logger.info(f"Added new stock: {symbol}")
+            # Name changes in stocks whose listing row changed, against one lookup of stored names
+            existing = sorted(to_query - set(changes["new_listings"]))
+            names = current_names(self.db, existing) if existing else {}
+            for symbol in existing:
+                new_info = details.get(symbol)
+                if new_info and symbol in names and names[symbol] != new_info["display_name"]:
+                    mutations.add_name_variant(symbol, names[symbol], new_info["display_name"], "yfinance_update")
 
-            # Handle delistings
-            for symbol in changes["delistings"]:
-                self.stock_master.update_status(symbol, "delisted")
-                self.logger.info(f"Marked as delisted: {symbol}")
+            summary = mutations.apply(self.db, dry_run=dry_run)
+            summary["details"] = {key: value for key, value in metrics.items() if key != "errors"}
 
-            # Check for name changes in existing stocks
-            for symbol in current_stocks:
-                new_info = self.get_stock_details(symbol)
-                if new_info and self.detect_name_changes(symbol, new_info):
-                    self.stock_master.add_name_variant(
-                        symbol,
-                        new_info["display_name"],
-                        "yfinance_update"
-                    )
-                    self.logger.info(f"Updated name for {symbol}")
+            if not dry_run:
+                # Symbols whose details failed keep their old fingerprint and are retried next run
+                self.listing_sync.commit(listing, skip=metrics["errors"])
+            return summary
 
         except Exception as e:
             self.logger.error(f"Error in update routine: {e}")
+            return None
 
 def main():
     """Main entry point for the script."""
@@ -129,16 +110,13 @@ def main():
     
     logger.info("Starting stock master maintenance...")
     
-    stock_master = StockMaster(MONGODB_URI)
-    maintenance = StockMasterMaintenance(stock_master)
+    maintenance = StockMasterMaintenance()
     
     try:
-        maintenance.update_stocks()
+        maintenance.update_stocks(force="--force" in sys.argv, dry_run="--dry-run" in sys.argv)
         logger.info("Stock master maintenance completed successfully")
     except Exception as e:
         logger.error(f"Error during maintenance: {e}")
-    finally:
-        stock_master.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,345 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from bson import ObjectId
+
+from config.calendars import sessions_for
+from config.exchanges import EXCHANGE_CONFIGS
+from config.settings import RISK_FREE_RATE
+from services.corporate_actions import adjust_matrix, factors_at, load_factor_table
+from services.history_cache import load_price_matrix
+from services.price_matrix import quantity_matrix, symbol_spellings
+
+CALENDAR_DAYS_PER_YEAR = 365
+# Periods per year for annualising returns on a trading-session series
+TRADING_DAYS_PER_YEAR = 252
+# Newton starting points for XIRR, iterated together as one array
+XIRR_GUESSES = (-0.9, -0.5, -0.1, 0.0, 0.1, 0.5, 1.0, 3.0)
+XIRR_MAX_ITERATIONS = 100
+XIRR_TOLERANCE = 1e-10
+
+
+def _days(values) -> np.ndarray:
+    """Sequence of datetimes (naive or aware) -> datetime64[D] array"""
+    return np.array(
+        [value.replace(tzinfo=None) if isinstance(value, datetime) else value for value in values],
+        dtype='datetime64[D]'
+    )
+
+
+def daily_flows(dates: np.ndarray, flow_dates: Sequence, amounts: Sequence[float]) -> np.ndarray:
+    """
+    External cash flows summed onto the date axis (positive = money put into
+    the portfolio). Flows before the first date are part of the opening value
+    and are dropped.
+    """
+    flows = np.zeros(len(dates))
+    flow_dates = np.asarray(flow_dates, dtype='datetime64[D]')
+    rows = np.searchsorted(dates, flow_dates, side='left')
+    keep = (flow_dates >= dates[0]) & (rows < len(dates)) if len(dates) else np.zeros(len(rows), dtype=bool)
+    np.add.at(flows, rows[keep], np.asarray(amounts, dtype=np.float64)[keep])
+    return flows
+
+
+def flow_adjusted_returns(values: np.ndarray, flows: np.ndarray) -> np.ndarray:
+    """
+    Daily returns with the day's flow removed, r_t = (V_t - F_t) / V_{t-1} - 1,
+    treating flows as landing at the end of the day. NaN where the previous
+    value is not positive.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(values[:-1] > 0, (values[1:] - flows[1:]) / values[:-1] - 1.0, np.nan)
+
+
+def time_weighted_return(returns: np.ndarray) -> float:
+    """Chain-linked return over the period"""
+    return float(np.prod(1.0 + returns[np.isfinite(returns)]) - 1.0)
+
+
+def annualise(total_return: float, days: int) -> Optional[float]:
+    """Compound annual rate for a period return; None for periods under a year"""
+    if days < CALENDAR_DAYS_PER_YEAR or total_return <= -1.0:
+        return None
+    return float((1.0 + total_return) ** (CALENDAR_DAYS_PER_YEAR / days) - 1.0)
+
+
+def xirr(flow_dates: Sequence, amounts: Sequence[float],
+         guesses: Sequence[float] = XIRR_GUESSES) -> Optional[float]:
+    """
+    Money-weighted annual return: the rate r where the flows discounted at
+    (1 + r) ** (days / 365) sum to zero. Newton's method runs from every
+    starting guess at once as a guesses x flows array; of the roots found,
+    the one closest to zero is returned. None if there is no sign change or
+    nothing converges.
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    if not ((amounts > 0).any() and (amounts < 0).any()):
+        return None
+    flow_dates = np.asarray(flow_dates, dtype='datetime64[D]')
+    years = (flow_dates - flow_dates.min()).astype(np.float64) / CALENDAR_DAYS_PER_YEAR
+
+    rates = np.asarray(guesses, dtype=np.float64)[:, None]
+    with np.errstate(all='ignore'):
+        for _ in range(XIRR_MAX_ITERATIONS):
+            base = 1.0 + rates
+            discounted = amounts * base ** -years
+            npv = discounted.sum(axis=1, keepdims=True)
+            slope = (-years * discounted / base).sum(axis=1, keepdims=True)
+            step = npv / slope
+            # Keep 1 + r positive so the discount factors stay real
+            rates = np.maximum(rates - step, -0.999999)
+            if not (np.abs(step[np.isfinite(step)]) > XIRR_TOLERANCE).any():
+                break
+        npv = (amounts * (1.0 + rates) ** -years).sum(axis=1)
+
+    rates = rates[:, 0]
+    converged = np.isfinite(rates) & (np.abs(npv) <= 1e-6 * np.abs(amounts).sum())
+    if not converged.any():
+        return None
+    roots = rates[converged]
+    return float(roots[np.argmin(np.abs(roots))])
+
+
+def annualised_volatility(returns: np.ndarray, periods_per_year: int = TRADING_DAYS_PER_YEAR) -> Optional[float]:
+    returns = returns[np.isfinite(returns)]
+    if len(returns) < 2:
+        return None
+    return float(returns.std(ddof=1) * np.sqrt(periods_per_year))
+
+
+def sharpe_ratio(returns: np.ndarray, risk_free_rate: float = RISK_FREE_RATE,
+                 periods_per_year: int = TRADING_DAYS_PER_YEAR) -> Optional[float]:
+    """Annualised mean excess return over annualised volatility"""
+    returns = returns[np.isfinite(returns)]
+    if len(returns) < 2:
+        return None
+    deviation = returns.std(ddof=1)
+    if deviation == 0:
+        return None
+    excess = returns.mean() - risk_free_rate / periods_per_year
+    return float(excess / deviation * np.sqrt(periods_per_year))
+
+
+def max_drawdown(returns: np.ndarray) -> Dict:
+    """
+    Largest peak-to-trough fall of the growth index built from the returns,
+    so deposits and withdrawals do not show up as gains or drawdowns.
+    Positions refer to the value series (one longer than the returns).
+    """
+    growth = np.concatenate([[1.0], np.cumprod(1.0 + np.nan_to_num(returns))])
+    peaks = np.maximum.accumulate(growth)
+    drawdowns = growth / peaks - 1.0
+    trough = int(np.argmin(drawdowns))
+    peak = int(np.argmax(growth[:trough + 1]))
+    return {"max_drawdown": float(drawdowns[trough]), "peak": peak, "trough": trough}
+
+
+def relative_metrics(returns: np.ndarray, benchmark_returns: np.ndarray,
+                     periods_per_year: int = TRADING_DAYS_PER_YEAR) -> Dict:
+    """
+    Return relative to a benchmark, beta and annualised tracking error,
+    over the sessions where both return series are known.
+    """
+    both = np.isfinite(returns) & np.isfinite(benchmark_returns)
+    returns, benchmark_returns = returns[both], benchmark_returns[both]
+    if len(returns) < 2:
+        return {}
+    active = returns - benchmark_returns
+    benchmark_variance = benchmark_returns.var(ddof=1)
+    benchmark_return = float(np.prod(1.0 + benchmark_returns) - 1.0)
+    tracking_error = float(active.std(ddof=1) * np.sqrt(periods_per_year))
+    return {
+        "benchmark_return": benchmark_return,
+        "relative_return": float(np.prod(1.0 + returns) - 1.0) - benchmark_return,
+        "beta": float(np.cov(returns, benchmark_returns)[0, 1] / benchmark_variance)
+        if benchmark_variance > 0 else None,
+        "tracking_error": tracking_error,
+        "information_ratio": float(active.mean() * periods_per_year / tracking_error)
+        if tracking_error > 0 else None
+    }
+
+
+def performance_metrics(dates: np.ndarray, values: np.ndarray, flows: np.ndarray,
+                        risk_free_rate: float = RISK_FREE_RATE,
+                        periods_per_year: int = TRADING_DAYS_PER_YEAR,
+                        benchmark: Optional[np.ndarray] = None) -> Dict:
+    """
+    Period metrics for a value series on trading sessions and the external
+    flows on the same axis. The opening value counts as the first investment
+    and the closing value as the final withdrawal for XIRR. With benchmark
+    closes on the same sessions, relative metrics are added.
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    if len(dates) < 2:
+        return {}
+
+    returns = flow_adjusted_returns(values, flows)
+    twr = time_weighted_return(returns)
+    days = int((dates[-1] - dates[0]).astype(np.int64))
+    net_flows = float(flows[1:].sum())
+
+    # Investor's view: money in is negative, money out (and the end value) positive
+    flow_rows = np.flatnonzero(flows[1:]) + 1
+    xirr_dates = np.concatenate([dates[:1], dates[flow_rows], dates[-1:]])
+    xirr_amounts = np.concatenate([[-values[0]], -flows[flow_rows], [values[-1]]])
+
+    drawdown = max_drawdown(returns)
+    metrics = {
+        "start_date": str(dates[0]),
+        "end_date": str(dates[-1]),
+        "start_value": float(values[0]),
+        "end_value": float(values[-1]),
+        "net_flows": net_flows,
+        "absolute_return": float(values[-1] - values[0] - net_flows),
+        "time_weighted_return": twr,
+        "annualised_twr": annualise(twr, days),
+        "xirr": xirr(xirr_dates, xirr_amounts),
+        "volatility": annualised_volatility(returns, periods_per_year),
+        "sharpe_ratio": sharpe_ratio(returns, risk_free_rate, periods_per_year),
+        "max_drawdown": drawdown["max_drawdown"],
+        "drawdown_peak_date": str(dates[drawdown["peak"]]),
+        "drawdown_trough_date": str(dates[drawdown["trough"]])
+    }
+    if benchmark is not None:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            benchmark_returns = benchmark[1:] / benchmark[:-1] - 1.0
+        metrics.update(relative_metrics(returns, benchmark_returns, periods_per_year))
+    return metrics
+
+
+def default_benchmark(holdings: List[Dict]) -> Optional[str]:
+    """Benchmark index of the exchange most of the holdings trade on"""
+    codes = [h.get('exchange_code') for h in holdings if h.get('exchange_code') in EXCHANGE_CONFIGS]
+    if not codes:
+        return None
+    return EXCHANGE_CONFIGS[max(set(codes), key=codes.count)].benchmark_symbol or None
+
+
+def _transaction_symbols(db, holdings: List[Dict], stock_ids) -> Dict[str, Dict]:
+    """stock_id -> pseudo holding (stock_symbol, exchange_code) for every traded stock"""
+    listings = {
+        holding['stock_id']: {
+            'stock_symbol': holding['stock_symbol'],
+            'exchange_code': holding.get('exchange_code', 'NSE')
+        }
+        for holding in holdings if holding.get('stock_id') and holding.get('stock_symbol')
+    }
+    # Stocks that were sold out no longer have a holding to read the listing from
+    missing = [ObjectId(stock_id) for stock_id in set(stock_ids) - set(listings) if ObjectId.is_valid(stock_id)]
+    if missing:
+        for stock in db.master_stocks.find({'_id': {'$in': missing}},
+                                           {'identifiers': 1, 'exchange_info.primary_exchange': 1}):
+            identifiers = stock.get('identifiers', {})
+            exchange_code = stock.get('exchange_info', {}).get('primary_exchange') or 'NSE'
+            symbol = identifiers.get('exchange_codes', {}).get(exchange_code) or \
+                identifiers.get('nse_code' if exchange_code == 'NSE' else 'symbol')
+            if symbol:
+                listings[str(stock['_id'])] = {'stock_symbol': symbol, 'exchange_code': exchange_code}
+    return listings
+
+
+def portfolio_performance(db, portfolio: Dict, start_date: datetime, end_date: datetime,
+                          risk_free_rate: float = RISK_FREE_RATE,
+                          benchmark_symbol: Optional[str] = None) -> Dict:
+    """
+    Performance of a portfolio over [start_date, end_date] on the trading
+    sessions of the exchanges it holds. Held quantities are rebuilt per
+    session from the current holdings and the portfolio's transactions, and
+    each trade's cost (including charges) is an external cash flow. The
+    benchmark index is read from the same price matrix as the holdings.
+    Closes are split/bonus adjusted and trade quantities are restated in
+    today's shares, matching holdings adjusted by the corporate actions run.
+    """
+    holdings = portfolio.get('holdings', [])
+    portfolio_ids = [str(portfolio['_id'])] + ([portfolio['id']] if portfolio.get('id') else [])
+    transactions = list(db.transactions.find(
+        {'portfolio_id': {'$in': portfolio_ids}, 'status': {'$ne': 'PENDING'}},
+        {'_id': 0, 'stock_id': 1, 'transaction_type': 1, 'quantity': 1, 'price': 1, 'date': 1, 'charges': 1}
+    ))
+    listings = _transaction_symbols(db, holdings, [t['stock_id'] for t in transactions if t.get('stock_id')]
+                                    + [h['stock_id'] for h in holdings if h.get('stock_id')])
+
+    # API-created holdings carry only a stock_id; their symbol comes from the master stock
+    priced_holdings = [
+        h if h.get('stock_symbol') else {**h, **listings[h['stock_id']]}
+        for h in holdings if h.get('stock_symbol') or h.get('stock_id') in listings
+    ]
+    spellings = symbol_spellings(priced_holdings + list(listings.values()))
+    symbols = sorted(set(spellings.values()))
+    if benchmark_symbol:
+        spellings[benchmark_symbol] = benchmark_symbol
+    factor_table = load_factor_table(db, symbols)
+    loaded = adjust_matrix(load_price_matrix(db, spellings, start_date, end_date), factor_table)
+    matrix = loaded.select(symbols)
+    if matrix.empty:
+        return {}
+
+    # Trades in symbols with no bars in the window cannot be valued, so they are left out
+    priced = np.isfinite(matrix.prices).any(axis=0)
+    event_dates, event_symbols, event_quantities, event_amounts = [], [], [], []
+    for transaction in transactions:
+        listing = listings.get(transaction.get('stock_id'))
+        if listing is None or not priced[matrix.symbol_index[listing['stock_symbol']]]:
+            continue
+        sign = 1.0 if transaction['transaction_type'] == 'BUY' else -1.0
+        quantity = sign * float(str(transaction['quantity']))
+        charges = sum(float(str(value)) for value in (transaction.get('charges') or {}).values())
+        event_dates.append(transaction['date'])
+        event_symbols.append(listing['stock_symbol'])
+        event_quantities.append(quantity)
+        event_amounts.append(quantity * float(str(transaction['price'])) + charges)
+
+    exchange_codes = [h.get('exchange_code') for h in priced_holdings + list(listings.values())]
+    dates = sessions_for(exchange_codes, start_date, end_date)
+    if len(dates) < 2:
+        return {}
+    daily = matrix.reindex(dates).ffill().bfill()
+
+    current = matrix.quantity_vector({
+        holding['stock_symbol']: float(str(holding['quantity'])) for holding in priced_holdings
+    })
+    event_days = _days(event_dates)
+    # Trades before an ex-date are restated in post-action shares
+    event_quantities = np.asarray(event_quantities, dtype=np.float64)
+    event_symbol_array = np.array(event_symbols, dtype=object)
+    for symbol, (ex_dates, cumulative) in factor_table.items():
+        mask = event_symbol_array == symbol
+        if mask.any():
+            event_quantities[mask] *= factors_at(event_days[mask], ex_dates, cumulative)
+    # Opening position such that replaying every trade ends at today's holdings
+    opening = current.copy()
+    np.subtract.at(opening, [matrix.symbol_index[s] for s in event_symbols], event_quantities)
+    quantities = quantity_matrix(dates, matrix.symbols, event_days, event_symbols, event_quantities, opening)
+
+    values = daily.portfolio_value(quantities)
+    flows = daily_flows(dates, event_days, event_amounts)
+
+    benchmark_closes = None
+    if benchmark_symbol:
+        # Carried forward only: sessions before the index's first bar stay out of the comparison
+        benchmark_closes = loaded.select([benchmark_symbol]).reindex(dates).ffill().prices[:, 0]
+    metrics = performance_metrics(dates, values, flows, risk_free_rate, benchmark=benchmark_closes)
+    if benchmark_symbol and metrics:
+        metrics["benchmark"] = benchmark_symbol
+    return metrics
+
+
+def get_portfolio_performance(db, portfolio_id: str, days: int,
+                              risk_free_rate: float = RISK_FREE_RATE,
+                              benchmark_symbol: Optional[str] = None) -> Dict:
+    """
+    Performance over the last `days` days against `benchmark_symbol` (by
+    default the index of the portfolio's main exchange); raises ValueError
+    for unknown portfolios.
+    """
+    # API-created portfolios are keyed by a uuid 'id', Flask-created ones by their ObjectId
+    portfolio = db.portfolios.find_one({'id': portfolio_id})
+    if not portfolio and ObjectId.is_valid(portfolio_id):
+        portfolio = db.portfolios.find_one({'_id': ObjectId(portfolio_id)})
+    if not portfolio:
+        raise ValueError(f"Portfolio not found: {portfolio_id}")
+    end_date = datetime.now(timezone.utc)
+    return portfolio_performance(
+        db, portfolio, end_date - timedelta(days=days), end_date, risk_free_rate,
+        benchmark_symbol or default_benchmark(portfolio.get('holdings', []))
+    )
@@ -1,23 +1,34 @@
+import asyncio
+import logging
 from decimal import Decimal
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional, Tuple
 from datetime import datetime
 from uuid import uuid4
-from motor.motor_asyncio import AsyncIOMotorClient
+from bson import ObjectId
+import numpy as np
 from models.portfolio import Portfolio, PortfolioCreate, PortfolioHolding
-from services.currency_service import CurrencyService
+from services.currency_service import get_currency_service
+from services.price_service import get_price_service
+from services.snapshot_service import PortfolioSnapshotService, snapshot_to_value
 from services.stock_master_service import StockMasterService
-from config.settings import MONGODB_URI
+from config.database import get_async_client, get_async_database
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of price/FX lookups in flight for a single valuation
+VALUATION_CONCURRENCY = 16
 
 async def get_database():
-    client = AsyncIOMotorClient(MONGODB_URI)
-    return client.portfolio_tracker
+    return get_async_database()
 
 class PortfolioService:
     def __init__(self):
-        self.client = AsyncIOMotorClient(MONGODB_URI)
-        self.db = self.client.portfolio_tracker
+        self.client = get_async_client()
+        self.db = get_async_database()
         self.collection = self.db.portfolios
-        self.currency_service = CurrencyService()
+        self.currency_service = get_currency_service()
+        self.price_service = get_price_service()
+        self.snapshot_service = PortfolioSnapshotService(self.db)
         self.stock_service = StockMasterService()
 
     async def create_portfolio(self, portfolio: PortfolioCreate) -> Portfolio:
@@ -46,42 +57,179 @@ class PortfolioService:
             return Portfolio(**portfolio)
         return None
 
+    @staticmethod
+    def _stock_listing(stock: Dict) -> tuple:
+        """(exchange, exchange symbol) a master stock is priced on"""
+        exchange = stock['exchange_info']['primary_exchange']
+        return exchange, stock['identifiers']['exchange_codes'][exchange]
+
+    async def get_current_price(self, symbol: str, exchange: str) -> Decimal:
+        """Latest price for one exchange symbol"""
+        return await self.price_service.get_price(symbol, exchange)
+
+    async def get_holding_stocks(self, holdings: List[PortfolioHolding]) -> Dict[str, Dict]:
+        """Fetch the master stock documents for all holdings in one query"""
+        object_ids = []
+        for stock_id in {holding.stock_id for holding in holdings}:
+            try:
+                object_ids.append(ObjectId(stock_id))
+            except Exception:
+                logger.warning(f"Invalid stock id in holdings: {stock_id}")
+
+        cursor = self.db.master_stocks.find(
+            {"_id": {"$in": object_ids}},
+            {"display_name": 1, "identifiers": 1, "exchange_info": 1}
+        )
+        return {str(stock['_id']): stock for stock in await cursor.to_list(length=None)}
+
     async def get_portfolio_value(self, portfolio_id: str) -> Dict:
-        """Get portfolio value with currency conversion"""
+        """Get portfolio value with currency conversion, served from its snapshot"""
+        snapshot = await self.snapshot_service.get_snapshot(portfolio_id)
+        if snapshot is None:
+            snapshot = await self.refresh_portfolio_snapshot(portfolio_id)
+        return snapshot_to_value(snapshot)
+
+    async def refresh_portfolio_snapshot(self, portfolio_id: str) -> Dict:
+        """Full recompute of a portfolio's valuation snapshot"""
         portfolio = await self.get_portfolio(portfolio_id)
-        total_value = Decimal('0')
-        holdings_value = []
+        if portfolio is None:
+            raise ValueError(f"Portfolio not found: {portfolio_id}")
+        rows = await self.value_holdings(portfolio)
+        return await self.snapshot_service.save_snapshot(portfolio_id, portfolio.base_currency, rows)
+
+    async def fetch_market_data(self, stocks: Iterable[Dict], base_currencies: Iterable[str]) -> Tuple[Dict, Dict]:
+        """
+        Prices keyed by (exchange, symbol) and FX rates keyed by
+        (from_currency, to_currency) for the given stocks. Each distinct
+        symbol and currency pair is fetched once, concurrently; prices go
+        out as one batched provider call per exchange.
+        """
+        stocks = list(stocks)
+        symbols_by_exchange: Dict[str, set] = {}
+        for stock in stocks:
+            exchange, symbol = self._stock_listing(stock)
+            symbols_by_exchange.setdefault(exchange, set()).add(symbol)
+        exchanges = sorted(symbols_by_exchange)
+        stock_currencies = {stock['exchange_info']['currency'] for stock in stocks}
+        pairs = sorted(
+            (from_currency, to_currency)
+            for from_currency in stock_currencies
+            for to_currency in set(base_currencies)
+            if from_currency != to_currency
+        )
+
+        semaphore = asyncio.Semaphore(VALUATION_CONCURRENCY)
 
+        async def limited(coro):
+            async with semaphore:
+                return await coro
+
+        results = await asyncio.gather(
+            *(limited(self.price_service.get_prices(symbols_by_exchange[exchange], exchange))
+              for exchange in exchanges),
+            *(limited(self.currency_service.get_exchange_rate(from_currency, to_currency))
+              for from_currency, to_currency in pairs)
+        )
+        prices = {
+            (exchange, symbol): price
+            for exchange, exchange_prices in zip(exchanges, results[:len(exchanges)])
+            for symbol, price in exchange_prices.items()
+        }
+        exchange_rates = dict(zip(pairs, results[len(exchanges):]))
+        for currency in set(base_currencies) | stock_currencies:
+            exchange_rates[(currency, currency)] = Decimal('1')
+        return prices, exchange_rates
+
+    async def value_holdings(self, portfolio: Portfolio) -> List[Dict]:
+        """Value every holding in the portfolio's base currency"""
+        stocks = await self.get_holding_stocks(portfolio.holdings)
+        prices, exchange_rates = await self.fetch_market_data(stocks.values(), [portfolio.base_currency])
+
+        # One row per stock; multiple lots of the same stock are merged
+        rows: Dict[str, Dict] = {}
         for holding in portfolio.holdings:
-            stock = await self.stock_service.get_stock_by_symbol(
-                holding.stock_id, 
-                holding.exchange
-            )
-            
-            # Get current price in stock's native currency
-            current_price = await self.get_current_price(
-                stock['identifiers']['yfinance_symbol']
-            )
-            
-            # Convert to portfolio's base currency
-            if stock['exchange_info']['currency'] != portfolio.base_currency:
-                exchange_rate = await self.currency_service.get_exchange_rate(
-                    stock['exchange_info']['currency'],
-                    portfolio.base_currency
-                )
-                value = holding.quantity * current_price * exchange_rate
-            else:
-                value = holding.quantity * current_price
-                
-            holdings_value.append({
+            stock = stocks.get(holding.stock_id)
+            if not stock:
+                logger.warning(f"Stock {holding.stock_id} not found, skipping holding")
+                continue
+
+            # Price in stock's native currency, converted to portfolio's base currency
+            exchange, symbol = self._stock_listing(stock)
+            current_price = prices.get((exchange, symbol))
+            if current_price is None:
+                logger.warning(f"No price for {stock['display_name']}, skipping holding")
+                continue
+            exchange_rate = exchange_rates[(stock['exchange_info']['currency'], portfolio.base_currency)]
+
+            row = rows.setdefault(holding.stock_id, {
+                "stock_id": holding.stock_id,
                 "stock": stock['display_name'],
-                "value": value,
-                "currency": portfolio.base_currency
+                "exchange": exchange,
+                "symbol": symbol,
+                "quantity": Decimal('0'),
+                "price": current_price,
+                "fx_rate": exchange_rate,
+                "value": Decimal('0')
             })
-            total_value += value
+            row["quantity"] += holding.quantity
+            row["value"] += holding.quantity * current_price * exchange_rate
+
+        return list(rows.values())
+
+    async def get_portfolios_value(self,
+                                   portfolio_ids: Optional[List[str]] = None,
+                                   user_id: Optional[str] = None) -> List[Dict]:
+        """
+        Value many portfolios at once. Symbols and currency pairs are
+        deduplicated across portfolios and fetched once; every portfolio is
+        then valued from shared price and FX vectors.
+        """
+        query = {}
+        if portfolio_ids is not None:
+            query["id"] = {"$in": portfolio_ids}
+        if user_id is not None:
+            query["user_id"] = user_id
+        portfolios = [Portfolio(**doc) for doc in await self.collection.find(query).to_list(length=None)]
+        if not portfolios:
+            return []
+
+        stocks = await self.get_holding_stocks(
+            [holding for portfolio in portfolios for holding in portfolio.holdings]
+        )
+        base_currencies = sorted({portfolio.base_currency for portfolio in portfolios})
+        prices, exchange_rates = await self.fetch_market_data(stocks.values(), base_currencies)
+
+        # Dense price and FX vectors; holdings only carry indexes into them
+        listings = sorted(prices)
+        listing_index = {listing: i for i, listing in enumerate(listings)}
+        price_vector = np.array([float(prices[listing]) for listing in listings], dtype=np.float64)
+        fx_pairs = sorted(exchange_rates)
+        fx_index = {pair: i for i, pair in enumerate(fx_pairs)}
+        fx_vector = np.array([float(exchange_rates[pair]) for pair in fx_pairs], dtype=np.float64)
+
+        portfolio_idx, price_idx, fx_idx, quantities = [], [], [], []
+        for i, portfolio in enumerate(portfolios):
+            for holding in portfolio.holdings:
+                stock = stocks.get(holding.stock_id)
+                if not stock:
+                    continue
+                listing = self._stock_listing(stock)
+                if listing not in listing_index:
+                    continue
+                portfolio_idx.append(i)
+                price_idx.append(listing_index[listing])
+                fx_idx.append(fx_index[(stock['exchange_info']['currency'], portfolio.base_currency)])
+                quantities.append(float(holding.quantity))
+
+        values = (np.asarray(quantities, dtype=np.float64)
+                  * price_vector[np.asarray(price_idx, dtype=np.intp)]
+                  * fx_vector[np.asarray(fx_idx, dtype=np.intp)])
+        totals = np.bincount(np.asarray(portfolio_idx, dtype=np.intp),
+                             weights=values, minlength=len(portfolios))
 
-        return {
-            "total_value": total_value,
-            "currency": portfolio.base_currency,
-            "holdings": holdings_value
-        }
\ No newline at end of file
+        return [{
+            "portfolio_id": portfolio.id,
+            "name": portfolio.name,
+            "total_value": float(total),
+            "currency": portfolio.base_currency
+        } for portfolio, total in zip(portfolios, totals)]
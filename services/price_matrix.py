@@ -0,0 +1,188 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence
+import numpy as np
+
+from config.exchanges import EXCHANGE_CONFIGS
+from config.settings import HISTORY_COLLECTION
+
+
+def symbol_spellings(holdings: Iterable[Dict]) -> Dict[str, str]:
+    """Map every stored spelling of each holding's symbol (e.g. RELIANCE, RELIANCE.NS) to the holding symbol"""
+    spellings = {}
+    for holding in holdings:
+        symbol = holding['stock_symbol']
+        spellings[symbol] = symbol
+        exchange_config = EXCHANGE_CONFIGS.get(holding.get('exchange_code'))
+        if exchange_config and exchange_config.symbol_suffix and not symbol.endswith(exchange_config.symbol_suffix):
+            spellings[f"{symbol}{exchange_config.symbol_suffix}"] = symbol
+    return spellings
+
+
+def _day(value) -> np.datetime64:
+    """datetime (naive or aware) -> numpy day"""
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        value = value.replace(tzinfo=None)
+    return np.datetime64(value, 'D')
+
+
+def _ffill(values: np.ndarray) -> np.ndarray:
+    """Forward fill NaNs down axis 0 without a Python loop"""
+    rows = np.arange(values.shape[0])[:, None]
+    last_valid = np.where(np.isnan(values), 0, rows)
+    np.maximum.accumulate(last_valid, axis=0, out=last_valid)
+    # Leading NaNs point at row 0, which is itself NaN, so they stay NaN
+    return values[last_valid, np.arange(values.shape[1])]
+
+
+class PriceMatrix:
+    """
+    Close prices aligned on a dates x symbols grid (NaN where a symbol has
+    no bar). Valuations take a quantity vector (one per symbol) or a
+    quantity matrix of the same shape as the prices when holdings change
+    over time.
+    """
+
+    def __init__(self, dates: np.ndarray, symbols: Sequence[str], prices: np.ndarray):
+        self.dates = np.asarray(dates, dtype='datetime64[D]')
+        self.symbols = list(symbols)
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.symbol_index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        if self.prices.shape != (len(self.dates), len(self.symbols)):
+            raise ValueError(f"Price shape {self.prices.shape} does not match "
+                             f"{len(self.dates)} dates x {len(self.symbols)} symbols")
+
+    @classmethod
+    def from_rows(cls, symbols: Sequence[str], symbol_index: Sequence[int],
+                  dates: Sequence, closes: Sequence[float]) -> "PriceMatrix":
+        """Build from long-format rows (symbol position, date, close)"""
+        if len(closes) == 0:
+            return cls(np.array([], dtype='datetime64[D]'), symbols, np.empty((0, len(symbols))))
+        unique_dates, date_index = np.unique(np.asarray(dates, dtype='datetime64[D]'), return_inverse=True)
+        prices = np.full((len(unique_dates), len(symbols)), np.nan)
+        prices[date_index, np.asarray(symbol_index)] = closes
+        return cls(unique_dates, symbols, prices)
+
+    @property
+    def empty(self) -> bool:
+        return self.prices.size == 0 or not np.isfinite(self.prices).any()
+
+    def ffill(self) -> "PriceMatrix":
+        """Carry each symbol's last close forward over dates without a bar"""
+        if self.prices.size == 0:
+            return self
+        return PriceMatrix(self.dates, self.symbols, _ffill(self.prices))
+
+    def bfill(self) -> "PriceMatrix":
+        """Fill leading gaps with each symbol's first close"""
+        if self.prices.size == 0:
+            return self
+        return PriceMatrix(self.dates, self.symbols, _ffill(self.prices[::-1])[::-1])
+
+    def reindex(self, dates: Sequence) -> "PriceMatrix":
+        """Align onto another date axis; dates not in this matrix come back NaN"""
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        prices = np.full((len(dates), len(self.symbols)), np.nan)
+        if len(self.dates):
+            positions = np.minimum(np.searchsorted(self.dates, dates), len(self.dates) - 1)
+            found = self.dates[positions] == dates
+            prices[found] = self.prices[positions[found]]
+        return PriceMatrix(dates, self.symbols, prices)
+
+    def select(self, symbols: Sequence[str]) -> "PriceMatrix":
+        """Subset (and reorder) columns; unknown symbols come back all-NaN"""
+        prices = np.full((len(self.dates), len(symbols)), np.nan)
+        for j, symbol in enumerate(symbols):
+            i = self.symbol_index.get(symbol)
+            if i is not None:
+                prices[:, j] = self.prices[:, i]
+        return PriceMatrix(self.dates, symbols, prices)
+
+    def window(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> "PriceMatrix":
+        """Rows with start <= date <= end"""
+        mask = np.ones(len(self.dates), dtype=bool)
+        if start is not None:
+            mask &= self.dates >= _day(start)
+        if end is not None:
+            mask &= self.dates <= _day(end)
+        return PriceMatrix(self.dates[mask], self.symbols, self.prices[mask])
+
+    def quantity_vector(self, quantities: Dict[str, float]) -> np.ndarray:
+        """Per-symbol quantities aligned with the matrix columns"""
+        vector = np.zeros(len(self.symbols))
+        for symbol, quantity in quantities.items():
+            i = self.symbol_index.get(symbol)
+            if i is not None:
+                vector[i] += quantity
+        return vector
+
+    def holding_values(self, quantities: np.ndarray) -> np.ndarray:
+        """dates x symbols market value; missing prices count as zero"""
+        return np.nan_to_num(self.prices) * quantities
+
+    def portfolio_value(self, quantities: np.ndarray) -> np.ndarray:
+        """Total value per date"""
+        prices = np.nan_to_num(self.prices)
+        if np.ndim(quantities) == 1:
+            return prices @ quantities
+        return np.einsum('ij,ij->i', prices, quantities)
+
+    def daily_returns(self) -> np.ndarray:
+        """(dates - 1) x symbols simple returns"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.prices[1:] / self.prices[:-1] - 1.0
+
+    def portfolio_returns(self, quantities: np.ndarray) -> np.ndarray:
+        """Daily simple returns of the portfolio value series"""
+        values = self.portfolio_value(quantities)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(values[:-1] > 0, values[1:] / values[:-1] - 1.0, np.nan)
+
+
+def quantity_matrix(dates: np.ndarray, symbols: Sequence[str],
+                    event_dates: Sequence, event_symbols: Sequence[str],
+                    event_quantities: Sequence[float],
+                    opening: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    dates x symbols held quantities from signed quantity changes (buys
+    positive, sells negative). A change applies from its date onwards;
+    changes before the first date roll into the opening position.
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    symbol_index = {symbol: i for i, symbol in enumerate(symbols)}
+    deltas = np.zeros((len(dates), len(symbols)))
+    if opening is not None:
+        deltas[0] += opening
+
+    columns = np.array([symbol_index.get(symbol, -1) for symbol in event_symbols], dtype=np.intp)
+    rows = np.searchsorted(dates, np.asarray(event_dates, dtype='datetime64[D]'), side='left')
+    keep = (columns >= 0) & (rows < len(dates))
+    np.add.at(deltas, (rows[keep], columns[keep]), np.asarray(event_quantities, dtype=np.float64)[keep])
+    return np.cumsum(deltas, axis=0)
+
+
+def load_price_matrix(db, spellings: Dict[str, str], start_date: datetime, end_date: datetime,
+                      field: str = "close") -> PriceMatrix:
+    """
+    Load closes (or another bar field, e.g. volume) for every symbol with
+    one projected $in query on historical_prices. `spellings` maps stored
+    symbols to the column they belong to (see symbol_spellings).
+    """
+    symbols = sorted(set(spellings.values()))
+    symbol_index = {symbol: i for i, symbol in enumerate(symbols)}
+
+    cursor = db[HISTORY_COLLECTION].find(
+        {
+            "symbol": {"$in": list(spellings)},
+            "date": {"$gte": start_date, "$lte": end_date}
+        },
+        {"_id": 0, "symbol": 1, "date": 1, field: 1}
+    ).batch_size(10000)
+
+    row_symbols, row_dates, row_closes = [], [], []
+    for doc in cursor:
+        row_symbols.append(symbol_index[spellings[doc['symbol']]])
+        row_dates.append(doc['date'])
+        value = doc.get(field)
+        row_closes.append(float(str(value)) if value is not None else np.nan)
+
+    return PriceMatrix.from_rows(symbols, row_symbols, row_dates, row_closes)
@@ -0,0 +1,252 @@
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+import pytz
+
+from config.calendars import get_calendar
+from config.exchanges import EXCHANGE_CONFIGS, ExchangeConfig
+from config.settings import PRICE_PROVIDER, PRICE_FIXTURE_FILE, YFINANCE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# Cache lifetime for prices while the exchange is trading
+OPEN_MARKET_TTL = 60
+# Symbols per provider call
+PRICE_BATCH_SIZE = 100
+
+# async callback(exchange_code, {symbol: price}) run when prices change
+PriceListener = Callable[[str, Dict[str, Decimal]], Awaitable[None]]
+
+
+class PriceProvider:
+    """Blocking market data source; MarketPriceService runs it in a thread pool"""
+
+    name = "base"
+
+    def fetch_prices(self, symbols: List[str]) -> Dict[str, Decimal]:
+        """Return the latest price for each provider symbol it could resolve"""
+        raise NotImplementedError
+
+
+class YFinanceProvider(PriceProvider):
+    name = "yfinance"
+
+    def fetch_prices(self, symbols: List[str]) -> Dict[str, Decimal]:
+        import yfinance as yf
+
+        data = yf.download(
+            symbols,
+            period="5d",
+            interval="1d",
+            progress=False,
+            threads=False,
+            auto_adjust=False,
+            timeout=YFINANCE_TIMEOUT
+        )
+        if data.empty:
+            return {}
+
+        closes = data['Close']
+        if not hasattr(closes, 'columns'):
+            closes = closes.to_frame(symbols[0])
+
+        prices = {}
+        for symbol in closes.columns:
+            series = closes[symbol].dropna()
+            if not series.empty:
+                prices[symbol] = Decimal(str(series.iloc[-1]))
+        return prices
+
+
+class FixturePriceProvider(PriceProvider):
+    """Serves prices from a dict or a JSON file of {symbol: price}, for tests and offline runs"""
+
+    name = "fixture"
+
+    def __init__(self, prices: Optional[Dict[str, float]] = None, path: str = ""):
+        if prices is None and path:
+            with open(path) as f:
+                prices = json.load(f)
+        self.prices = {symbol: Decimal(str(price)) for symbol, price in (prices or {}).items()}
+
+    def fetch_prices(self, symbols: List[str]) -> Dict[str, Decimal]:
+        return {symbol: self.prices[symbol] for symbol in symbols if symbol in self.prices}
+
+
+def default_providers() -> Dict[str, PriceProvider]:
+    providers = {YFinanceProvider.name: YFinanceProvider()}
+    if PRICE_FIXTURE_FILE:
+        providers[FixturePriceProvider.name] = FixturePriceProvider(path=PRICE_FIXTURE_FILE)
+    return providers
+
+
+def _parse_time(value: str) -> Tuple[int, int]:
+    hour, minute = value.split(":")
+    return int(hour), int(minute)
+
+
+def is_market_open(exchange_config: ExchangeConfig, now: Optional[datetime] = None) -> bool:
+    """Whether the exchange is inside its trading hours on a trading day"""
+    tz = pytz.timezone(exchange_config.timezone)
+    local_now = (now or datetime.now(pytz.UTC)).astimezone(tz)
+    if not get_calendar(exchange_config.code).is_session(local_now.date()):
+        return False
+    start_hour, start_minute = _parse_time(exchange_config.trading_hours["start"])
+    end_hour, end_minute = _parse_time(exchange_config.trading_hours["end"])
+    start = local_now.replace(hour=start_hour, minute=start_minute, second=0, microsecond=0)
+    end = local_now.replace(hour=end_hour, minute=end_minute, second=0, microsecond=0)
+    return start <= local_now < end
+
+
+def next_market_open(exchange_config: ExchangeConfig, now: Optional[datetime] = None) -> datetime:
+    """Next trading session start after `now`, as an aware UTC datetime"""
+    tz = pytz.timezone(exchange_config.timezone)
+    local_now = (now or datetime.now(pytz.UTC)).astimezone(tz)
+    hour, minute = _parse_time(exchange_config.trading_hours["start"])
+
+    calendar = get_calendar(exchange_config.code)
+    day = local_now.date()
+    while True:
+        candidate = tz.localize(datetime(day.year, day.month, day.day, hour, minute))
+        if candidate > local_now and calendar.is_session(day):
+            return candidate.astimezone(pytz.UTC)
+        day += timedelta(days=1)
+
+
+def price_ttl(exchange_config: ExchangeConfig, now: Optional[datetime] = None) -> float:
+    """Seconds a price stays valid: short while trading, until the next open otherwise"""
+    now = now or datetime.now(pytz.UTC)
+    if is_market_open(exchange_config, now):
+        return OPEN_MARKET_TTL
+    return max((next_market_open(exchange_config, now) - now).total_seconds(), OPEN_MARKET_TTL)
+
+
+class MarketPriceService:
+    """
+    Latest prices per exchange, routed to the provider named in the
+    exchange's ExchangeConfig.data_provider and cached with a TTL that
+    follows the exchange's trading hours.
+    """
+
+    def __init__(self,
+                 providers: Optional[Dict[str, PriceProvider]] = None,
+                 max_workers: int = 4,
+                 batch_size: int = PRICE_BATCH_SIZE):
+        self.providers = providers if providers is not None else default_providers()
+        self.batch_size = batch_size
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="price")
+        self.cache: Dict[Tuple[str, str], Tuple[Decimal, float]] = {}
+        self.listeners: List[PriceListener] = []
+
+    def add_listener(self, listener: PriceListener):
+        """Register a coroutine called with every batch of changed prices"""
+        self.listeners.append(listener)
+
+    def _notify(self, exchange_code: str, changed: Dict[str, Decimal]):
+        for listener in self.listeners:
+            task = asyncio.ensure_future(listener(exchange_code, changed))
+            task.add_done_callback(self._listener_done)
+
+    @staticmethod
+    def _listener_done(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Price listener failed: {task.exception()}")
+
+    def publish_prices(self, exchange_code: str, prices: Dict[str, Decimal], ttl: Optional[float] = None):
+        """Store prices pushed by a feed and notify listeners of the ones that changed"""
+        exchange_config = EXCHANGE_CONFIGS[exchange_code]
+        expires_at = time.monotonic() + (ttl if ttl is not None else price_ttl(exchange_config))
+        changed = {}
+        for symbol, price in prices.items():
+            cached = self.cache.get((exchange_code, symbol))
+            if cached is None or cached[0] != price:
+                changed[symbol] = price
+            self.cache[(exchange_code, symbol)] = (price, expires_at)
+        if changed and self.listeners:
+            self._notify(exchange_code, changed)
+        return changed
+
+    def get_provider(self, exchange_config: ExchangeConfig) -> PriceProvider:
+        name = PRICE_PROVIDER or exchange_config.data_provider
+        provider = self.providers.get(name)
+        if provider is None:
+            raise ValueError(f"No price provider configured for '{name}'")
+        return provider
+
+    @staticmethod
+    def provider_symbol(symbol: str, exchange_config: ExchangeConfig) -> str:
+        """Exchange code -> provider ticker, e.g. RELIANCE -> RELIANCE.NS"""
+        suffix = exchange_config.symbol_suffix
+        if suffix and not symbol.endswith(suffix):
+            return f"{symbol}{suffix}"
+        return symbol
+
+    async def _fetch_batch(self, provider: PriceProvider, batch: List[str]) -> Dict[str, Decimal]:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.executor, provider.fetch_prices, batch)
+        except Exception as e:
+            logger.error(f"{provider.name} price fetch failed for {len(batch)} symbols: {e}")
+            return {}
+
+    async def get_prices(self, symbols: Iterable[str], exchange_code: str) -> Dict[str, Decimal]:
+        """Latest prices keyed by the given exchange symbols; unresolved symbols are omitted"""
+        exchange_config = EXCHANGE_CONFIGS.get(exchange_code)
+        if not exchange_config:
+            raise ValueError(f"Unsupported exchange: {exchange_code}")
+
+        now = time.monotonic()
+        prices = {}
+        missing = []
+        for symbol in set(symbols):
+            cached = self.cache.get((exchange_code, symbol))
+            if cached and cached[1] > now:
+                prices[symbol] = cached[0]
+            else:
+                missing.append(symbol)
+
+        if missing:
+            provider = self.get_provider(exchange_config)
+            to_symbol = {self.provider_symbol(symbol, exchange_config): symbol for symbol in missing}
+            tickers = list(to_symbol)
+            batches = [tickers[i:i + self.batch_size] for i in range(0, len(tickers), self.batch_size)]
+            results = await asyncio.gather(*(self._fetch_batch(provider, batch) for batch in batches))
+
+            fetched = {}
+            for result in results:
+                for ticker, price in result.items():
+                    symbol = to_symbol.get(ticker)
+                    if symbol is not None:
+                        fetched[symbol] = price
+            self.publish_prices(exchange_code, fetched)
+            prices.update(fetched)
+
+            unresolved = set(missing) - set(prices)
+            if unresolved:
+                logger.warning(f"No {exchange_code} price for: {', '.join(sorted(unresolved))}")
+
+        return prices
+
+    async def get_price(self, symbol: str, exchange_code: str) -> Optional[Decimal]:
+        """Latest price for a single symbol"""
+        prices = await self.get_prices([symbol], exchange_code)
+        return prices.get(symbol)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+# Process-wide instance so the price cache and thread pool outlive a request
+_price_service: Optional[MarketPriceService] = None
+
+def get_price_service() -> MarketPriceService:
+    """Get the shared MarketPriceService"""
+    global _price_service
+    if _price_service is None:
+        _price_service = MarketPriceService()
+    return _price_service
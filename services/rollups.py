@@ -0,0 +1,168 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+import numpy as np
+from pymongo import ASCENDING
+
+from config.settings import HISTORY_COLLECTION
+
+ROLLUP_COLLECTION = "historical_price_rollups"
+ROLLUP_PERIODS = ("week", "month")
+# Roughly one plotted point per this many horizontal pixels
+PIXELS_PER_POINT = 2
+
+
+def ensure_rollup_indexes(db):
+    """Unique (symbol, period, start) index; $merge matches rollup bars on it"""
+    db[ROLLUP_COLLECTION].create_index(
+        [("symbol", ASCENDING), ("period", ASCENDING), ("start", ASCENDING)],
+        unique=True
+    )
+
+
+def period_start(date: datetime, period: str) -> datetime:
+    """Start of the week (Monday) or month containing `date`"""
+    day = datetime(date.year, date.month, date.day)
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unsupported rollup period: {period}")
+
+
+def refresh_rollups(db, symbols: Optional[Iterable[str]] = None, since: Optional[datetime] = None,
+                    periods: Iterable[str] = ROLLUP_PERIODS):
+    """
+    Recompute weekly/monthly OHLC bars from historical_prices inside MongoDB
+    and $merge them into the rollup collection. With `since`, only the
+    buckets touching that date onwards are rebuilt, so appending new daily
+    bars costs one small aggregation per period.
+    """
+    ensure_rollup_indexes(db)
+    for period in periods:
+        match = {}
+        if symbols is not None:
+            match["symbol"] = {"$in": list(symbols)}
+        if since is not None:
+            match["date"] = {"$gte": period_start(since, period)}
+
+        db[HISTORY_COLLECTION].aggregate([
+            {"$match": match},
+            {"$sort": {"symbol": 1, "date": 1}},
+            {"$group": {
+                "_id": {
+                    "symbol": "$symbol",
+                    "start": {"$dateTrunc": {"date": "$date", "unit": period, "startOfWeek": "monday"}}
+                },
+                "open": {"$first": "$open"},
+                "high": {"$max": "$high"},
+                "low": {"$min": "$low"},
+                "close": {"$last": "$close"},
+                "volume": {"$sum": "$volume"},
+                "end": {"$max": "$date"},
+                "bars": {"$sum": 1}
+            }},
+            {"$project": {
+                "_id": 0,
+                "symbol": "$_id.symbol",
+                "period": {"$literal": period},
+                "start": "$_id.start",
+                "open": 1, "high": 1, "low": 1, "close": 1, "volume": 1, "end": 1, "bars": 1
+            }},
+            {"$merge": {
+                "into": ROLLUP_COLLECTION,
+                "on": ["symbol", "period", "start"],
+                "whenMatched": "replace",
+                "whenNotMatched": "insert"
+            }}
+        ], allowDiskUse=True)
+
+
+def choose_resolution(start: datetime, end: datetime, max_points: int) -> str:
+    """Coarsest-needed bar size so the range fits in roughly max_points bars"""
+    days = max((end - start).days, 1)
+    trading_days = days * 5 / 7
+    if trading_days <= max_points:
+        return "day"
+    if trading_days / 5 <= max_points:
+        return "week"
+    return "month"
+
+
+def target_points(width_px: int) -> int:
+    """Points worth sending for a chart this many pixels wide"""
+    return max(int(width_px) // PIXELS_PER_POINT, 3)
+
+
+def _one_bar_per_date(bars, spellings: Dict[str, str], key: str):
+    """
+    Drop bars for dates already covered by another spelling. The exchange-
+    suffixed spelling (RELIANCE.NS, what price ingestion writes) wins over
+    the bare one, so a period is never built from two different series.
+    """
+    chosen = {}
+    for bar in bars:
+        stored = bar.pop("symbol")
+        rank = 0 if stored != spellings[stored] else 1
+        current = chosen.get(bar[key])
+        if current is None or rank < current[0]:
+            chosen[bar[key]] = (rank, bar)
+    return [chosen[date][1] for date in sorted(chosen)]
+
+
+def load_bars(db, spellings: Dict[str, str], start: datetime, end: datetime, resolution: str):
+    """
+    Bars for one symbol at the given resolution, sorted by date, one per
+    date. Daily bars come from historical_prices, weekly/monthly ones from
+    the rollups. `spellings` lists the stored symbol spellings to read.
+    """
+    projection = {"_id": 0, "symbol": 1, "open": 1, "high": 1, "low": 1, "close": 1, "volume": 1}
+    if resolution == "day":
+        cursor = db[HISTORY_COLLECTION].find(
+            {"symbol": {"$in": list(spellings)}, "date": {"$gte": start, "$lte": end}},
+            {**projection, "date": 1}
+        ).sort("date", 1)
+        return _one_bar_per_date(cursor, spellings, "date")
+
+    cursor = db[ROLLUP_COLLECTION].find(
+        {
+            "symbol": {"$in": list(spellings)},
+            "period": resolution,
+            "start": {"$gte": period_start(start, resolution), "$lte": end}
+        },
+        {**projection, "start": 1}
+    ).sort("start", 1)
+    bars = _one_bar_per_date(cursor, spellings, "start")
+    for bar in bars:
+        bar["date"] = bar.pop("start")
+    return bars
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling. Returns the indexes of the
+    points to keep (always including the first and last), preserving the
+    visual shape of the series with `threshold` points.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    edges = (np.arange(threshold - 1) * every).astype(np.intp) + 1
+    edges[-1] = n - 1
+
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
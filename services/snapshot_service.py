@@ -0,0 +1,217 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, List, Optional
+from bson.decimal128 import Decimal128
+from pymongo import ASCENDING, UpdateMany, UpdateOne
+
+from config.database import get_async_database
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_COLLECTION = "portfolio_snapshots"
+# Snapshots valued longer ago than this are recomputed on read so FX drift
+# gets picked up; price ticks and holding changes do not reset the clock
+SNAPSHOT_MAX_AGE = timedelta(days=1)
+
+
+def listing_key(exchange: str, symbol: str) -> str:
+    """Key a snapshot holding is priced under, e.g. NSE:RELIANCE"""
+    return f"{exchange}:{symbol}"
+
+
+def _decimal(value) -> Decimal:
+    return value.to_decimal() if isinstance(value, Decimal128) else Decimal(str(value))
+
+
+def build_snapshot(portfolio_id: str, base_currency: str, rows: List[Dict]) -> Dict:
+    """
+    Snapshot document from valued holding rows. Each row carries stock_id,
+    stock, exchange, symbol, quantity, price, fx_rate and value.
+    """
+    holdings = [{
+        "stock_id": row["stock_id"],
+        "stock": row["stock"],
+        "key": listing_key(row["exchange"], row["symbol"]),
+        "quantity": Decimal128(str(row["quantity"])),
+        "price": Decimal128(str(row["price"])),
+        "fx_rate": Decimal128(str(row["fx_rate"])),
+        "value": Decimal128(str(row["value"])),
+    } for row in rows]
+
+    now = datetime.now(timezone.utc)
+    return {
+        "portfolio_id": portfolio_id,
+        "base_currency": base_currency,
+        "holdings": holdings,
+        "symbols": sorted({holding["key"] for holding in holdings}),
+        "total_value": Decimal128(str(sum((row["value"] for row in rows), Decimal('0')))),
+        "stale": False,
+        "valued_at": now,
+        "updated_at": now,
+    }
+
+
+def snapshot_to_value(snapshot: Dict) -> Dict:
+    """Snapshot document -> the shape returned by PortfolioService.get_portfolio_value"""
+    return {
+        "total_value": _decimal(snapshot["total_value"]),
+        "currency": snapshot["base_currency"],
+        "holdings": [{
+            "stock": holding["stock"],
+            "value": _decimal(holding["value"]),
+            "currency": snapshot["base_currency"]
+        } for holding in snapshot["holdings"]]
+    }
+
+
+# Pipeline stage recomputing the total from the per-holding values. It leaves
+# valued_at alone: incremental updates reuse the snapshotted FX rates.
+_RECOMPUTE_TOTAL = {"$set": {
+    "total_value": {"$sum": "$holdings.value"},
+    "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]},
+    "updated_at": "$$NOW"
+}}
+
+
+def price_update_op(key: str, price: Decimal) -> UpdateMany:
+    """
+    Reprice one symbol in every snapshot that holds it. Runs server-side as
+    a pipeline update, so it needs no read and is atomic per snapshot.
+    """
+    price = Decimal128(str(price))
+    return UpdateMany({"symbols": key}, [
+        {"$set": {"holdings": {"$map": {
+            "input": "$holdings",
+            "as": "h",
+            "in": {"$cond": [
+                {"$eq": ["$$h.key", key]},
+                {"$mergeObjects": ["$$h", {
+                    "price": price,
+                    "value": {"$multiply": ["$$h.quantity", price, "$$h.fx_rate"]}
+                }]},
+                "$$h"
+            ]}
+        }}}},
+        _RECOMPUTE_TOTAL
+    ])
+
+
+def holding_change_op(portfolio_id: str, stock_id: str, quantity: Decimal) -> UpdateOne:
+    """
+    Apply a holding's new quantity at its snapshotted price. Only matches
+    snapshots that already contain the holding; anything else needs a rebuild.
+    """
+    quantity = Decimal128(str(quantity))
+    if _decimal(quantity) == 0:
+        holdings = {"$filter": {
+            "input": "$holdings",
+            "as": "h",
+            "cond": {"$ne": ["$$h.stock_id", stock_id]}
+        }}
+    else:
+        holdings = {"$map": {
+            "input": "$holdings",
+            "as": "h",
+            "in": {"$cond": [
+                {"$eq": ["$$h.stock_id", stock_id]},
+                {"$mergeObjects": ["$$h", {
+                    "quantity": quantity,
+                    "value": {"$multiply": [quantity, "$$h.price", "$$h.fx_rate"]}
+                }]},
+                "$$h"
+            ]}
+        }}
+
+    return UpdateOne(
+        {"portfolio_id": portfolio_id, "holdings.stock_id": stock_id, "stale": False},
+        [
+            {"$set": {"holdings": holdings}},
+            {"$set": {"symbols": {"$setUnion": ["$holdings.key", []]}}},
+            _RECOMPUTE_TOTAL
+        ]
+    )
+
+
+def snapshot_portfolio_id(portfolio: Dict) -> str:
+    """
+    Id a portfolio's snapshot is keyed by: the uuid `id` the API looks
+    portfolios up with, which portfolios created in the Flask app carry too
+    """
+    return portfolio.get("id") or str(portfolio["_id"])
+
+
+def mark_stale_sync(db, portfolio_id: str):
+    """Synchronous counterpart of PortfolioSnapshotService.mark_stale"""
+    db[SNAPSHOT_COLLECTION].update_one({"portfolio_id": portfolio_id}, {"$set": {"stale": True}})
+
+
+def apply_holding_change_sync(db, portfolio_id: str, stock_id: str, quantity: Decimal) -> bool:
+    """
+    Synchronous counterpart of PortfolioSnapshotService.apply_holding_change
+    for pymongo callers. Returns False when the snapshot was marked stale.
+    """
+    result = db[SNAPSHOT_COLLECTION].bulk_write([holding_change_op(portfolio_id, stock_id, quantity)])
+    if result.matched_count:
+        return True
+    mark_stale_sync(db, portfolio_id)
+    return False
+
+
+class PortfolioSnapshotService:
+    """
+    Materialized valuations in the portfolio_snapshots collection, one
+    document per portfolio with a per-holding breakdown. Price ticks and
+    holding changes are applied incrementally; anything the incremental path
+    cannot handle marks the snapshot stale so the next read recomputes it.
+    """
+
+    def __init__(self, db=None):
+        self.db = db if db is not None else get_async_database()
+        self.collection = self.db[SNAPSHOT_COLLECTION]
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([("portfolio_id", ASCENDING)], unique=True)
+        await self.collection.create_index([("symbols", ASCENDING)])
+
+    async def get_snapshot(self, portfolio_id: str) -> Optional[Dict]:
+        """Current snapshot, or None when missing, stale or last fully valued too long ago"""
+        snapshot = await self.collection.find_one({"portfolio_id": portfolio_id})
+        if not snapshot or snapshot.get("stale"):
+            return None
+        # Snapshots written before valued_at existed fall back to updated_at
+        valued_at = snapshot.get("valued_at") or snapshot["updated_at"]
+        if valued_at.tzinfo is None:
+            valued_at = valued_at.replace(tzinfo=timezone.utc)
+        if datetime.now(timezone.utc) - valued_at > SNAPSHOT_MAX_AGE:
+            return None
+        return snapshot
+
+    async def save_snapshot(self, portfolio_id: str, base_currency: str, rows: List[Dict]) -> Dict:
+        """Full recompute: replace the snapshot with freshly valued rows"""
+        snapshot = build_snapshot(portfolio_id, base_currency, rows)
+        await self.collection.update_one(
+            {"portfolio_id": portfolio_id},
+            {"$set": snapshot, "$inc": {"version": 1}},
+            upsert=True
+        )
+        return snapshot
+
+    async def mark_stale(self, portfolio_id: str):
+        await self.collection.update_one({"portfolio_id": portfolio_id}, {"$set": {"stale": True}})
+
+    async def apply_holding_change(self, portfolio_id: str, stock_id: str, quantity: Decimal) -> bool:
+        """Update one holding's quantity; marks the snapshot stale if it lacks the holding"""
+        result = await self.collection.bulk_write([holding_change_op(portfolio_id, stock_id, quantity)])
+        if result.matched_count:
+            return True
+        await self.mark_stale(portfolio_id)
+        return False
+
+    async def on_prices(self, exchange_code: str, prices: Dict[str, Decimal]):
+        """Price listener: reprice only the snapshots holding the changed symbols"""
+        ops = [price_update_op(listing_key(exchange_code, symbol), price)
+               for symbol, price in prices.items()]
+        if ops:
+            result = await self.collection.bulk_write(ops, ordered=False)
+            logger.debug(f"Repriced {result.modified_count} snapshots for {len(ops)} {exchange_code} symbols")
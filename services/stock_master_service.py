@@ -1,20 +1,13 @@
 from typing import Optional, List, Dict
 import logging
-from pymongo import MongoClient
 from config.exchanges import EXCHANGE_CONFIGS, ExchangeConfig
-from config.settings import MONGODB_URI
 from models.stock import Stock
 from datetime import datetime
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from config.database import get_database
 from bson import ObjectId
 
 logger = logging.getLogger(__name__)
 
-def get_database():
-    client = MongoClient(MONGODB_URI)
-    return client.portfolio_tracker
-
 class StockMasterService:
     def __init__(self):
         self.db = get_database()
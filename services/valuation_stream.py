@@ -0,0 +1,319 @@
+import asyncio
+import logging
+import random
+from decimal import Decimal
+from typing import AsyncIterator, Dict, Optional, Set
+
+from services.price_service import MarketPriceService
+from services.snapshot_service import listing_key
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between two messages to one client; updates in between are coalesced
+STREAM_MIN_INTERVAL = 1.0
+# Seconds between price polls for the symbols someone is watching
+PRICE_POLL_INTERVAL = 15.0
+# Seconds between checks of watched portfolios for changed holdings
+HOLDINGS_POLL_INTERVAL = 10.0
+# Seconds without an update after which streams send a keep-alive and check the client is still there
+STREAM_HEARTBEAT_INTERVAL = 15.0
+
+
+class ValuationSubscriber:
+    """
+    One connected client. Holds at most one pending update: anything pushed
+    while the client is still sending (or inside its throttle window) is
+    merged into it, so slow consumers only ever see the latest state. A full
+    update (first message, or holdings reloaded) replaces whatever is pending.
+    """
+
+    def __init__(self, min_interval: float = STREAM_MIN_INTERVAL):
+        self.min_interval = min_interval
+        self.pending: Optional[Dict] = None
+        self.event = asyncio.Event()
+
+    def push(self, update: Dict):
+        if self.pending is None:
+            self.pending = {**update, "holdings": dict(update["holdings"])}
+        elif update.get("full"):
+            change = self.pending["change"] + update["change"]
+            self.pending = {**update, "holdings": dict(update["holdings"]), "change": change}
+        else:
+            self.pending["holdings"].update(update["holdings"])
+            self.pending["change"] += update["change"]
+            self.pending["total_value"] = update["total_value"]
+        self.event.set()
+
+    async def updates(self, heartbeat: Optional[float] = None) -> AsyncIterator[Optional[Dict]]:
+        """Pending updates as they arrive; with `heartbeat`, None after that many idle seconds"""
+        while True:
+            try:
+                await asyncio.wait_for(self.event.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            self.event.clear()
+            update, self.pending = self.pending, None
+            yield update
+            await asyncio.sleep(self.min_interval)
+
+
+class _PortfolioState:
+    """In-memory valuation of one watched portfolio, shared by all its clients"""
+
+    def __init__(self, portfolio_id: str, snapshot: Dict, holdings_updated_at=None):
+        self.portfolio_id = portfolio_id
+        # Portfolio updated_at the state was loaded at; a newer one means holdings changed
+        self.holdings_updated_at = holdings_updated_at
+        self.currency = snapshot["base_currency"]
+        # key -> quantity * fx_rate, so a price tick is one multiplication
+        self.factors: Dict[str, float] = {}
+        self.values: Dict[str, float] = {}
+        self.prices: Dict[str, float] = {}
+        for holding in snapshot["holdings"]:
+            self.prices[holding["key"]] = float(str(holding["price"]))
+            quantity = float(str(holding["quantity"]))
+            fx_rate = float(str(holding["fx_rate"]))
+            self.factors[holding["key"]] = self.factors.get(holding["key"], 0.0) + quantity * fx_rate
+            self.values[holding["key"]] = self.values.get(holding["key"], 0.0) + float(str(holding["value"]))
+        self.total_value = sum(self.values.values())
+        self.subscribers: Set[ValuationSubscriber] = set()
+
+    def full_update(self, change: float = 0.0) -> Dict:
+        return {
+            "portfolio_id": self.portfolio_id,
+            "currency": self.currency,
+            "total_value": self.total_value,
+            "change": change,
+            "holdings": dict(self.values),
+            "full": True
+        }
+
+    def apply_prices(self, prices: Dict[str, float]) -> Optional[Dict]:
+        """Reprice the given keys; returns the delta message, or None if nothing moved"""
+        changed = {}
+        change = 0.0
+        for key, price in prices.items():
+            if key not in self.factors:
+                continue
+            value = self.factors[key] * price
+            self.prices[key] = price
+            change += value - self.values[key]
+            self.values[key] = value
+            changed[key] = value
+        if not changed:
+            return None
+        self.total_value += change
+        return {
+            "portfolio_id": self.portfolio_id,
+            "currency": self.currency,
+            "total_value": self.total_value,
+            "change": change,
+            "holdings": changed
+        }
+
+
+class ValuationBroadcaster:
+    """
+    Fans price changes out to live valuation streams. Each watched portfolio
+    is valued once per tick from its in-memory state and the resulting delta
+    is pushed to every client watching it; symbols are tracked once no matter
+    how many portfolios or clients depend on them.
+    """
+
+    def __init__(self, price_service: MarketPriceService, portfolio_service,
+                 min_interval: float = STREAM_MIN_INTERVAL):
+        self.price_service = price_service
+        self.portfolio_service = portfolio_service
+        self.min_interval = min_interval
+        self.portfolios: Dict[str, _PortfolioState] = {}
+        self.symbol_index: Dict[str, Set[str]] = {}
+        # One lock per portfolio, so a slow load only holds up clients of that portfolio
+        self._load_locks: Dict[str, asyncio.Lock] = {}
+        price_service.add_listener(self.on_prices)
+
+    async def _load_state(self, portfolio_id: str, rebuild: bool = False) -> _PortfolioState:
+        """
+        Value a portfolio from its snapshot, or from a full recompute when
+        `rebuild` is set. Raises ValueError for an unknown portfolio.
+        """
+        portfolio = await self.portfolio_service.collection.find_one(
+            {"id": portfolio_id}, {"_id": 0, "updated_at": 1}
+        )
+        if portfolio is None:
+            raise ValueError(f"Portfolio not found: {portfolio_id}")
+        snapshot = None
+        if not rebuild:
+            snapshot = await self.portfolio_service.snapshot_service.get_snapshot(portfolio_id)
+        if snapshot is None:
+            snapshot = await self.portfolio_service.refresh_portfolio_snapshot(portfolio_id)
+        return _PortfolioState(portfolio_id, snapshot, portfolio.get("updated_at"))
+
+    def _index(self, state: _PortfolioState):
+        self.portfolios[state.portfolio_id] = state
+        for key in state.factors:
+            self.symbol_index.setdefault(key, set()).add(state.portfolio_id)
+
+    def _unindex(self, state: _PortfolioState):
+        for key in state.factors:
+            watchers = self.symbol_index.get(key)
+            if watchers is not None:
+                watchers.discard(state.portfolio_id)
+                if not watchers:
+                    del self.symbol_index[key]
+
+    async def subscribe(self, portfolio_id: str) -> ValuationSubscriber:
+        """Start watching a portfolio; raises ValueError if it does not exist"""
+        state = self.portfolios.get(portfolio_id)
+        if state is None:
+            async with self._load_locks.setdefault(portfolio_id, asyncio.Lock()):
+                state = self.portfolios.get(portfolio_id)
+                if state is None:
+                    state = await self._load_state(portfolio_id)
+                    self._index(state)
+
+        subscriber = ValuationSubscriber(self.min_interval)
+        state.subscribers.add(subscriber)
+        subscriber.push(state.full_update())
+        return subscriber
+
+    def unsubscribe(self, portfolio_id: str, subscriber: ValuationSubscriber):
+        state = self.portfolios.get(portfolio_id)
+        if state is None:
+            return
+        state.subscribers.discard(subscriber)
+        if not state.subscribers:
+            del self.portfolios[portfolio_id]
+            self._unindex(state)
+            lock = self._load_locks.get(portfolio_id)
+            if lock is not None and not lock.locked():
+                del self._load_locks[portfolio_id]
+
+    async def reload(self, portfolio_id: str):
+        """Rebuild a watched portfolio after its holdings changed and push the full state"""
+        async with self._load_locks.setdefault(portfolio_id, asyncio.Lock()):
+            old = self.portfolios.get(portfolio_id)
+            if old is None:
+                return
+            state = await self._load_state(portfolio_id, rebuild=True)
+            if self.portfolios.get(portfolio_id) is not old:
+                return
+            state.subscribers = old.subscribers
+            self._unindex(old)
+            self._index(state)
+        update = state.full_update(change=state.total_value - old.total_value)
+        for subscriber in state.subscribers:
+            subscriber.push(update)
+
+    async def check_holdings(self):
+        """Reload every watched portfolio whose updated_at moved since it was loaded"""
+        if not self.portfolios:
+            return
+        cursor = self.portfolio_service.collection.find(
+            {"id": {"$in": list(self.portfolios)}}, {"_id": 0, "id": 1, "updated_at": 1}
+        )
+        for portfolio in await cursor.to_list(length=None):
+            state = self.portfolios.get(portfolio["id"])
+            if state is not None and portfolio.get("updated_at") != state.holdings_updated_at:
+                try:
+                    await self.reload(portfolio["id"])
+                except Exception as e:
+                    logger.error(f"Reloading portfolio {portfolio['id']} failed: {e}")
+
+    async def watch_holdings(self, interval: float = HOLDINGS_POLL_INTERVAL):
+        """
+        Pick up holding changes made anywhere (the Flask app, corporate action
+        runs) by polling the watched portfolios' updated_at.
+        """
+        while True:
+            try:
+                await self.check_holdings()
+            except Exception as e:
+                logger.error(f"Holdings check failed: {e}")
+            await asyncio.sleep(interval)
+
+    def watched_symbols(self) -> Dict[str, Set[str]]:
+        """Symbols with at least one watcher, grouped by exchange"""
+        by_exchange: Dict[str, Set[str]] = {}
+        for key in self.symbol_index:
+            exchange, symbol = key.split(":", 1)
+            by_exchange.setdefault(exchange, set()).add(symbol)
+        return by_exchange
+
+    def last_price(self, key: str) -> Optional[float]:
+        """Most recent known price for a watched symbol"""
+        for portfolio_id in self.symbol_index.get(key, ()):
+            price = self.portfolios[portfolio_id].prices.get(key)
+            if price is not None:
+                return price
+        return None
+
+    async def on_prices(self, exchange_code: str, prices: Dict[str, Decimal]):
+        """Price listener: revalue each affected portfolio once and fan out"""
+        keyed = {listing_key(exchange_code, symbol): float(price) for symbol, price in prices.items()}
+        affected = set()
+        for key in keyed:
+            affected |= self.symbol_index.get(key, set())
+
+        for portfolio_id in affected:
+            state = self.portfolios.get(portfolio_id)
+            if state is None:
+                continue
+            update = state.apply_prices(keyed)
+            if update is None:
+                continue
+            for subscriber in state.subscribers:
+                subscriber.push(update)
+
+    async def poll_prices(self, interval: float = PRICE_POLL_INTERVAL):
+        """
+        Keep watched symbols fresh through the price service. Its cache TTL
+        decides when the provider is actually hit; changes come back through
+        on_prices.
+        """
+        while True:
+            for exchange_code, symbols in self.watched_symbols().items():
+                try:
+                    await self.price_service.get_prices(symbols, exchange_code)
+                except Exception as e:
+                    logger.error(f"Price poll failed for {exchange_code}: {e}")
+            await asyncio.sleep(interval)
+
+
+class SimulatedPriceFeed:
+    """
+    Random-walk prices for watched symbols, for local runs and tests. Ticks
+    go straight to the broadcaster and never into the price service, so the
+    price cache and portfolio snapshots only ever hold real prices.
+    """
+
+    def __init__(self, broadcaster: ValuationBroadcaster, interval: float = 1.0,
+                 volatility: float = 0.002, seed: Optional[int] = None):
+        self.broadcaster = broadcaster
+        self.interval = interval
+        self.volatility = volatility
+        self.random = random.Random(seed)
+        self.last_prices: Dict[str, Decimal] = {}
+
+    def _next_price(self, key: str) -> Optional[Decimal]:
+        last = self.last_prices.get(key)
+        if last is None:
+            seed = self.broadcaster.last_price(key)
+            if seed is None:
+                return None
+            last = Decimal(str(seed))
+        price = (last * Decimal(str(1 + self.random.gauss(0, self.volatility)))).quantize(Decimal('0.01'))
+        self.last_prices[key] = price
+        return price
+
+    async def run(self):
+        while True:
+            for exchange_code, symbols in self.broadcaster.watched_symbols().items():
+                prices = {}
+                for symbol in symbols:
+                    price = self._next_price(listing_key(exchange_code, symbol))
+                    if price is not None:
+                        prices[symbol] = price
+                if prices:
+                    await self.broadcaster.on_prices(exchange_code, prices)
+            await asyncio.sleep(self.interval)
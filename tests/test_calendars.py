@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from config import calendars
+from config.calendars import TradingCalendar, get_calendar
+
+
+@pytest.fixture
+def builtin_calendars(monkeypatch):
+    """Calendars from the built-in holiday lists, as without exchange_calendars"""
+    monkeypatch.setattr(calendars, "exchange_calendars", None)
+    calendars._load_calendar.cache_clear()
+    yield
+    calendars._load_calendar.cache_clear()
+
+
+def test_builtin_nse_2026_holidays(builtin_calendars):
+    nse = get_calendar("NSE")
+    for holiday in ("2026-03-03", "2026-04-03", "2026-10-20", "2026-11-10", "2026-11-24"):
+        assert not nse.is_session(holiday)
+    assert nse.is_session("2026-04-06")
+
+
+def test_builtin_calendar_falls_back_to_weekdays_outside_listed_years(builtin_calendars, caplog):
+    nse = get_calendar("NSE")
+    assert nse.covers("2024-01-01", "2026-12-31")
+    assert not nse.covers("2023-12-01", "2024-01-31")
+    # 2023-12-25 is an NSE holiday the built-in lists do not know about
+    with caplog.at_level("WARNING", logger="config.calendars"):
+        assert nse.is_session("2023-12-25")
+        assert nse.is_session("2027-01-04")
+        assert nse.count_sessions("2027-01-04", "2027-01-10") == 5
+        assert not nse.is_session("2026-12-25")
+    # Warned once per calendar, not on every lookup
+    assert len([record for record in caplog.records if "only known" in record.message]) == 1
+
+
+def test_calendar_is_reloaded_each_day(builtin_calendars, monkeypatch):
+    class Today(calendars.date):
+        day_offset = 0
+
+        @classmethod
+        def today(cls):
+            return calendars.date(2026, 10, 19 + cls.day_offset)
+
+    monkeypatch.setattr(calendars, "date", Today)
+    first = get_calendar("NSE")
+    assert get_calendar("NSE") is first
+    Today.day_offset = 1
+    assert get_calendar("NSE") is not first
+
+
+def test_extra_holidays_extend_the_range(builtin_calendars, monkeypatch):
+    monkeypatch.setattr(calendars, "_load_extra_holidays", lambda: {"NSE": ["2027-01-26"]})
+    nse = get_calendar("NSE")
+    assert not nse.is_session("2027-01-26")
+    assert nse.is_session("2027-01-27")
+
+
+def test_unknown_exchange_is_unbounded():
+    calendar = get_calendar("XYZ")
+    assert calendar.count_sessions("1990-01-01", "1990-01-07") == 5
+    assert TradingCalendar().first is None
+
+
+def test_exchange_calendars_source_matches_builtin_lists():
+    pytest.importorskip("exchange_calendars")
+    calendars._load_calendar.cache_clear()
+    for code in ("NSE", "NYSE"):
+        listed = np.array(calendars.EXCHANGE_HOLIDAYS[code], dtype="datetime64[D]")
+        holidays = get_calendar(code).holidays
+        assert set(listed) <= set(holidays)
+        assert get_calendar(code).first <= np.datetime64("2005-01-03")
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from services import close_prices
+from services.close_prices import query_latest_closes
+
+
+class BarCollection:
+    """aggregate() over in-memory bars for the $match/$sort/$group pipeline; records each call"""
+
+    def __init__(self, bars):
+        self.bars = bars
+        self.pipelines = []
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        match, sort, group = pipeline
+        symbols = match["$match"]["symbol"]["$in"]
+        n = group["$group"]["bars"]["$firstN"]["n"]
+        bars = sorted((bar for bar in self.bars if bar["symbol"] in symbols),
+                      key=lambda bar: (bar["symbol"], -bar["date"].timestamp()))
+        grouped = {}
+        for bar in bars:
+            grouped.setdefault(bar["symbol"], []).append({"date": bar["date"], "close": bar["close"]})
+        return [{"_id": symbol, "bars": symbol_bars[:n]} for symbol, symbol_bars in grouped.items()]
+
+
+def test_latest_closes_merge_spellings_in_one_aggregation(monkeypatch):
+    monkeypatch.setattr(close_prices, "ensure_history_indexes", lambda db: None)
+    bars = [{"symbol": "RELIANCE", "date": datetime(2026, 1, day), "close": 100.0 + day} for day in range(1, 6)]
+    bars.append({"symbol": "RELIANCE.NS", "date": datetime(2026, 1, 6), "close": 106.0})
+    bars.append({"symbol": "TCS", "date": datetime(2026, 1, 6), "close": 3500.0})
+    collection = BarCollection(bars)
+    db = {close_prices.HISTORY_COLLECTION: collection}
+
+    closes = query_latest_closes(db, {"RELIANCE": "RELIANCE", "RELIANCE.NS": "RELIANCE", "TCS": "TCS"})
+    assert closes == {
+        "RELIANCE": [(datetime(2026, 1, 6), 106.0), (datetime(2026, 1, 5), 105.0)],
+        "TCS": [(datetime(2026, 1, 6), 3500.0)],
+    }
+    [pipeline] = collection.pipelines
+    assert pipeline[0] == {"$match": {"symbol": {"$in": ["RELIANCE", "RELIANCE.NS", "TCS"]}}}
+    assert pipeline[2]["$group"]["bars"]["$firstN"]["n"] == 2
@@ -0,0 +1,103 @@
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from services.corporate_actions import (
+    ACTIONS_COLLECTION, apply_pending_actions, record_action, share_ratio
+)
+from services.snapshot_service import SNAPSHOT_COLLECTION
+
+
+class Cursor(list):
+    def sort(self, key, direction):
+        return Cursor(sorted(self, key=lambda doc: doc[key]))
+
+
+class Collection:
+    """Records writes; matches find/find_one on exact top-level fields only"""
+
+    def __init__(self):
+        self.documents = []
+        self.updates = []
+
+    def create_index(self, *args, **kwargs):
+        pass
+
+    def _matches(self, doc, query):
+        return all(doc.get(key) == value for key, value in query.items() if not isinstance(value, dict))
+
+    def find_one(self, query, projection=None):
+        return next((doc for doc in self.documents if self._matches(doc, query)), None)
+
+    def find(self, query, projection=None):
+        return Cursor(doc for doc in self.documents
+                      if "applied_at" not in doc and self._matches(doc, query))
+
+    def update_one(self, query, update, upsert=False):
+        doc = self.find_one(query)
+        if doc is None:
+            doc = {"_id": len(self.documents) + 1, **query, **update.get("$setOnInsert", {})}
+            self.documents.append(doc)
+        doc.update(update["$set"])
+
+    def update_many(self, query, update):
+        self.updates.append((query, update))
+        if "_id" in query:
+            for doc in self.documents:
+                if doc["_id"] in query["_id"]["$in"]:
+                    doc.update(update["$set"])
+        return SimpleNamespace(modified_count=1)
+
+    def bulk_write(self, operations, ordered=True):
+        self.updates.extend(operations)
+        return SimpleNamespace(modified_count=len(operations))
+
+
+class Database(dict):
+    def __missing__(self, name):
+        self[name] = Collection()
+        return self[name]
+
+    def __getattr__(self, name):
+        return self[name]
+
+
+def test_share_ratio_scales_exactly():
+    bonus = {"action_type": "bonus", "numerator": 1, "denominator": 3}
+    after, before = share_ratio(bonus)
+    assert Decimal("300") * after.to_decimal() / before.to_decimal() == Decimal("400")
+    assert Decimal("400") * before.to_decimal() / after.to_decimal() == Decimal("300")
+
+    split = {"action_type": "split", "numerator": 5.0, "denominator": 1.0}
+    assert tuple(value.to_decimal() for value in share_ratio(split)) == (Decimal("5.0"), Decimal("1.0"))
+
+
+def test_applied_action_cannot_be_corrected():
+    db = Database()
+    ex_date = datetime(2025, 6, 4)
+    record_action(db, "TCS", ex_date, "bonus", 1, 2)
+    # Unapplied actions may still be corrected
+    assert record_action(db, "TCS", ex_date, "bonus", 1, 3)["denominator"] == 3
+
+    apply_pending_actions(db, as_of=datetime(2025, 6, 5))
+    # Re-recording the applied ratio is harmless
+    record_action(db, "TCS", ex_date, "bonus", 1, 3)
+    with pytest.raises(ValueError, match="cannot be corrected"):
+        record_action(db, "TCS", ex_date, "bonus", 1, 2)
+    assert db[ACTIONS_COLLECTION].documents[0]["denominator"] == 3
+
+
+def test_applying_actions_marks_snapshots_stale():
+    db = Database()
+    db.master_stocks.documents.append({"_id": "stock-1", "identifiers.nse_code": "TCS"})
+    record_action(db, "TCS", datetime(2025, 6, 4), "split", 5, 1)
+    record_action(db, "INFY", datetime(2025, 6, 4), "bonus", 1, 1)
+
+    summary = apply_pending_actions(db, as_of=datetime(2025, 6, 5))
+    assert summary["actions"] == 2 and summary["snapshots_marked_stale"] == 1
+    [(query, update)] = db[SNAPSHOT_COLLECTION].updates
+    assert update == {"$set": {"stale": True}}
+    assert query["$or"][0] == {"symbols": {"$in": ["NSE:INFY", "NSE:TCS"]}}
+    assert apply_pending_actions(db, as_of=datetime(2025, 6, 5))["actions"] == 0
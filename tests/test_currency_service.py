@@ -0,0 +1,170 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+from decimal import Decimal
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from services.currency_service import CurrencyService
+
+
+class RateServer:
+    """Stub exchange-rate API: counts requests and serves USD tables that change per request"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+        self.fail = False
+
+    async def latest(self, request):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            return web.json_response({"error": "unavailable"}, status=503)
+        base = request.match_info["base"]
+        return web.json_response({"base": base, "rates": {"INR": 80 + self.calls, "EUR": 0.9}})
+
+    @asynccontextmanager
+    async def serve(self, **service_options):
+        server = TestServer(_rate_app(self))
+        await server.start_server()
+        service = CurrencyService(base_url=str(server.make_url("/latest/")), **service_options)
+        try:
+            yield service
+        finally:
+            await service.close()
+            await server.close()
+
+
+def _rate_app(stub: RateServer) -> web.Application:
+    app = web.Application()
+    app.router.add_get("/latest/{base}", stub.latest)
+    return app
+
+
+def expire(service: CurrencyService, base: str, age: float):
+    """Age a cached table by `age` seconds"""
+    rates, _ = service.cache[base]
+    service.cache[base] = (rates, time.monotonic() - age)
+
+
+def test_concurrent_misses_share_one_request():
+    async def scenario():
+        stub = RateServer(delay=0.05)
+        async with stub.serve() as service:
+            rates = await asyncio.gather(*(service.get_exchange_rate("USD", "INR") for _ in range(20)))
+        return stub.calls, rates
+
+    calls, rates = asyncio.run(scenario())
+    assert calls == 1
+    assert set(rates) == {Decimal("81")}
+
+
+def test_cross_rate_uses_cached_table():
+    async def scenario():
+        stub = RateServer()
+        async with stub.serve() as service:
+            await service.get_rate_table("USD")
+            rate = await service.get_exchange_rate("EUR", "INR")
+        return stub.calls, rate
+
+    calls, rate = asyncio.run(scenario())
+    assert calls == 1
+    assert rate == Decimal("81") / Decimal("0.9")
+
+
+def test_expired_table_is_served_while_refreshing():
+    async def scenario():
+        stub = RateServer(delay=0.05)
+        async with stub.serve(ttl=60, max_stale=600) as service:
+            await service.get_rate_table("USD")
+            expire(service, "USD", 120)
+            stale = await service.get_exchange_rate("USD", "INR")
+            refreshing = "USD" in service._inflight
+            await service._inflight["USD"]
+            fresh = await service.get_exchange_rate("USD", "INR")
+        return stub.calls, stale, refreshing, fresh
+
+    calls, stale, refreshing, fresh = asyncio.run(scenario())
+    assert stale == Decimal("81")
+    assert refreshing
+    assert fresh == Decimal("82")
+    assert calls == 2
+
+
+def test_fresh_table_is_not_refetched():
+    async def scenario():
+        stub = RateServer()
+        async with stub.serve(ttl=60) as service:
+            for _ in range(5):
+                await service.get_exchange_rate("USD", "INR")
+        return stub.calls
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_failed_refresh_keeps_serving_stale_table():
+    async def scenario():
+        stub = RateServer()
+        async with stub.serve(ttl=60, max_stale=600) as service:
+            await service.get_rate_table("USD")
+            stub.fail = True
+            expire(service, "USD", 120)
+            stale = await service.get_exchange_rate("USD", "INR")
+            with pytest.raises(aiohttp.ClientResponseError):
+                await service._inflight["USD"]
+            again = await service.get_exchange_rate("USD", "INR")
+            await asyncio.gather(*service._inflight.values(), return_exceptions=True)
+        return stale, again
+
+    stale, again = asyncio.run(scenario())
+    assert stale == again == Decimal("81")
+
+
+def test_table_past_max_stale_is_not_served():
+    async def scenario():
+        stub = RateServer()
+        async with stub.serve(ttl=60, max_stale=600) as service:
+            await service.get_rate_table("USD")
+            stub.fail = True
+            expire(service, "USD", 900)
+            with pytest.raises(aiohttp.ClientResponseError):
+                await service.get_exchange_rate("USD", "INR")
+            stub.fail = False
+            recovered = await service.get_exchange_rate("USD", "INR")
+        return stub.calls, recovered
+
+    calls, recovered = asyncio.run(scenario())
+    assert calls == 3
+    assert recovered == Decimal("83")
+
+
+def test_sync_lookup_shares_the_cache():
+    stub = RateServer()
+    loop = asyncio.new_event_loop()
+    server = TestServer(_rate_app(stub))
+    loop.run_until_complete(server.start_server())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        service = CurrencyService(base_url=str(server.make_url("/latest/")), ttl=60, max_stale=600)
+        first = service.get_exchange_rate_sync("USD", "INR")
+        cross = service.get_exchange_rate_sync("EUR", "INR")
+        stub.fail = True
+        expire(service, "USD", 120)
+        stale = service.get_exchange_rate_sync("USD", "INR")
+        expire(service, "USD", 900)
+        with pytest.raises(aiohttp.ClientResponseError):
+            service.get_exchange_rate_sync("USD", "INR")
+    finally:
+        asyncio.run_coroutine_threadsafe(server.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+    assert first == stale == Decimal("81")
+    assert cross == Decimal("81") / Decimal("0.9")
+    assert stub.calls == 3
@@ -0,0 +1,90 @@
+import threading
+import time
+
+from services.maintenance.detail_refresh import DetailRefresher, StubDetailsProvider, TokenBucket
+
+DETAILS = {f"SYM{i}": {"display_name": f"Company {i}", "nse_code": f"SYM{i}"} for i in range(20)}
+
+
+class HangingProvider(StubDetailsProvider):
+    """Never answers for the symbols in `hang` until released"""
+
+    def __init__(self, details, hang):
+        super().__init__(details)
+        self.hang = set(hang)
+        self.release = threading.Event()
+
+    def fetch_details(self, symbol):
+        if symbol in self.hang:
+            self.release.wait(5)
+        return super().fetch_details(symbol)
+
+
+def refresher(provider, **options):
+    settings = {"max_workers": 4, "rate_limit": 0, "timeout": 2, "retries": 3, "base_delay": 0}
+    settings.update(options)
+    return DetailRefresher(provider, **settings)
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, capacity=1)
+    started = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    assert time.monotonic() - started >= 0.18
+
+
+def test_token_bucket_allows_bursts_and_can_be_disabled():
+    started = time.monotonic()
+    bucket = TokenBucket(rate=1, capacity=5)
+    for _ in range(5):
+        bucket.acquire()
+    disabled = TokenBucket(rate=0)
+    for _ in range(1000):
+        disabled.acquire()
+    assert time.monotonic() - started < 0.1
+
+
+def test_rate_limit_applies_across_workers():
+    provider = StubDetailsProvider(DETAILS)
+    run = refresher(provider, max_workers=8)
+    run.bucket = TokenBucket(rate=100, capacity=1)
+    started = time.monotonic()
+    run.refresh(DETAILS)
+    assert time.monotonic() - started >= 0.15
+    assert run.metrics.succeeded == 20
+
+
+def test_failed_calls_are_retried():
+    provider = StubDetailsProvider(DETAILS, failures={"SYM1": 2, "SYM2": 1})
+    run = refresher(provider)
+    results = run.refresh(DETAILS)
+    assert set(results) == set(DETAILS)
+    assert run.metrics.retries == 3
+    assert provider.calls == len(DETAILS) + 3
+
+
+def test_symbol_fails_after_retries_run_out():
+    provider = StubDetailsProvider(DETAILS, failures={"SYM1": 10})
+    run = refresher(provider, retries=2)
+    results = run.refresh(["SYM1", "SYM2", "UNKNOWN"])
+    summary = run.metrics.summary()
+    assert set(results) == {"SYM2"}
+    assert summary["failed"] == 1 and summary["empty"] == 1
+    assert "Simulated failure" in summary["errors"]["SYM1"]
+    assert provider.calls == 3 + 1 + 1
+
+
+def test_hung_call_times_out_without_holding_the_run():
+    provider = HangingProvider(DETAILS, hang={"SYM3"})
+    run = refresher(provider, timeout=0.1, retries=1)
+    started = time.monotonic()
+    try:
+        results = run.refresh(DETAILS)
+        elapsed = time.monotonic() - started
+    finally:
+        provider.release.set()
+    assert "SYM3" not in results and len(results) == 19
+    assert run.metrics.timeouts == 2
+    assert "timed out" in run.metrics.errors["SYM3"]
+    assert elapsed < 1.0
@@ -0,0 +1,44 @@
+import pytest
+
+from services.exposure_service import compute_exposures, portfolio_currency
+
+CLASSIFICATIONS = {
+    "TCS": {"classification": {"sector": "IT", "industry": "Software"},
+            "exchange_info": {"primary_exchange": "NSE", "currency": "INR"}},
+    "AAPL": {"classification": {"sector": "IT", "industry": "Hardware"},
+             "exchange_info": {"primary_exchange": "NASDAQ", "currency": "USD"}},
+    "HDFCBANK": {"classification": {"sector": "Financials", "industry": "Banks"},
+                 "exchange_info": {"primary_exchange": "NSE", "currency": "INR"}},
+}
+HOLDINGS = [
+    {"stock_symbol": "TCS", "quantity": "10", "exchange_code": "NSE"},
+    {"stock_symbol": "AAPL", "quantity": "5", "exchange_code": "NASDAQ"},
+    {"stock_symbol": "HDFCBANK", "quantity": "20", "exchange_code": "NSE"},
+]
+PRICES = {"TCS": 4000.0, "AAPL": 200.0, "HDFCBANK": 1500.0}
+
+
+def by_name(rows):
+    return {row["name"]: row for row in rows}
+
+
+def test_values_are_converted_to_base_currency():
+    result = compute_exposures(HOLDINGS, CLASSIFICATIONS, PRICES, {"INR": 1.0, "USD": 80.0})
+    assert result["total_value"] == pytest.approx(40000 + 80000 + 30000)
+    sectors = by_name(result["exposures"]["sector"])
+    assert sectors["IT"]["value"] == pytest.approx(120000)
+    assert sectors["IT"]["weight"] == pytest.approx(80.0)
+    currencies = by_name(result["exposures"]["currency"])
+    assert currencies["USD"]["value"] == pytest.approx(80000)
+
+
+def test_holdings_without_rate_are_left_out():
+    result = compute_exposures(HOLDINGS, CLASSIFICATIONS, PRICES, {"INR": 1.0})
+    assert result["total_value"] == pytest.approx(70000)
+    assert set(by_name(result["exposures"]["exchange"])) == {"NSE"}
+
+
+def test_portfolio_currency():
+    assert portfolio_currency({"currency": "INR"}) == "INR"
+    assert portfolio_currency({"base_currency": "EUR"}) == "EUR"
+    assert portfolio_currency({}) == "USD"
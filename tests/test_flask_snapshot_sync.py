@@ -0,0 +1,133 @@
+import asyncio
+import importlib
+import sys
+from datetime import datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+
+from services.snapshot_service import SNAPSHOT_COLLECTION, PortfolioSnapshotService, build_snapshot
+
+pytest.importorskip("flask")
+pytest.importorskip("fuzzywuzzy")
+
+API_ID = "6f1c2c52-2d47-4c1e-9a53-0d4e0c1b2a11"
+STOCK_ID = str(ObjectId())
+
+
+class Collection:
+    """Single-document pymongo stand-in matching on top-level equality"""
+
+    def __init__(self, documents=()):
+        self.documents = list(documents)
+
+    def _matches(self, document, query):
+        return all(document.get(key) == value for key, value in query.items())
+
+    def find_one(self, query, projection=None):
+        return next((doc for doc in self.documents if self._matches(doc, query)), None)
+
+    def update_one(self, query, update):
+        doc = self.find_one(query)
+        if doc is None:
+            return SimpleNamespace(matched_count=0, modified_count=0)
+        doc.update(update["$set"])
+        return SimpleNamespace(matched_count=1, modified_count=1)
+
+    def count_documents(self, query):
+        return len(self.documents)
+
+
+class Snapshots(Collection):
+    """Evaluates holding_change_op's filter and applies its quantity the way the pipeline does"""
+
+    def bulk_write(self, operations):
+        matched = 0
+        for operation in operations:
+            query = dict(operation._filter)
+            stock_id = query.pop("holdings.stock_id")
+            doc = self.find_one(query)
+            holding = doc and next((h for h in doc["holdings"] if h["stock_id"] == stock_id), None)
+            if holding is None:
+                continue
+            matched += 1
+            merged = operation._doc[0]["$set"]["holdings"]["$map"]["in"]["$cond"][1]["$mergeObjects"]
+            quantity = merged[1]["quantity"]
+            holding["quantity"] = quantity
+            holding["value"] = Decimal128(str(
+                quantity.to_decimal() * holding["price"].to_decimal() * holding["fx_rate"].to_decimal()
+            ))
+            doc["total_value"] = Decimal128(str(sum(h["value"].to_decimal() for h in doc["holdings"])))
+        return SimpleNamespace(matched_count=matched)
+
+
+class AsyncView:
+    """The motor side of the same snapshot collection, as the API reads it"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def find_one(self, query):
+        return self.collection.find_one(query)
+
+
+class Database(dict):
+    def __getattr__(self, name):
+        return self[name]
+
+
+@pytest.fixture
+def flask_app(monkeypatch):
+    portfolio_oid = ObjectId()
+    snapshot = build_snapshot(API_ID, "INR", [{
+        "stock_id": STOCK_ID, "stock": "RELIANCE", "exchange": "NSE", "symbol": "RELIANCE",
+        "quantity": Decimal("10"), "price": Decimal("2500"), "fx_rate": Decimal("1"), "value": Decimal("25000")
+    }])
+    db = Database({
+        "portfolios": Collection([{
+            "_id": portfolio_oid, "id": API_ID, "name": "Main", "base_currency": "INR",
+            "holdings": [{"stock_id": STOCK_ID, "stock_symbol": "RELIANCE", "quantity": Decimal128("10"),
+                          "average_price": Decimal128("2400"), "purchase_price": Decimal128("2400")}]
+        }]),
+        "stocks_collection": Collection([{"_id": ObjectId(STOCK_ID), "display_name": "Reliance",
+                                          "identifiers": {"nse_code": "RELIANCE"}}]),
+        "master_stocks": Collection(),
+        SNAPSHOT_COLLECTION: Snapshots([snapshot]),
+    })
+    import config.database
+    monkeypatch.setattr(config.database, "get_sync_database", lambda: db)
+    sys.modules.pop("app", None)
+    module = importlib.import_module("app")
+    yield module, db, str(portfolio_oid)
+    sys.modules.pop("app", None)
+
+
+def api_snapshot(db):
+    service = PortfolioSnapshotService(db={SNAPSHOT_COLLECTION: AsyncView(db[SNAPSHOT_COLLECTION])})
+    return asyncio.run(service.get_snapshot(API_ID))
+
+
+def test_flask_transaction_updates_the_api_snapshot(flask_app):
+    module, db, portfolio_id = flask_app
+    module.PortfolioManager(db).process_transaction({
+        "portfolio_id": portfolio_id, "stock_id": STOCK_ID, "transaction_type": "BUY",
+        "quantity": Decimal128("5"), "price": Decimal128("2600"), "date": datetime.now(timezone.utc)
+    })
+
+    snapshot = api_snapshot(db)
+    assert snapshot is not None
+    assert snapshot["holdings"][0]["quantity"].to_decimal() == Decimal("15")
+    assert snapshot["total_value"].to_decimal() == Decimal("37500")
+
+
+def test_flask_portfolio_edit_marks_the_api_snapshot_stale(flask_app):
+    module, db, portfolio_id = flask_app
+    response = module.app.test_client().post(f"/portfolios/{portfolio_id}/edit", json={
+        "name": "Main", "user_id": "u1", "base_currency": "INR",
+        "holdings": [{"stock_id": STOCK_ID, "quantity": 20, "purchase_price": 2400, "purchase_date": "2025-01-02"}]
+    })
+    assert response.status_code == 200
+    assert api_snapshot(db) is None
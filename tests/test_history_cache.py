@@ -0,0 +1,109 @@
+import os
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from services.history_cache import HistoryCache
+
+
+class BarCursor(list):
+    def batch_size(self, size):
+        return self
+
+
+class BarStore:
+    """historical_prices in memory, answering the two queries a sync issues"""
+
+    def __init__(self):
+        self.bars = {}
+        self.reads = 0
+
+    def put(self, symbol, day, close, updated_at):
+        self.bars[(symbol, day)] = {"symbol": symbol, "date": datetime(2026, 1, day), "close": close,
+                                    "volume": 1000.0, "updated_at": updated_at}
+
+    def create_index(self, keys):
+        pass
+
+    def aggregate(self, pipeline):
+        symbols = pipeline[0]["$match"]["symbol"]["$in"]
+        groups = {}
+        for bar in self.bars.values():
+            if bar["symbol"] in symbols:
+                group = groups.setdefault(bar["symbol"], {"_id": bar["symbol"], "rows": 0, "updated_at": None})
+                group["rows"] += 1
+                if group["updated_at"] is None or bar["updated_at"] > group["updated_at"]:
+                    group["updated_at"] = bar["updated_at"]
+        return iter(groups.values())
+
+    def find(self, query, projection):
+        def matches(bar, clause):
+            since = clause.get("updated_at", {}).get("$gt")
+            return bar["symbol"] in clause["symbol"]["$in"] and (since is None or bar["updated_at"] > since)
+
+        found = [dict(bar) for bar in self.bars.values() if any(matches(bar, c) for c in query["$or"])]
+        self.reads += len(found)
+        return BarCursor(found)
+
+
+class Database:
+    client = None
+    name = "test"
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, name):
+        return self.store
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return HistoryCache(directory=str(tmp_path), sync_seconds=0)
+
+
+def closes(cache, symbol):
+    dates, values, _ = cache.arrays(symbol)
+    return dict(zip(dates.astype(datetime), values.tolist()))
+
+
+def test_sync_picks_up_corrected_older_bars(cache):
+    store = BarStore()
+    for day in range(1, 6):
+        store.put("TCS.NS", day, 100.0 + day, datetime(2026, 1, day, 18))
+    db = Database(store)
+    spellings = {"TCS": "TCS", "TCS.NS": "TCS"}
+
+    assert cache.sync(db, spellings) == 5
+    assert cache.sync(db, spellings) == 0
+
+    store.put("TCS.NS", 2, 90.0, datetime(2026, 1, 7, 9))
+    store.put("TCS.NS", 6, 106.0, datetime(2026, 1, 7, 9))
+    assert cache.sync(db, spellings) == 2
+    cached = closes(cache, "TCS")
+    assert cached[datetime(2026, 1, 2).date()] == 90.0
+    assert cached[datetime(2026, 1, 6).date()] == 106.0
+    assert len(cached) == 6
+
+
+def test_sync_rebuilds_when_rows_disappear(cache):
+    store = BarStore()
+    for day in range(1, 4):
+        store.put("INFY", day, 50.0, datetime(2026, 1, day, 18))
+    db = Database(store)
+    cache.sync(db, {"INFY": "INFY"})
+
+    del store.bars[("INFY", 3)]
+    assert cache.sync(db, {"INFY": "INFY"}) == 2
+    assert len(closes(cache, "INFY")) == 2
+
+
+def test_writes_leave_no_temp_files(cache, tmp_path):
+    dates = np.arange(np.datetime64("2026-01-01"), np.datetime64("2026-01-11"))
+    for _ in range(3):
+        cache._write("TCS", dates, np.ones(len(dates)), np.ones(len(dates)), (10, datetime(2026, 1, 10)))
+    assert os.listdir(tmp_path) == ["TCS.arrow"]
+    assert cache.source_marker("TCS") == (10, datetime(2026, 1, 10))
@@ -0,0 +1,125 @@
+from pymongo import UpdateOne
+
+from services.maintenance.listing_sync import (
+    FINGERPRINT_COLLECTION, LISTING_STATE_ID, STATE_COLLECTION, ListingSync, parse_listing
+)
+
+HEADER = "SYMBOL,NAME OF COMPANY, SERIES, DATE OF LISTING, PAID UP VALUE, MARKET LOT, ISIN NUMBER, FACE VALUE"
+
+
+def listing(*rows):
+    return "\n".join([HEADER] + [f"{symbol},{name},EQ,01-JAN-2000,10,1,INE{i:09d},10"
+                                 for i, (symbol, name) in enumerate(rows)]).encode()
+
+
+class Collection:
+    """The slice of a pymongo collection ListingSync uses, in memory"""
+
+    def __init__(self):
+        self.documents = {}
+
+    def find_one(self, query):
+        return self.documents.get(query["_id"])
+
+    def find(self, query, projection):
+        return list(self.documents.values())
+
+    def update_one(self, query, update, upsert=False):
+        self.documents.setdefault(query["_id"], {"_id": query["_id"]}).update(update["$set"])
+
+    def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            if isinstance(operation, UpdateOne):
+                self.update_one(operation._filter, operation._doc, upsert=True)
+            else:
+                for symbol in operation._filter["_id"]["$in"]:
+                    self.documents.pop(symbol, None)
+
+
+class Database(dict):
+    def __missing__(self, name):
+        self[name] = Collection()
+        return self[name]
+
+
+class FakeFetcher:
+    """Serves `body` with an ETag, answering 304 when the client sends it back"""
+
+    def __init__(self, body, etag=None):
+        self.body = body
+        self.etag = etag
+        self.requests = []
+
+    def __call__(self, url, headers, timeout):
+        self.requests.append(headers)
+        if self.etag and headers.get("If-None-Match") == self.etag:
+            return 304, b"", {}
+        return 200, self.body, {"ETag": self.etag} if self.etag else {}
+
+
+def test_parse_listing_strips_header_and_values():
+    rows = parse_listing(listing(("TCS", " Tata Consultancy Services ")).decode())
+    assert rows["TCS"]["NAME OF COMPANY"] == "Tata Consultancy Services"
+    assert rows["TCS"]["SERIES"] == "EQ"
+
+
+def test_etag_turns_repeat_fetches_into_304():
+    db = Database()
+    fetcher = FakeFetcher(listing(("TCS", "Tata"), ("INFY", "Infosys")), etag='"v1"')
+    sync = ListingSync(db, path="", fetcher=fetcher)
+
+    changes = sync.check()
+    assert changes["new"] == ["INFY", "TCS"]
+    sync.commit(changes)
+    assert db[STATE_COLLECTION].documents[LISTING_STATE_ID]["etag"] == '"v1"'
+
+    assert sync.check() is None
+    assert fetcher.requests[-1]["If-None-Match"] == '"v1"'
+
+
+def test_content_hash_detects_unchanged_list_without_validators():
+    db = Database()
+    fetcher = FakeFetcher(listing(("TCS", "Tata")))
+    sync = ListingSync(db, path="", fetcher=fetcher)
+    sync.commit(sync.check())
+
+    assert sync.check() is None
+    assert "If-None-Match" not in fetcher.requests[-1]
+    fetcher.body = listing(("TCS", "Tata Consultancy"))
+    assert sync.check()["changed"] == ["TCS"]
+
+
+def test_fingerprints_diff_new_changed_and_removed():
+    db = Database()
+    fetcher = FakeFetcher(listing(("TCS", "Tata"), ("INFY", "Infosys"), ("WIPRO", "Wipro")))
+    sync = ListingSync(db, path="", fetcher=fetcher)
+    sync.commit(sync.check())
+
+    fetcher.body = listing(("TCS", "Tata"), ("INFY", "Infosys Limited"), ("HCLTECH", "HCL"))
+    changes = sync.check()
+    assert (changes["new"], changes["changed"], changes["removed"]) == (["HCLTECH"], ["INFY"], ["WIPRO"])
+    sync.commit(changes)
+    assert set(db[FINGERPRINT_COLLECTION].documents) == {"TCS", "INFY", "HCLTECH"}
+
+
+def test_skipped_symbols_come_up_again():
+    db = Database()
+    fetcher = FakeFetcher(listing(("TCS", "Tata"), ("INFY", "Infosys")), etag='"v1"')
+    sync = ListingSync(db, path="", fetcher=fetcher)
+    sync.commit(sync.check(), skip=["INFY"])
+
+    assert LISTING_STATE_ID not in db[STATE_COLLECTION].documents
+    changes = sync.check()
+    assert "If-None-Match" not in fetcher.requests[-1]
+    assert changes["new"] == ["INFY"] and changes["changed"] == []
+
+
+def test_fixture_file_is_read_instead_of_the_network(tmp_path):
+    path = tmp_path / "EQUITY_L.csv"
+    path.write_bytes(listing(("TCS", "Tata")))
+
+    def no_network(*args):
+        raise AssertionError("fetched over the network")
+
+    changes = ListingSync(Database(), path=str(path), fetcher=no_network).check()
+    assert changes["new"] == ["TCS"]
@@ -0,0 +1,155 @@
+import math
+import statistics
+from datetime import datetime
+
+import numpy as np
+import pytest
+from bson import ObjectId
+
+from config.settings import HISTORY_COLLECTION
+from services import performance_analytics, price_matrix
+from services.performance_analytics import (
+    flow_adjusted_returns, get_portfolio_performance, max_drawdown, performance_metrics, portfolio_performance, xirr
+)
+
+
+class Portfolios:
+    def __init__(self, documents):
+        self.documents = documents
+        self.queries = []
+
+    def find_one(self, query):
+        self.queries.append(query)
+        key, value = next(iter(query.items()))
+        return next((doc for doc in self.documents if doc.get(key) == value), None)
+
+
+class Database:
+    def __init__(self, documents):
+        self.portfolios = Portfolios(documents)
+
+
+@pytest.fixture
+def performance(monkeypatch):
+    calls = []
+    monkeypatch.setattr(performance_analytics, "portfolio_performance",
+                        lambda db, portfolio, *args: calls.append(portfolio) or {"ok": True})
+    return calls
+
+
+def test_portfolio_found_by_uuid_id(performance):
+    object_id = ObjectId()
+    db = Database([{"_id": object_id, "id": "6f1c0c1e-uuid", "holdings": []}])
+    assert get_portfolio_performance(db, "6f1c0c1e-uuid", 30) == {"ok": True}
+    assert performance[0]["_id"] == object_id
+
+
+def test_portfolio_falls_back_to_object_id(performance):
+    object_id = ObjectId()
+    db = Database([{"_id": object_id, "holdings": []}])
+    get_portfolio_performance(db, str(object_id), 30)
+    assert db.portfolios.queries == [{"id": str(object_id)}, {"_id": object_id}]
+    assert performance[0]["_id"] == object_id
+
+
+def test_unknown_portfolio_raises(performance):
+    with pytest.raises(ValueError):
+        get_portfolio_performance(Database([]), "missing", 30)
+    assert performance == []
+
+
+# Five NSE/NYSE sessions. TCS is held throughout and bought again mid-period;
+# IBM, an NYSE listing, is sold out before the end.
+SESSIONS = [datetime(2025, 6, day) for day in range(2, 7)]
+CLOSES = {"TCS.NS": [100, 100, 110, 110, 121], "IBM": [50, 55, 55, 60, 60]}
+TCS_ID, IBM_ID = str(ObjectId()), str(ObjectId())
+# Quantities: TCS 5 then 10 from 2025-06-04, IBM 4 until 2025-06-05
+VALUES = [700.0, 720.0, 1320.0, 1100.0, 1210.0]
+FLOWS = [0.0, 0.0, 550.0, -240.0, 0.0]
+RETURNS = [720 / 700 - 1, (1320 - 550) / 720 - 1, (1100 + 240) / 1320 - 1, 1210 / 1100 - 1]
+
+
+class Query(list):
+    def batch_size(self, size):
+        return self
+
+
+class Collection:
+    def __init__(self, documents=(), match=None):
+        self.documents = list(documents)
+        self.match = match or (lambda doc, query: True)
+
+    def find(self, query, projection=None):
+        return Query(doc for doc in self.documents if self.match(doc, query))
+
+
+class MetricsDatabase(dict):
+    def __getattr__(self, name):
+        return self[name]
+
+
+@pytest.fixture
+def metrics_db(monkeypatch):
+    monkeypatch.setattr(performance_analytics, "load_price_matrix", price_matrix.load_price_matrix)
+    bars = [{"symbol": symbol, "date": day, "close": close}
+            for symbol, closes in CLOSES.items() for day, close in zip(SESSIONS, closes)]
+    return MetricsDatabase({
+        HISTORY_COLLECTION: Collection(bars, lambda doc, query: doc["symbol"] in query["symbol"]["$in"]),
+        "corporate_actions": Collection(),
+        "transactions": Collection([
+            {"stock_id": TCS_ID, "transaction_type": "BUY", "quantity": 5, "price": 110, "date": SESSIONS[2]},
+            {"stock_id": IBM_ID, "transaction_type": "SELL", "quantity": 4, "price": 60, "date": SESSIONS[3]},
+        ]),
+        # Sold-out IBM is resolved to its NYSE listing from the master stock
+        "master_stocks": Collection([{"_id": ObjectId(IBM_ID), "identifiers": {"symbol": "IBM"},
+                                      "exchange_info": {"primary_exchange": "NYSE"}}]),
+    })
+
+
+def test_metrics_of_a_fixed_value_series():
+    dates = np.array(SESSIONS, dtype="datetime64[D]")
+    metrics = performance_metrics(dates, np.array(VALUES), np.array(FLOWS), risk_free_rate=0.0)
+
+    assert metrics["time_weighted_return"] == pytest.approx(1.1 * (1340 / 1320) * 1.1 - 1)
+    assert metrics["net_flows"] == 310.0
+    assert metrics["absolute_return"] == pytest.approx(200.0)
+    assert metrics["volatility"] == pytest.approx(statistics.stdev(RETURNS) * math.sqrt(252))
+    assert metrics["sharpe_ratio"] == pytest.approx(
+        statistics.mean(RETURNS) / statistics.stdev(RETURNS) * math.sqrt(252)
+    )
+    assert metrics["max_drawdown"] == 0.0
+
+
+def test_max_drawdown_uses_the_flow_adjusted_growth_index():
+    # A 50 withdrawal on the last day is not a loss; the real fall is 165 -> 148.5 after the deposit
+    values = np.array([100.0, 110.0, 165.0, 148.5, 98.5])
+    flows = np.array([0.0, 0.0, 50.0, 0.0, -50.0])
+    returns = flow_adjusted_returns(values, flows)
+    assert returns == pytest.approx([0.1, 115 / 110 - 1, -0.1, 0.0])
+    assert max_drawdown(returns) == {"max_drawdown": pytest.approx(-0.1), "peak": 2, "trough": 3}
+
+
+def test_xirr_of_exact_and_mid_period_flows():
+    dates = np.array(["2025-01-01", "2026-01-01", "2027-01-01"], dtype="datetime64[D]")
+    # 100 / 1.1 + 1100 / 1.21 = 1000
+    assert xirr(dates, [-1000.0, 100.0, 1100.0]) == pytest.approx(0.1)
+
+    rate = xirr(np.array(["2025-01-01", "2025-07-02", "2026-01-01"], dtype="datetime64[D]"),
+                [-100.0, -100.0, 215.0])
+    assert 100 * (1 + rate) + 100 * (1 + rate) ** (183 / 365) == pytest.approx(215.0)
+    assert xirr(dates, [-1.0, -1.0, -1.0]) is None
+
+
+def test_portfolio_performance_with_mid_period_buy_and_sold_out_position(metrics_db):
+    portfolio = {"_id": ObjectId(), "holdings": [
+        {"stock_id": TCS_ID, "stock_symbol": "TCS", "exchange_code": "NSE", "quantity": 10}
+    ]}
+    metrics = portfolio_performance(metrics_db, portfolio, SESSIONS[0], SESSIONS[-1], risk_free_rate=0.0)
+
+    assert (metrics["start_value"], metrics["end_value"]) == (700.0, 1210.0)
+    assert metrics["net_flows"] == 310.0
+    assert metrics["absolute_return"] == pytest.approx(200.0)
+    assert metrics["time_weighted_return"] == pytest.approx(1.1 * (1340 / 1320) * 1.1 - 1)
+    rate, years = metrics["xirr"], np.array([0, 2, 3, 4]) / 365
+    assert sum(amount * (1 + rate) ** -t for amount, t in zip([-700, -550, 240, 1210], years)) == \
+        pytest.approx(0.0, abs=1e-6)
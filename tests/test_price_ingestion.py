@@ -0,0 +1,84 @@
+from datetime import date, datetime
+
+import numpy as np
+import pytz
+
+from services.maintenance.price_ingestion import (
+    FixtureHistoryProvider, closed_through, ingestion_targets, new_bars, plan_batches
+)
+
+IST = pytz.timezone("Asia/Kolkata")
+
+
+def day(value):
+    return np.datetime64(value, 'D')
+
+
+class Portfolios:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find(self, query, projection):
+        return self.documents
+
+
+class Database:
+    def __init__(self, portfolios):
+        self.portfolios = Portfolios(portfolios)
+
+
+def test_session_counts_as_closed_only_after_the_exchange_close():
+    # Wednesday 2025-06-04: NSE closes 15:30 IST, NYSE 16:00 New York
+    assert closed_through("NSE", IST.localize(datetime(2025, 6, 4, 11, 0))) == day("2025-06-03")
+    assert closed_through("NSE", IST.localize(datetime(2025, 6, 4, 15, 30))) == day("2025-06-04")
+    # 21:00 IST is 11:30 in New York: NSE has closed, NYSE has not
+    evening = IST.localize(datetime(2025, 6, 4, 21, 0))
+    assert closed_through("NSE", evening) == day("2025-06-04")
+    assert closed_through("NYSE", evening) == day("2025-06-03")
+    # Naive datetimes are UTC
+    assert closed_through("NSE", datetime(2025, 6, 4, 10, 0)) == day("2025-06-04")
+
+
+def test_intraday_run_plans_nothing_for_a_symbol_current_to_yesterday():
+    targets = {"TCS.NS": {"exchange_code": "NSE", "spellings": {"TCS", "TCS.NS"}}}
+    latest = {"TCS.NS": day("2025-06-03")}
+    ends = {"NSE": closed_through("NSE", IST.localize(datetime(2025, 6, 4, 11, 0)))}
+    assert plan_batches(targets, latest, ends) == []
+
+    ends = {"NSE": closed_through("NSE", IST.localize(datetime(2025, 6, 4, 16, 15)))}
+    assert plan_batches(targets, latest, ends) == [
+        {"symbols": ["TCS.NS"], "start": date(2025, 6, 4), "end": date(2025, 6, 4)}
+    ]
+
+
+def test_batches_end_at_each_exchange_close_and_bars_past_it_are_dropped():
+    targets = {
+        "TCS.NS": {"exchange_code": "NSE", "spellings": {"TCS.NS"}},
+        "AAPL": {"exchange_code": "NYSE", "spellings": {"AAPL"}},
+    }
+    latest = {"TCS.NS": day("2025-06-02"), "AAPL": day("2025-06-02")}
+    ends = {"NSE": day("2025-06-04"), "NYSE": day("2025-06-03")}
+    [batch] = plan_batches(targets, latest, ends)
+    assert batch["start"] == date(2025, 6, 3) and batch["end"] == date(2025, 6, 4)
+
+    provider = FixtureHistoryProvider({
+        "TCS.NS": [["2025-06-03", 1, 1, 1, 1, 10], ["2025-06-04", 2, 2, 2, 2, 10]],
+        "AAPL": [["2025-06-03", 3, 3, 3, 3, 10], ["2025-06-04", 4, 4, 4, 4, 10]],
+    })
+    bars = provider.fetch_history(batch["symbols"], batch["start"], batch["end"])
+    until = {symbol: ends[target["exchange_code"]] for symbol, target in targets.items()}
+    kept = new_bars(bars, latest, until)
+    # The partial NYSE bar for 2025-06-04 is not written
+    assert sorted(zip(kept["symbol"], kept["date"].astype(str))) == [
+        ("AAPL", "2025-06-03"), ("TCS.NS", "2025-06-03"), ("TCS.NS", "2025-06-04")
+    ]
+
+
+def test_targets_can_be_limited_to_one_exchange():
+    db = Database([{"holdings": [
+        {"stock_symbol": "TCS"},
+        {"stock_symbol": "AAPL", "exchange_code": "NYSE"},
+    ]}])
+    assert set(ingestion_targets(db)) == {"TCS.NS", "AAPL", "^NSEI", "^GSPC"}
+    assert set(ingestion_targets(db, "NSE")) == {"TCS.NS", "^NSEI"}
+    assert ingestion_targets(db, "NYSE")["AAPL"]["exchange_code"] == "NYSE"
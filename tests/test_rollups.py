@@ -0,0 +1,53 @@
+from datetime import datetime
+
+import numpy as np
+
+from services.rollups import ROLLUP_COLLECTION, load_bars, lttb
+
+
+class Cursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, field, direction):
+        return iter(sorted(self.documents, key=lambda doc: doc[field]))
+
+
+class RollupCollection:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find(self, query, projection):
+        fields = [field for field, include in projection.items() if include]
+        return Cursor([{field: doc[field] for field in fields if field in doc}
+                       for doc in self.documents if doc["symbol"] in query["symbol"]["$in"]])
+
+
+def rollup(symbol, start, close):
+    return {"symbol": symbol, "period": "week", "start": start, "open": close, "high": close,
+            "low": close, "close": close, "volume": 1}
+
+
+def test_rollup_periods_are_not_duplicated_across_spellings():
+    db = {ROLLUP_COLLECTION: RollupCollection([
+        rollup("RELIANCE", datetime(2026, 1, 5), 100.0),
+        rollup("RELIANCE.NS", datetime(2026, 1, 5), 101.0),
+        rollup("RELIANCE", datetime(2026, 1, 12), 102.0),
+        rollup("RELIANCE.NS", datetime(2026, 1, 19), 103.0),
+    ])}
+    bars = load_bars(db, {"RELIANCE": "RELIANCE", "RELIANCE.NS": "RELIANCE"},
+                     datetime(2026, 1, 1), datetime(2026, 1, 31), "week")
+    assert [(bar["date"], bar["close"]) for bar in bars] == [
+        (datetime(2026, 1, 5), 101.0), (datetime(2026, 1, 12), 102.0), (datetime(2026, 1, 19), 103.0)
+    ]
+    assert all("symbol" not in bar and "start" not in bar for bar in bars)
+
+
+def test_lttb_keeps_endpoints_and_extremes():
+    x = np.arange(1000, dtype=np.float64)
+    y = np.sin(x / 50)
+    y[500] = 10
+    keep = lttb(x, y, 50)
+    assert len(keep) == 50
+    assert keep[0] == 0 and keep[-1] == 999 and 500 in keep
+    assert np.all(np.diff(keep) > 0)
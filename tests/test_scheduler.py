@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+
+import pytz
+from pymongo.errors import DuplicateKeyError
+
+from services.maintenance.scheduler import (
+    LOCK_COLLECTION, RUN_COLLECTION, Job, JobLocks, Scheduler, SessionSchedule, default_jobs
+)
+
+SLOT = pytz.UTC.localize(datetime(2025, 6, 4, 10, 45))
+
+
+class Locks:
+    """job_locks with the conditional-upsert behaviour JobLocks relies on"""
+
+    def __init__(self):
+        self.documents = {}
+
+    def update_one(self, query, update, upsert=False):
+        held = self.documents.get(query["_id"])
+        if held and held["owner"] != update["$set"]["owner"] and held["expires_at"] >= datetime.utcnow():
+            raise DuplicateKeyError("lock held")
+        self.documents[query["_id"]] = dict(update["$set"])
+
+    def update_many(self, query, update):
+        pass
+
+    def delete_many(self, query):
+        for name in query["_id"]["$in"]:
+            if self.documents.get(name, {}).get("owner") == query["owner"]:
+                del self.documents[name]
+
+
+class Runs:
+    def __init__(self):
+        self.documents = {}
+
+    def insert_one(self, document):
+        if document["_id"] in self.documents:
+            raise DuplicateKeyError("claimed")
+        self.documents[document["_id"]] = document
+
+    def update_one(self, query, update):
+        self.documents[query["_id"]].update(update["$set"])
+
+
+def make_scheduler(jobs, node_id="node-a"):
+    db = {LOCK_COLLECTION: Locks(), RUN_COLLECTION: Runs()}
+    return db, Scheduler(db, jobs, node_id=node_id, poll_seconds=0)
+
+
+def job(name, calls, locks=("historical_prices",), **kwargs):
+    def run(db):
+        calls.append(name)
+        return {"ok": True}
+    if "after" not in kwargs:
+        kwargs["schedule"] = SessionSchedule("NSE", "end", timedelta(minutes=45))
+    return Job(name, run, locks=locks, **kwargs)
+
+
+def test_busy_locks_leave_the_slot_unclaimed_for_a_later_tick():
+    calls = []
+    db, scheduler = make_scheduler([job("ingest", calls)])
+    JobLocks(db, "node-b").acquire(["historical_prices"], timedelta(minutes=10))
+
+    assert scheduler.run_job(scheduler.jobs["ingest"], SLOT) is None
+    assert db[RUN_COLLECTION].documents == {} and calls == []
+    assert "ingest" not in scheduler.claimed
+
+    JobLocks(db, "node-b").release(["historical_prices"])
+    assert scheduler.run_job(scheduler.jobs["ingest"], SLOT) == "succeeded"
+    assert calls == ["ingest"] and db[LOCK_COLLECTION].documents == {}
+
+
+def test_slot_claimed_elsewhere_releases_the_locks():
+    calls = []
+    db, scheduler = make_scheduler([job("ingest", calls)])
+    other = Scheduler(db, [job("ingest", calls)], node_id="node-b", poll_seconds=0)
+
+    assert other.run_job(other.jobs["ingest"], SLOT) == "succeeded"
+    assert scheduler.run_job(scheduler.jobs["ingest"], SLOT) is None
+    assert calls == ["ingest"] and db[LOCK_COLLECTION].documents == {}
+
+
+def test_followers_run_after_their_job():
+    calls = []
+    db, scheduler = make_scheduler([job("ingest", calls), job("refresh", calls, locks=(), after="ingest")])
+    assert scheduler.run_job(scheduler.jobs["ingest"], SLOT) == "succeeded"
+    assert calls == ["ingest", "refresh"]
+    assert {run["status"] for run in db[RUN_COLLECTION].documents.values()} == {"succeeded"}
+
+
+def test_price_ingestion_jobs_are_scoped_to_their_exchange(monkeypatch):
+    from services.maintenance import price_ingestion
+
+    seen = []
+    monkeypatch.setattr(price_ingestion, "ingest_prices", lambda db, exchange_code=None: seen.append(exchange_code))
+    jobs = {job.name: job for job in default_jobs()}
+    jobs["price_ingestion_nse"].func(None)
+    jobs["price_ingestion_nyse"].func(None)
+    assert seen == ["NSE", "NYSE"]
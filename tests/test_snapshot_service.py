@@ -0,0 +1,44 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from services.snapshot_service import SNAPSHOT_MAX_AGE, PortfolioSnapshotService, build_snapshot
+
+
+class SnapshotCollection:
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    async def find_one(self, query):
+        return self.snapshot
+
+
+def snapshot_service(snapshot) -> PortfolioSnapshotService:
+    return PortfolioSnapshotService(db={"portfolio_snapshots": SnapshotCollection(snapshot)})
+
+
+ROWS = [{"stock_id": "s1", "stock": "RELIANCE", "exchange": "NSE", "symbol": "RELIANCE",
+         "quantity": Decimal("10"), "price": Decimal("2500"), "fx_rate": Decimal("1"), "value": Decimal("25000")}]
+
+
+def test_fresh_snapshot_is_served():
+    snapshot = build_snapshot("p1", "INR", ROWS)
+    assert snapshot["valued_at"] == snapshot["updated_at"]
+    assert asyncio.run(snapshot_service(snapshot).get_snapshot("p1")) is snapshot
+
+
+def test_price_ticks_do_not_extend_snapshot_age():
+    snapshot = build_snapshot("p1", "INR", ROWS)
+    snapshot["valued_at"] -= SNAPSHOT_MAX_AGE + timedelta(minutes=1)
+    snapshot["updated_at"] = datetime.now(timezone.utc)
+    assert asyncio.run(snapshot_service(snapshot).get_snapshot("p1")) is None
+
+
+def test_snapshot_without_valued_at_uses_updated_at():
+    snapshot = build_snapshot("p1", "INR", ROWS)
+    del snapshot["valued_at"]
+    snapshot["updated_at"] = datetime.utcnow() - SNAPSHOT_MAX_AGE - timedelta(minutes=1)
+    assert asyncio.run(snapshot_service(snapshot).get_snapshot("p1")) is None
+    snapshot["stale"] = True
+    snapshot["updated_at"] = datetime.now(timezone.utc)
+    assert asyncio.run(snapshot_service(snapshot).get_snapshot("p1")) is None
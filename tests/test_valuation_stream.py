@@ -0,0 +1,217 @@
+import asyncio
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from services.price_service import MarketPriceService
+from services.snapshot_service import build_snapshot
+from services.valuation_stream import SimulatedPriceFeed, ValuationBroadcaster, ValuationSubscriber
+
+
+def holding_row(symbol: str, quantity: str, price: str) -> dict:
+    return {"stock_id": symbol, "stock": symbol, "exchange": "NSE", "symbol": symbol,
+            "quantity": Decimal(quantity), "price": Decimal(price), "fx_rate": Decimal("1"),
+            "value": Decimal(quantity) * Decimal(price)}
+
+
+class PortfolioCollection:
+    def __init__(self, portfolios):
+        self.portfolios = portfolios
+
+    async def find_one(self, query, projection=None):
+        return self.portfolios.get(query["id"])
+
+    def find(self, query, projection=None):
+        documents = [{"id": pid, **doc} for pid, doc in self.portfolios.items() if pid in query["id"]["$in"]]
+
+        class Cursor:
+            async def to_list(self, length=None):
+                return documents
+        return Cursor()
+
+
+class FakeSnapshots:
+    def __init__(self, owner):
+        self.owner = owner
+
+    async def get_snapshot(self, portfolio_id):
+        return self.owner.snapshots.get(portfolio_id)
+
+
+class FakePortfolioService:
+    """Portfolios and their holdings in memory; `gates` hold back a portfolio's load"""
+
+    def __init__(self, holdings):
+        self.holdings = holdings
+        self.collection = PortfolioCollection({pid: {"updated_at": datetime(2026, 1, 1)} for pid in holdings})
+        self.snapshots = {}
+        self.snapshot_service = FakeSnapshots(self)
+        self.gates = {}
+        self.rebuilds = 0
+
+    async def refresh_portfolio_snapshot(self, portfolio_id):
+        if portfolio_id in self.gates:
+            await self.gates[portfolio_id].wait()
+        self.rebuilds += 1
+        snapshot = build_snapshot(portfolio_id, "INR", self.holdings[portfolio_id])
+        self.snapshots[portfolio_id] = snapshot
+        return snapshot
+
+
+def broadcaster_for(portfolio_service) -> ValuationBroadcaster:
+    return ValuationBroadcaster(MarketPriceService(providers={}), portfolio_service, min_interval=0)
+
+
+def test_unknown_portfolio_is_rejected():
+    broadcaster = broadcaster_for(FakePortfolioService({}))
+    with pytest.raises(ValueError):
+        asyncio.run(broadcaster.subscribe("missing"))
+    assert not broadcaster.portfolios
+
+
+def test_price_ticks_push_deltas():
+    async def scenario():
+        broadcaster = broadcaster_for(FakePortfolioService({"p1": [holding_row("TCS", "2", "100")]}))
+        subscriber = await broadcaster.subscribe("p1")
+        first, subscriber.pending = subscriber.pending, None
+        await broadcaster.on_prices("NSE", {"TCS": Decimal("110"), "INFY": Decimal("50")})
+        return first, subscriber.pending
+
+    first, delta = asyncio.run(scenario())
+    assert first["full"] and first["total_value"] == 200.0
+    assert delta["holdings"] == {"NSE:TCS": 220.0}
+    assert delta["change"] == 20.0 and delta["total_value"] == 220.0
+
+
+def test_slow_load_does_not_block_other_portfolios():
+    async def scenario():
+        service = FakePortfolioService({"slow": [holding_row("TCS", "1", "100")],
+                                        "fast": [holding_row("INFY", "1", "50")]})
+        service.gates["slow"] = asyncio.Event()
+        broadcaster = broadcaster_for(service)
+        slow = asyncio.ensure_future(broadcaster.subscribe("slow"))
+        await asyncio.sleep(0)
+        fast = await asyncio.wait_for(broadcaster.subscribe("fast"), timeout=1)
+        loaded_while_waiting = not slow.done()
+        service.gates["slow"].set()
+        await slow
+        return fast, loaded_while_waiting
+
+    fast, loaded_while_waiting = asyncio.run(scenario())
+    assert loaded_while_waiting
+    assert fast.pending["total_value"] == 50.0
+
+
+def test_concurrent_subscribers_share_one_load():
+    async def scenario():
+        service = FakePortfolioService({"p1": [holding_row("TCS", "1", "100")]})
+        broadcaster = broadcaster_for(service)
+        await asyncio.gather(*(broadcaster.subscribe("p1") for _ in range(5)))
+        return service.rebuilds, len(broadcaster.portfolios["p1"].subscribers)
+
+    assert asyncio.run(scenario()) == (1, 5)
+
+
+def test_holding_change_reloads_state():
+    async def scenario():
+        service = FakePortfolioService({"p1": [holding_row("TCS", "2", "100"), holding_row("INFY", "1", "50")]})
+        broadcaster = broadcaster_for(service)
+        subscriber = await broadcaster.subscribe("p1")
+        subscriber.pending = None
+        await broadcaster.check_holdings()
+        unchanged = subscriber.pending
+
+        service.holdings["p1"] = [holding_row("TCS", "3", "100"), holding_row("WIPRO", "4", "10")]
+        service.collection.portfolios["p1"]["updated_at"] = datetime(2026, 1, 2)
+        await broadcaster.check_holdings()
+        return broadcaster, unchanged, subscriber.pending
+
+    broadcaster, unchanged, reloaded = asyncio.run(scenario())
+    assert unchanged is None
+    assert reloaded["full"]
+    assert reloaded["holdings"] == {"NSE:TCS": 300.0, "NSE:WIPRO": 40.0}
+    assert reloaded["change"] == 340.0 - 250.0
+    assert set(broadcaster.symbol_index) == {"NSE:TCS", "NSE:WIPRO"}
+
+
+def test_simulated_ticks_bypass_price_service():
+    async def scenario():
+        service = FakePortfolioService({"p1": [holding_row("TCS", "1", "100")]})
+        broadcaster = broadcaster_for(service)
+        published = []
+        broadcaster.price_service.add_listener(lambda code, prices: published.append(prices) or asyncio.sleep(0))
+        subscriber = await broadcaster.subscribe("p1")
+        subscriber.pending = None
+        feed = SimulatedPriceFeed(broadcaster, interval=0.01, volatility=0.05, seed=1)
+        task = asyncio.ensure_future(feed.run())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        return broadcaster, subscriber.pending, published
+
+    broadcaster, update, published = asyncio.run(scenario())
+    assert update is not None and update["holdings"]["NSE:TCS"] != 100.0
+    assert broadcaster.price_service.cache == {}
+    assert published == []
+
+
+def test_sse_stream_returns_404_for_unknown_portfolio(monkeypatch):
+    testclient = pytest.importorskip("fastapi.testclient")
+    import main
+
+    monkeypatch.setattr(main.valuation_broadcaster, "portfolio_service", FakePortfolioService({}))
+    response = testclient.TestClient(main.app).get("/portfolios/missing/valuation/stream")
+    assert response.status_code == 404
+    assert "missing" in response.json()["detail"]
+
+
+def test_idle_subscriber_yields_heartbeats():
+    async def scenario():
+        subscriber = ValuationSubscriber(min_interval=0)
+        updates = subscriber.updates(heartbeat=0.01)
+        idle = await updates.__anext__()
+        subscriber.push({"holdings": {}, "change": 0.0, "total_value": 1.0})
+        return idle, await updates.__anext__()
+
+    idle, update = asyncio.run(scenario())
+    assert idle is None and update["total_value"] == 1.0
+
+
+def test_websocket_client_leaving_unsubscribes_without_updates(monkeypatch):
+    testclient = pytest.importorskip("fastapi.testclient")
+    import main
+
+    broadcaster = broadcaster_for(FakePortfolioService({"p1": [holding_row("TCS", "1", "100")]}))
+    monkeypatch.setattr(main, "valuation_broadcaster", broadcaster)
+    with testclient.TestClient(main.app).websocket_connect("/ws/portfolios/p1/valuation") as websocket:
+        assert websocket.receive_json()["full"]
+        assert "p1" in broadcaster.portfolios
+    # No price tick arrives after the close; the receive loop alone notices it
+    assert broadcaster.portfolios == {}
+
+
+def test_sse_client_leaving_unsubscribes_on_heartbeat(monkeypatch):
+    import main
+
+    class Request:
+        disconnected = False
+
+        async def is_disconnected(self):
+            return self.disconnected
+
+    async def scenario():
+        broadcaster = broadcaster_for(FakePortfolioService({"p1": [holding_row("TCS", "1", "100")]}))
+        monkeypatch.setattr(main, "valuation_broadcaster", broadcaster)
+        monkeypatch.setattr(main, "STREAM_HEARTBEAT_INTERVAL", 0.01)
+        request = Request()
+        events = (await main.portfolio_valuation_sse(request, "p1")).body_iterator
+        first = await events.__anext__()
+        keep_alive = await events.__anext__()
+        request.disconnected = True
+        with pytest.raises(StopAsyncIteration):
+            await events.__anext__()
+        return first, keep_alive, broadcaster.portfolios
+
+    first, keep_alive, watched = asyncio.run(scenario())
+    assert first.startswith("data: ") and keep_alive == ": keep-alive\n\n"
+    assert watched == {}